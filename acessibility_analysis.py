@@ -1,304 +1,695 @@
+import os
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
 from scipy.spatial import cKDTree
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-print("="*60)
-print("HEALTHCARE ACCESSIBILITY ANALYSIS")
-print("="*60)
-
-# Load facility data
-facilities_df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
-print(f"\nLoaded {len(facilities_df)} healthcare facilities")
-
-# Separate by type for specialized analysis
-hospitals_df = facilities_df[facilities_df['category'] == 'Hospital']
-clinics_df = facilities_df[facilities_df['category'] == 'Clinic']
-pharmacies_df = facilities_df[facilities_df['category'] == 'Pharmacy']
-
-print(f"  - Hospitals: {len(hospitals_df)}")
-print(f"  - Clinics: {len(clinics_df)}")
-print(f"  - Pharmacies: {len(pharmacies_df)}")
-
-# Get bounds of the study area
-lat_min, lat_max = facilities_df['latitude'].min(), facilities_df['latitude'].max()
-lon_min, lon_max = facilities_df['longitude'].min(), facilities_df['longitude'].max()
-
-# Add padding (roughly 2km in degrees)
-padding = 0.02
-lat_min -= padding
-lat_max += padding
-lon_min -= padding
-lon_max += padding
-
-print(f"\nStudy area bounds:")
-print(f"  Latitude: {lat_min:.4f} to {lat_max:.4f}")
-print(f"  Longitude: {lon_min:.4f} to {lon_max:.4f}")
-
-# Create analysis grid
-# Grid represents different locations across Chennai
-grid_size = 100  # 100x100 = 10,000 sample points
-lat_grid = np.linspace(lat_min, lat_max, grid_size)
-lon_grid = np.linspace(lon_min, lon_max, grid_size)
-
-print(f"\nCreating {grid_size}x{grid_size} analysis grid ({grid_size*grid_size} points)...")
-
-# Generate all grid points
-grid_points = []
-for lat in lat_grid:
-    for lon in lon_grid:
-        grid_points.append({
-            'latitude': lat,
-            'longitude': lon
-        })
-
-grid_df = pd.DataFrame(grid_points)
-print(f"✓ Grid created with {len(grid_df)} analysis points")
-
-# Function to find nearest facility using KDTree (much faster than iterating)
-def calculate_nearest_distances(grid_points, facilities, facility_type_name):
-    """Calculate distance to nearest facility for each grid point"""
-    print(f"\nCalculating distances to nearest {facility_type_name}...")
-    
-    # Convert to radians for KDTree
-    facility_coords = np.radians(facilities[['latitude', 'longitude']].values)
-    grid_coords = np.radians(grid_points[['latitude', 'longitude']].values)
-    
-    # Build KDTree
-    tree = cKDTree(facility_coords)
-    
-    # Find nearest neighbor for each grid point
-    distances_rad, indices = tree.query(grid_coords)
-    
-    # Convert radians to kilometers (approximate)
-    # Earth radius ~ 6371 km
-    distances_km = distances_rad * 6371
-    
-    # Get nearest facility names
-    nearest_facilities = facilities.iloc[indices]['name'].values
-    
-    return distances_km, nearest_facilities
-
-# Calculate distances to different facility types
-print("\n" + "="*60)
-print("CALCULATING DISTANCES...")
-print("="*60)
-
-# All facilities
-all_distances, all_nearest = calculate_nearest_distances(
-    grid_df, facilities_df, "any healthcare facility"
-)
-grid_df['distance_to_any_km'] = all_distances
-grid_df['nearest_facility'] = all_nearest
-
-# Hospitals only
-hospital_distances, hospital_nearest = calculate_nearest_distances(
-    grid_df, hospitals_df, "hospital"
-)
-grid_df['distance_to_hospital_km'] = hospital_distances
-grid_df['nearest_hospital'] = hospital_nearest
-
-# Clinics only
-clinic_distances, clinic_nearest = calculate_nearest_distances(
-    grid_df, clinics_df, "clinic"
-)
-grid_df['distance_to_clinic_km'] = clinic_distances
-grid_df['nearest_clinic'] = clinic_nearest
-
-print("✓ Distance calculations complete!")
-
-# Calculate summary statistics
-print("\n" + "="*60)
-print("ACCESSIBILITY METRICS")
-print("="*60)
-
-def print_distance_stats(distances, facility_type):
-    print(f"\n{facility_type}:")
-    print(f"  Average distance: {np.mean(distances):.2f} km")
-    print(f"  Median distance: {np.median(distances):.2f} km")
-    print(f"  Maximum distance: {np.max(distances):.2f} km")
-    print(f"  Minimum distance: {np.min(distances):.2f} km")
-    print(f"  Std deviation: {np.std(distances):.2f} km")
-
-print_distance_stats(all_distances, "Any Healthcare Facility")
-print_distance_stats(hospital_distances, "Hospitals")
-print_distance_stats(clinic_distances, "Clinics")
-
-# Coverage analysis
-print("\n" + "="*60)
-print("COVERAGE ANALYSIS")
-print("="*60)
-
-def calculate_coverage(distances, thresholds=[1, 2, 5, 10]):
-    """Calculate percentage of area within distance thresholds"""
-    total = len(distances)
-    coverage = {}
-    
-    for threshold in thresholds:
-        within = np.sum(distances <= threshold)
-        percentage = (within / total) * 100
-        coverage[threshold] = percentage
-    
-    return coverage
-
-# Coverage for any facility
-any_coverage = calculate_coverage(all_distances)
-print("\nArea within X km of ANY healthcare facility:")
-for dist, pct in any_coverage.items():
-    print(f"  Within {dist:2d} km: {pct:5.1f}%")
-
-# Coverage for hospitals
-hospital_coverage = calculate_coverage(hospital_distances)
-print("\nArea within X km of a HOSPITAL:")
-for dist, pct in hospital_coverage.items():
-    print(f"  Within {dist:2d} km: {pct:5.1f}%")
-
-# Identify underserved areas
-underserved_threshold = 5  # km
-underserved_points = grid_df[grid_df['distance_to_any_km'] > underserved_threshold]
-underserved_percentage = (len(underserved_points) / len(grid_df)) * 100
-
-print("\n" + "="*60)
-print("UNDERSERVED AREAS")
-print("="*60)
-print(f"Areas more than {underserved_threshold}km from nearest facility: {underserved_percentage:.1f}%")
-print(f"Number of underserved grid points: {len(underserved_points)}")
-
-# Save results
-grid_df.to_csv('data/processed/accessibility_grid.csv', index=False)
-print(f"\n✓ Grid data saved to: data/processed/accessibility_grid.csv")
-
-# Create summary statistics
-summary_stats = {
-    'total_facilities': len(facilities_df),
-    'hospitals': len(hospitals_df),
-    'clinics': len(clinics_df),
-    'pharmacies': len(pharmacies_df),
-    'avg_distance_any_km': np.mean(all_distances),
-    'median_distance_any_km': np.median(all_distances),
-    'max_distance_any_km': np.max(all_distances),
-    'avg_distance_hospital_km': np.mean(hospital_distances),
-    'median_distance_hospital_km': np.median(hospital_distances),
-    'coverage_1km_pct': any_coverage[1],
-    'coverage_2km_pct': any_coverage[2],
-    'coverage_5km_pct': any_coverage[5],
-    'coverage_10km_pct': any_coverage[10],
-    'underserved_area_pct': underserved_percentage,
-    'hospital_coverage_5km_pct': hospital_coverage[5],
-}
-
-summary_df = pd.DataFrame([summary_stats])
-summary_df.to_csv('outputs/accessibility_summary.csv', index=False)
-print(f"✓ Summary stats saved to: outputs/accessibility_summary.csv")
-
-# Create visualizations
-print("\n" + "="*60)
-print("CREATING VISUALIZATIONS...")
-print("="*60)
-
-# Set style
-sns.set_style("whitegrid")
-fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-
-# 1. Distance distribution histogram
-axes[0, 0].hist(all_distances, bins=50, color='steelblue', edgecolor='black', alpha=0.7)
-axes[0, 0].axvline(np.median(all_distances), color='red', linestyle='--', 
-                   linewidth=2, label=f'Median: {np.median(all_distances):.2f} km')
-axes[0, 0].set_xlabel('Distance to Nearest Facility (km)', fontsize=12)
-axes[0, 0].set_ylabel('Frequency', fontsize=12)
-axes[0, 0].set_title('Distribution of Distance to Nearest Healthcare Facility', 
-                      fontsize=14, fontweight='bold')
-axes[0, 0].legend()
-axes[0, 0].grid(axis='y', alpha=0.3)
-
-# 2. Coverage bar chart
-coverage_data = {
-    '1 km': any_coverage[1],
-    '2 km': any_coverage[2],
-    '5 km': any_coverage[5],
-    '10 km': any_coverage[10]
-}
-bars = axes[0, 1].bar(coverage_data.keys(), coverage_data.values(), 
-                      color=['#27ae60', '#f39c12', '#e74c3c', '#c0392b'],
-                      edgecolor='black')
-axes[0, 1].set_ylabel('Coverage (%)', fontsize=12)
-axes[0, 1].set_title('Area Coverage by Distance Threshold', fontsize=14, fontweight='bold')
-axes[0, 1].set_ylim([0, 100])
-axes[0, 1].grid(axis='y', alpha=0.3)
-
-# Add percentage labels on bars
-for bar in bars:
-    height = bar.get_height()
-    axes[0, 1].text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.1f}%', ha='center', va='bottom', fontweight='bold')
-
-# 3. Comparison: Any facility vs Hospital
-comparison_data = {
-    'Any Facility': [any_coverage[2], any_coverage[5]],
-    'Hospital Only': [hospital_coverage[2], hospital_coverage[5]]
-}
-x = np.arange(2)
-width = 0.35
-axes[1, 0].bar(x - width/2, comparison_data['Any Facility'], width, 
-               label='Any Facility', color='steelblue')
-axes[1, 0].bar(x + width/2, comparison_data['Hospital Only'], width, 
-               label='Hospital Only', color='crimson')
-axes[1, 0].set_ylabel('Coverage (%)', fontsize=12)
-axes[1, 0].set_title('Coverage Comparison: Any Facility vs Hospitals', 
-                     fontsize=14, fontweight='bold')
-axes[1, 0].set_xticks(x)
-axes[1, 0].set_xticklabels(['Within 2km', 'Within 5km'])
-axes[1, 0].legend()
-axes[1, 0].grid(axis='y', alpha=0.3)
-
-# 4. Key metrics summary
-axes[1, 1].axis('off')
-summary_text = f"""
+from config import BOUNDARY_PATH, CITY_NAME, GRID_MODE, LEAN_MODE, ZONES_PATH
+from compact_frames import compact_frame, lean_summary
+from facility_density import DENSITY_RADII_KM, EARTH_RADIUS_KM, category_slug, facility_density_table
+from floating_catchment import e2sfca
+from adaptive_grid import adaptive_grid
+from service_areas import (boundary_rings_km, bounds_polygon, exact_coverage, project_km,
+                           service_areas_geojson, voronoi_service_areas, write_service_areas)
+from study_boundary import boundary_bounds, load_boundary, points_in_boundary
+from zonal_stats import cached_zone_assignment, zonal_statistics
+from distance_surface import SURFACE_PATH, remove_surface, write_surface
+from coverage_stats import DistanceDistribution, coverage_curve, farthest_cells
+from opening_hours import opening_hours_masks, time_slice_table, time_sliced_distances
+from instrumentation import Trace
+
+CLEAN_PATH = 'data/processed/healthcare_facilities_clean.csv'
+GRID_PATH = 'data/processed/accessibility_grid.csv'
+
+# Uniform grid: 100x100 = 10,000 sample points
+GRID_SIZE = 100
+
+
+def load_facilities(path=CLEAN_PATH):
+    """Cleaned facility table written by data_cleaning.py"""
+    return pd.read_csv(path)
+
+
+def facility_layers(facilities_df):
+    """Facility subsets that get their own distance layer, as {layer: DataFrame}.
+
+    'any', 'hospital' and 'clinic' always; 'emergency' (facilities tagged
+    emergency=yes, whatever their category) only when there are any.
+    """
+    layers = {
+        'any': facilities_df,
+        'hospital': facilities_df[facilities_df['category'] == 'Hospital'],
+        'clinic': facilities_df[facilities_df['category'] == 'Clinic'],
+    }
+    if 'emergency' in facilities_df:
+        emergency_df = facilities_df[facilities_df['emergency'].astype(str).str.lower() == 'yes']
+        if len(emergency_df):
+            layers['emergency'] = emergency_df
+    return layers
+
+
+def study_bounds(facilities_df, study_polygons=None, padding=0.02):
+    """(lat_min, lat_max, lon_min, lon_max) of the study boundary, or of the facilities plus padding (~2 km)"""
+    if study_polygons is not None:
+        return boundary_bounds(study_polygons)
+    return (facilities_df['latitude'].min() - padding, facilities_df['latitude'].max() + padding,
+            facilities_df['longitude'].min() - padding, facilities_df['longitude'].max() + padding)
+
+
+def build_grid(lat_min, lat_max, lon_min, lon_max, facility_coord_sets=(), mode=GRID_MODE, grid_size=GRID_SIZE):
+    """Analysis grid points with 'cell_weight', the share of the study area each one stands for.
+
+    'uniform' is a grid_size x grid_size lattice (latitude-major);
+    'adaptive' is a quadtree refined where a coverage threshold of one of
+    facility_coord_sets ((lat, lon) arrays in radians) cuts through a cell.
+    """
+    if mode == 'adaptive':
+        return adaptive_grid(lat_min, lat_max, lon_min, lon_max, list(facility_coord_sets))
+    latitudes, longitudes = np.meshgrid(np.linspace(lat_min, lat_max, grid_size),
+                                        np.linspace(lon_min, lon_max, grid_size), indexing='ij')
+    grid_df = pd.DataFrame({'latitude': latitudes.ravel(), 'longitude': longitudes.ravel()})
+    # Every uniform grid point stands for the same share of the study area
+    grid_df['cell_weight'] = 1 / len(grid_df)
+    return grid_df
+
+
+def clip_grid(grid_df, study_polygons):
+    """Grid points inside the study boundary, with cell weights renormalized to sum to 1"""
+    inside = points_in_boundary(grid_df['latitude'].values, grid_df['longitude'].values, study_polygons)
+    grid_df = grid_df[inside].reset_index(drop=True)
+    grid_df['cell_weight'] /= grid_df['cell_weight'].sum()
+    return grid_df
+
+
+class FacilityIndex:
+    """KDTree over one facility layer, built once and reused for any number of queries.
+
+    Coordinates are indexed as radians (latitude, longitude); distances
+    are that planar metric times the Earth's radius, as everywhere in
+    the pipeline.
+    """
+
+    def __init__(self, facilities):
+        self.names = facilities['name'].values
+        self.positions = facilities[['latitude', 'longitude']].values
+        self.tree = cKDTree(np.radians(self.positions))
+
+    def __len__(self):
+        return len(self.names)
+
+    def query(self, latitudes, longitudes):
+        """Distance (km) to the nearest facility and its row position in the layer, for every point"""
+        distances_rad, indices = self.tree.query(np.radians(np.column_stack([latitudes, longitudes])))
+        return distances_rad * EARTH_RADIUS_KM, indices
+
+    def nearest(self, latitudes, longitudes):
+        """Distance (km) to the nearest facility and its name, for every point"""
+        distances, indices = self.query(latitudes, longitudes)
+        return distances, self.names[indices]
+
+    def count_within(self, latitudes, longitudes, radius_km, workers=-1):
+        """Number of facilities within radius_km of every point"""
+        return self.tree.query_ball_point(np.radians(np.column_stack([latitudes, longitudes])),
+                                          radius_km / EARTH_RADIUS_KM, return_length=True, workers=workers)
+
+
+def build_indexes(layers, trace=None):
+    """One FacilityIndex per facility layer, as {layer: index}"""
+    trace = trace or Trace('acessibility_analysis')
+    indexes = {}
+    for layer, facilities in layers.items():
+        with trace.span(f'tree_build:{layer}', rows=len(facilities)):
+            indexes[layer] = FacilityIndex(facilities)
+    return indexes
+
+
+def compute_surfaces(grid_df, indexes, trace=None):
+    """Nearest-facility distances (km) and names for every grid point, as {layer: (distances, names)}"""
+    trace = trace or Trace('acessibility_analysis')
+    surfaces = {}
+    for layer, index in indexes.items():
+        with trace.span(f'query:{layer}', rows=len(grid_df)):
+            surfaces[layer] = index.nearest(grid_df['latitude'].values, grid_df['longitude'].values)
+    return surfaces
+
+
+def underserved_cells(grid_df, surfaces, threshold_km=5, n=25):
+    """The n farthest grid points beyond threshold_km for each layer, one row per cell"""
+    frames = []
+    for layer, (distances, nearest) in surfaces.items():
+        top_cells = farthest_cells(distances, n=n, min_distance_km=threshold_km)
+        frames.append(pd.DataFrame({
+            'category': layer,
+            'rank': np.arange(1, len(top_cells) + 1),
+            'latitude': grid_df['latitude'].values[top_cells],
+            'longitude': grid_df['longitude'].values[top_cells],
+            'distance_km': distances[top_cells],
+            'nearest_facility': nearest[top_cells],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def surface_rasters(grid_df, surfaces, lat_min, lat_max, lon_min, lon_max, grid_size=GRID_SIZE):
+    """Distance layers of a uniform grid as (grid_size, grid_size) float32 rasters.
+
+    Points dropped by the study boundary stay NaN. Returns
+    ({layer: raster}, lat_step, lon_step).
+    """
+    lat_grid = np.linspace(lat_min, lat_max, grid_size)
+    lon_grid = np.linspace(lon_min, lon_max, grid_size)
+    lat_step = lat_grid[1] - lat_grid[0]
+    lon_step = lon_grid[1] - lon_grid[0]
+    rows = np.rint((grid_df['latitude'].values - lat_min) / lat_step).astype(np.int64)
+    cols = np.rint((grid_df['longitude'].values - lon_min) / lon_step).astype(np.int64)
+
+    rasters = {}
+    for layer, (distances, _) in surfaces.items():
+        raster = np.full((grid_size, grid_size), np.nan, dtype=np.float32)
+        raster[rows, cols] = distances
+        rasters[layer] = raster
+    return rasters, lat_step, lon_step
+
+
+def render_charts(summary_stats, any_distances, hospital_coverage, cell_weights, path=None):
+    """The four-panel accessibility figure: distance histogram, coverage, hospital comparison, key numbers.
+
+    summary_stats is the analysis summary row; saved to path when given.
+    Returns the matplotlib figure.
+    """
+    # Plotting libraries are only needed here
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    any_coverage = {threshold: summary_stats[f'coverage_{threshold}km_pct'] for threshold in (1, 2, 5, 10)}
+
+    # Set style
+    sns.set_style("whitegrid")
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+
+    # 1. Distance distribution histogram
+    axes[0, 0].hist(any_distances, bins=50, weights=cell_weights * len(cell_weights), color='steelblue', edgecolor='black', alpha=0.7)
+    axes[0, 0].axvline(summary_stats['median_distance_any_km'], color='red', linestyle='--', 
+                       linewidth=2, label=f"Median: {summary_stats['median_distance_any_km']:.2f} km")
+    axes[0, 0].set_xlabel('Distance to Nearest Facility (km)', fontsize=12)
+    axes[0, 0].set_ylabel('Frequency', fontsize=12)
+    axes[0, 0].set_title('Distribution of Distance to Nearest Healthcare Facility', 
+                          fontsize=14, fontweight='bold')
+    axes[0, 0].legend()
+    axes[0, 0].grid(axis='y', alpha=0.3)
+
+    # 2. Coverage bar chart
+    coverage_data = {
+        '1 km': any_coverage[1],
+        '2 km': any_coverage[2],
+        '5 km': any_coverage[5],
+        '10 km': any_coverage[10]
+    }
+    bars = axes[0, 1].bar(coverage_data.keys(), coverage_data.values(), 
+                          color=['#27ae60', '#f39c12', '#e74c3c', '#c0392b'],
+                          edgecolor='black')
+    axes[0, 1].set_ylabel('Coverage (%)', fontsize=12)
+    axes[0, 1].set_title('Area Coverage by Distance Threshold', fontsize=14, fontweight='bold')
+    axes[0, 1].set_ylim([0, 100])
+    axes[0, 1].grid(axis='y', alpha=0.3)
+
+    # Add percentage labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        axes[0, 1].text(bar.get_x() + bar.get_width()/2., height,
+                        f'{height:.1f}%', ha='center', va='bottom', fontweight='bold')
+
+    # 3. Comparison: Any facility vs Hospital
+    comparison_data = {
+        'Any Facility': [any_coverage[2], any_coverage[5]],
+        'Hospital Only': [hospital_coverage[2], hospital_coverage[5]]
+    }
+    x = np.arange(2)
+    width = 0.35
+    axes[1, 0].bar(x - width/2, comparison_data['Any Facility'], width, 
+                   label='Any Facility', color='steelblue')
+    axes[1, 0].bar(x + width/2, comparison_data['Hospital Only'], width, 
+                   label='Hospital Only', color='crimson')
+    axes[1, 0].set_ylabel('Coverage (%)', fontsize=12)
+    axes[1, 0].set_title('Coverage Comparison: Any Facility vs Hospitals', 
+                         fontsize=14, fontweight='bold')
+    axes[1, 0].set_xticks(x)
+    axes[1, 0].set_xticklabels(['Within 2km', 'Within 5km'])
+    axes[1, 0].legend()
+    axes[1, 0].grid(axis='y', alpha=0.3)
+
+    # 4. Key metrics summary
+    axes[1, 1].axis('off')
+    summary_text = f"""
 KEY FINDINGS
 
-Total Facilities: {len(facilities_df)}
-  • Hospitals: {len(hospitals_df)}
-  • Clinics: {len(clinics_df)}
-  • Pharmacies: {len(pharmacies_df)}
+Total Facilities: {summary_stats['total_facilities']}
+  • Hospitals: {summary_stats['hospitals']}
+  • Clinics: {summary_stats['clinics']}
+  • Pharmacies: {summary_stats['pharmacies']}
 
 Distance to Nearest Facility:
-  • Average: {np.mean(all_distances):.2f} km
-  • Median: {np.median(all_distances):.2f} km
-  • Maximum: {np.max(all_distances):.2f} km
+  • Average: {summary_stats['avg_distance_any_km']:.2f} km
+  • Median: {summary_stats['median_distance_any_km']:.2f} km
+  • Maximum: {np.max(any_distances):.2f} km
 
 Coverage:
   • Within 2km: {any_coverage[2]:.1f}%
   • Within 5km: {any_coverage[5]:.1f}%
   • Within 10km: {any_coverage[10]:.1f}%
 
-Underserved Areas (>5km): {underserved_percentage:.1f}%
+Underserved Areas (>5km): {summary_stats['underserved_area_pct']:.1f}%
 
 Hospital Access:
-  • Avg distance: {np.mean(hospital_distances):.2f} km
+  • Avg distance: {summary_stats['avg_distance_hospital_km']:.2f} km
   • Within 5km: {hospital_coverage[5]:.1f}%
 """
 
-axes[1, 1].text(0.1, 0.95, summary_text, transform=axes[1, 1].transAxes,
-                fontsize=11, verticalalignment='top', fontfamily='monospace',
-                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-plt.suptitle('Chennai Healthcare Accessibility Analysis', 
-             fontsize=16, fontweight='bold', y=0.995)
-plt.tight_layout()
-
-# Save figure
-plt.savefig('outputs/accessibility_analysis.png', dpi=300, bbox_inches='tight')
-print("✓ Visualization saved to: outputs/accessibility_analysis.png")
-
-plt.show()
-
-print("\n" + "="*60)
-print("ACCESSIBILITY ANALYSIS COMPLETE!")
-print("="*60)
-print("\nGenerated files:")
-print("  1. data/processed/accessibility_grid.csv - Detailed grid data")
-print("  2. outputs/accessibility_summary.csv - Summary statistics")
-print("  3. outputs/accessibility_analysis.png - Visualizations")
-print("\nNext step: Create accessibility heatmap")
\ No newline at end of file
+    axes[1, 1].text(0.1, 0.95, summary_text, transform=axes[1, 1].transAxes,
+                    fontsize=11, verticalalignment='top', fontfamily='monospace',
+                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    plt.suptitle(f'{CITY_NAME} Healthcare Accessibility Analysis', 
+                 fontsize=16, fontweight='bold', y=0.995)
+    plt.tight_layout()
+
+    if path:
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+    return fig
+
+
+def main():
+    print("="*60)
+    print("HEALTHCARE ACCESSIBILITY ANALYSIS")
+    print("="*60)
+
+    trace = Trace('acessibility_analysis')
+
+    # Load facility data
+    with trace.span('load') as span:
+        facilities_df = load_facilities()
+        span['rows'] = len(facilities_df)
+    print(f"\nLoaded {len(facilities_df)} healthcare facilities")
+    if LEAN_MODE:
+        # Coordinates keep float64: facility positions need sub-metre precision
+        facilities_df = compact_frame(facilities_df, 'facilities', trace, keep=('latitude', 'longitude'))
+
+    # Separate by type for specialized analysis
+    layers = facility_layers(facilities_df)
+    hospitals_df = layers['hospital']
+    clinics_df = layers['clinic']
+    pharmacies_df = facilities_df[facilities_df['category'] == 'Pharmacy']
+    has_emergency = 'emergency' in layers
+    emergency_df = layers.get('emergency', facilities_df.iloc[:0])
+
+    print(f"  - Hospitals: {len(hospitals_df)}")
+    print(f"  - Clinics: {len(clinics_df)}")
+    print(f"  - Pharmacies: {len(pharmacies_df)}")
+    print(f"  - Emergency-capable: {len(emergency_df)}")
+
+    # Get bounds of the study area; a city boundary keeps the grid off the
+    # sea and neighbouring districts
+    study_polygons = load_boundary(BOUNDARY_PATH) if os.path.exists(BOUNDARY_PATH) else None
+    lat_min, lat_max, lon_min, lon_max = study_bounds(facilities_df, study_polygons)
+    if study_polygons is not None:
+        print(f"\nUsing study boundary from {BOUNDARY_PATH} ({len(study_polygons)} polygons)")
+
+    print(f"\nStudy area bounds:")
+    print(f"  Latitude: {lat_min:.4f} to {lat_max:.4f}")
+    print(f"  Longitude: {lon_min:.4f} to {lon_max:.4f}")
+
+    # Create analysis grid
+    # Grid represents different locations across the city
+    if GRID_MODE == 'adaptive':
+        print(f"\nCreating adaptive analysis grid (refined near coverage thresholds)...")
+    else:
+        print(f"\nCreating {GRID_SIZE}x{GRID_SIZE} analysis grid ({GRID_SIZE*GRID_SIZE} points)...")
+    with trace.span('grid_build') as span:
+        grid_df = build_grid(lat_min, lat_max, lon_min, lon_max,
+                             [np.radians(df[['latitude', 'longitude']].values) for df in layers.values()])
+        span['rows'] = len(grid_df)
+    if GRID_MODE == 'adaptive':
+        print(f"  Refinement queries: {grid_df.attrs['refinement_queries']}")
+        print(f"  Finest cell depth: {grid_df['depth'].max()}")
+
+    if study_polygons is not None:
+        # Drop points outside the boundary before any distance queries
+        with trace.span('boundary_mask', rows=len(grid_df)):
+            points_before = len(grid_df)
+            grid_df = clip_grid(grid_df, study_polygons)
+        print(f"  Points inside study boundary: {len(grid_df)} of {points_before}")
+
+    if LEAN_MODE:
+        grid_df = compact_frame(grid_df, 'grid', trace, keep=('latitude', 'longitude'))
+    cell_weights = grid_df['cell_weight'].values
+    print(f"✓ Grid created with {len(grid_df)} analysis points")
+
+    # Calculate distances to different facility types: one KDTree per layer
+    print("\n" + "="*60)
+    print("CALCULATING DISTANCES...")
+    print("="*60)
+
+    if not has_emergency:
+        print("\nNo facilities tagged emergency=yes; skipping the emergency layer")
+    print(f"\nCalculating distances to the nearest facility of each layer ({', '.join(layers)})...")
+    indexes = build_indexes(layers, trace)
+    surfaces = compute_surfaces(grid_df, indexes, trace)
+    if LEAN_MODE:
+        surfaces = {layer: (distances.astype(np.float32), nearest) for layer, (distances, nearest) in surfaces.items()}
+    for layer, (distances, nearest) in surfaces.items():
+        grid_df[f'distance_to_{layer}_km'] = distances
+        grid_df['nearest_facility' if layer == 'any' else f'nearest_{layer}'] = nearest
+    all_distances = surfaces['any'][0]
+    hospital_distances = surfaces['hospital'][0]
+    clinic_distances = surfaces['clinic'][0]
+    if has_emergency:
+        emergency_distances = surfaces['emergency'][0]
+
+    print("✓ Distance calculations complete!")
+
+    # Facility supply density: how many facilities lie within each radius
+    print("\n" + "="*60)
+    print("FACILITY DENSITY")
+    print("="*60)
+
+    with trace.span('density', rows=len(grid_df)):
+        density_df = facility_density_table(grid_df, facilities_df)
+        grid_df = pd.concat([grid_df, density_df], axis=1)
+
+    print("\nAverage number of facilities within X km of a grid point:")
+    for radius in DENSITY_RADII_KM:
+        avg_any = np.average(grid_df[f'facilities_within_{radius}km'], weights=cell_weights)
+        hospital_counts = grid_df.get(f'hospital_within_{radius}km', np.zeros(len(grid_df)))
+        avg_hospital = np.average(hospital_counts, weights=cell_weights)
+        print(f"  Within {radius} km: {avg_any:6.1f} facilities ({avg_hospital:.1f} hospitals)")
+    print(f"✓ Density surfaces computed for {len(density_df.columns)} category/radius combinations")
+
+    # Competition-aware accessibility (E2SFCA): supply per unit of demand in reach
+    print("\n" + "="*60)
+    print("E2SFCA ACCESSIBILITY INDEX")
+    print("="*60)
+
+    catchment_km = 5
+    grid_coords = np.radians(grid_df[['latitude', 'longitude']].values)
+    # Without population data demand is proportional to cell area, with the
+    # whole study area fixed at GRID_SIZE x GRID_SIZE units. That is one unit
+    # per cell only on an unclipped uniform grid: after boundary clipping
+    # each kept cell carries more, and adaptive cells carry their area
+    # share. A fixed total keeps scores comparable across grid modes.
+    if 'population' in grid_df:
+        demand = grid_df['population'].values
+    else:
+        demand = cell_weights * GRID_SIZE * GRID_SIZE
+
+    for column, facilities in [('e2sfca_any', facilities_df), ('e2sfca_hospital', hospitals_df)]:
+        supply = facilities['capacity'].values if 'capacity' in facilities else None
+        facility_coords = np.radians(facilities[['latitude', 'longitude']].values)
+        with trace.span(f'e2sfca:{column}', rows=len(grid_df)):
+            grid_df[column] = e2sfca(grid_coords, facility_coords, demand, supply,
+                                     catchment_km=catchment_km, decay='gaussian')
+        no_access = cell_weights[grid_df[column].values == 0].sum() / cell_weights.sum() * 100
+        print(f"\n{column} ({catchment_km} km gaussian catchment):")
+        print(f"  Mean index: {np.average(grid_df[column], weights=cell_weights):.4f}")
+        print(f"  Median index: {DistanceDistribution(grid_df[column].values, cell_weights).median:.4f}")
+        print(f"  Cells with no facility in catchment: {no_access:.1f}%")
+
+    if LEAN_MODE:
+        # Nearest-facility names become categoricals, counts small integers
+        print()
+        grid_df = compact_frame(grid_df, 'grid_results', trace, keep=('latitude', 'longitude'))
+
+    # Calculate summary statistics
+    print("\n" + "="*60)
+    print("ACCESSIBILITY METRICS")
+    print("="*60)
+
+    # Sort each distance array once (weighted by the share of the study area
+    # each grid cell covers); every statistic below is then a lookup
+    with trace.span('distance_stats', rows=len(grid_df)):
+        distributions = {
+            'any': DistanceDistribution(all_distances, cell_weights),
+            'hospital': DistanceDistribution(hospital_distances, cell_weights),
+            'clinic': DistanceDistribution(clinic_distances, cell_weights),
+        }
+        if has_emergency:
+            distributions['emergency'] = DistanceDistribution(emergency_distances, cell_weights)
+
+    def print_distance_stats(distribution, facility_type):
+        print(f"\n{facility_type}:")
+        print(f"  Average distance: {distribution.mean:.2f} km")
+        print(f"  Median distance: {distribution.median:.2f} km")
+        print(f"  Maximum distance: {distribution.max:.2f} km")
+        print(f"  Minimum distance: {distribution.min:.2f} km")
+        print(f"  Std deviation: {distribution.std:.2f} km")
+
+    print_distance_stats(distributions['any'], "Any Healthcare Facility")
+    print_distance_stats(distributions['hospital'], "Hospitals")
+    print_distance_stats(distributions['clinic'], "Clinics")
+    if has_emergency:
+        print_distance_stats(distributions['emergency'], "Emergency Facilities")
+
+    # Coverage analysis
+    print("\n" + "="*60)
+    print("COVERAGE ANALYSIS")
+    print("="*60)
+
+    coverage_thresholds = [1, 2, 5, 10]
+
+    # Coverage for any facility
+    any_coverage = distributions['any'].coverage(coverage_thresholds)
+    print("\nArea within X km of ANY healthcare facility:")
+    for dist, pct in any_coverage.items():
+        print(f"  Within {dist:2d} km: {pct:5.1f}%")
+
+    # Coverage for hospitals
+    hospital_coverage = distributions['hospital'].coverage(coverage_thresholds)
+    print("\nArea within X km of a HOSPITAL:")
+    for dist, pct in hospital_coverage.items():
+        print(f"  Within {dist:2d} km: {pct:5.1f}%")
+
+    # Coverage for emergency-capable facilities
+    if has_emergency:
+        emergency_coverage = distributions['emergency'].coverage(coverage_thresholds)
+        print("\nArea within X km of an EMERGENCY facility:")
+        for dist, pct in emergency_coverage.items():
+            print(f"  Within {dist:2d} km: {pct:5.1f}%")
+
+    # Exact coverage from nearest-facility service areas (Voronoi cells)
+    print("\n" + "="*60)
+    print("EXACT COVERAGE (SERVICE AREAS)")
+    print("="*60)
+
+    if study_polygons is not None:
+        study_boundary = boundary_rings_km(study_polygons)
+    else:
+        study_boundary = [bounds_polygon(*project_km([lat_min], [lon_min])[0], *project_km([lat_max], [lon_max])[0])]
+    service_area_features = []
+    exact_coverages = {}
+    with trace.span('service_areas', rows=len(facilities_df)):
+        service_layers = [('any', facilities_df), ('hospital', hospitals_df), ('clinic', clinics_df)]
+        if has_emergency:
+            service_layers.append(('emergency', emergency_df))
+        for key, facilities in service_layers:
+            sites = project_km(facilities['latitude'].values, facilities['longitude'].values)
+            service_areas = voronoi_service_areas(sites, study_boundary)
+            exact_coverages[key] = exact_coverage(service_areas, sites, study_boundary)
+            service_area_features += service_areas_geojson(service_areas, facilities, key)
+
+    print("\nArea within X km of ANY healthcare facility (exact vs grid estimate):")
+    for dist, pct in exact_coverages['any'].items():
+        print(f"  Within {dist:2d} km: {pct:5.1f}% (grid: {any_coverage[dist]:5.1f}%)")
+
+    with trace.span('geojson_write', rows=len(service_area_features)):
+        write_service_areas(service_area_features, 'data/processed/service_areas.geojson')
+    print(f"\n✓ {len(service_area_features)} service areas saved to: data/processed/service_areas.geojson")
+
+    # Identify underserved areas
+    underserved_threshold = 5  # km
+    underserved_percentage = (1 - distributions['any'].cdf(underserved_threshold)) * 100
+    underserved_count = len(all_distances) - np.searchsorted(
+        distributions['any'].sorted_distances, underserved_threshold, side='right'
+    )
+
+    print("\n" + "="*60)
+    print("UNDERSERVED AREAS")
+    print("="*60)
+    print(f"Areas more than {underserved_threshold}km from nearest facility: {underserved_percentage:.1f}%")
+    print(f"Number of underserved grid points: {underserved_count}")
+
+    # Keep the most underserved cells per category so the report never has to
+    # reload the full grid
+    underserved_df = underserved_cells(grid_df, surfaces, underserved_threshold)
+    underserved_df.to_csv('outputs/underserved_cells.csv', index=False)
+    print("✓ Most underserved cells per category saved to: outputs/underserved_cells.csv")
+
+    # Coverage-vs-distance curves (0-20 km in 100 m steps) for every category
+    print("\n" + "="*60)
+    print("COVERAGE CURVES")
+    print("="*60)
+
+    with trace.span('coverage_curves', rows=len(grid_df)):
+        curve_distributions = {'any': distributions['any']}
+        category_indexes = build_indexes(
+            {category_slug(category): category_df for category, category_df in facilities_df.groupby('category')},
+            trace,
+        )
+        for slug, (category_distances, _) in compute_surfaces(grid_df, category_indexes, trace).items():
+            curve_distributions[slug] = DistanceDistribution(category_distances, cell_weights)
+
+        curve_df = coverage_curve(curve_distributions, max_km=20, step_km=0.1)
+        curve_df.to_csv('outputs/coverage_curves.csv', index=False)
+    print(f"\n✓ Coverage curves for {len(curve_distributions)} categories saved to: outputs/coverage_curves.csv")
+
+    # Accessibility hour by hour through the week, from OSM opening_hours
+    print("\n" + "="*60)
+    print("TIME-SLICED ACCESSIBILITY")
+    print("="*60)
+
+    with trace.span('opening_hours', rows=len(facilities_df)):
+        hours_text = facilities_df['opening_hours'] if 'opening_hours' in facilities_df else [''] * len(facilities_df)
+        packed_hours, known_hours, unparsed_hours = opening_hours_masks(hours_text)
+    print(f"\nFacilities with parsed opening hours: {known_hours.sum()} of {len(facilities_df)} "
+          f"(those without any are assumed always open)")
+    if unparsed_hours.any():
+        examples = ', '.join(repr(v) for v in pd.unique(np.asarray(hours_text, dtype=object)[unparsed_hours])[:3])
+        print(f"⚠ {unparsed_hours.sum()} facilities have opening_hours that could not be parsed "
+              f"and are counted as closed (e.g. {examples})")
+
+    slice_distances = {}
+    slice_masks = {}
+    for key, facilities in [('any', facilities_df), ('hospital', hospitals_df)]:
+        positions = facilities_df.index.get_indexer(facilities.index)
+        slice_masks[key] = packed_hours[positions]
+        with trace.span(f'time_slices:{key}', rows=len(grid_df)):
+            slice_distances[key] = time_sliced_distances(
+                grid_coords, np.radians(facilities[['latitude', 'longitude']].values), slice_masks[key]
+            )
+        print(f"  {key}: 168 hours from {len(slice_distances[key][0])} distinct open sets")
+
+    time_slice_df = time_slice_table(slice_distances, slice_masks, cell_weights, threshold_km=underserved_threshold)
+    time_slice_df.to_csv('outputs/time_slice_accessibility.csv', index=False)
+    worst_hour = time_slice_df.loc[time_slice_df['coverage_any_5km_pct'].idxmin()]
+    print(f"\nLowest 5km coverage: {worst_hour['coverage_any_5km_pct']:.1f}% "
+          f"({worst_hour['weekday']} {int(worst_hour['hour']):02d}:00, {int(worst_hour['open_any'])} facilities open)")
+    print(f"✓ Hourly accessibility saved to: outputs/time_slice_accessibility.csv")
+
+    # Per-ward statistics when zone polygons are available
+    if os.path.exists(ZONES_PATH):
+        print("\n" + "="*60)
+        print("ZONE STATISTICS")
+        print("="*60)
+
+        with trace.span('zone_assignment', rows=len(grid_df)):
+            zone_names, zone_ids, from_cache = cached_zone_assignment(
+                grid_df['latitude'].values, grid_df['longitude'].values, ZONES_PATH
+            )
+        print(f"\nAssigned grid points to {len(zone_names)} zones"
+              f" ({'cached' if from_cache else 'computed'}; {(zone_ids < 0).sum()} points outside all zones)")
+
+        with trace.span('zonal_statistics', rows=len(grid_df)):
+            zone_layers = {'any': all_distances, 'hospital': hospital_distances, 'clinic': clinic_distances}
+            if has_emergency:
+                zone_layers['emergency'] = emergency_distances
+            zone_df = zonal_statistics(zone_ids, zone_names, zone_layers, cell_weights)
+            zone_df.to_csv('outputs/zonal_stats.csv', index=False)
+
+        print("\nZones with the lowest 5km coverage:")
+        for _, zone in zone_df.nsmallest(5, 'coverage_any_5km_pct').iterrows():
+            print(f"  {zone['zone']:30s} {zone['coverage_any_5km_pct']:5.1f}% within 5km, "
+                  f"median {zone['median_distance_any_km']:.2f} km")
+        print(f"\n✓ Zone statistics saved to: outputs/zonal_stats.csv")
+
+    # Save results
+    with trace.span('csv_write', rows=len(grid_df)):
+        grid_df.to_csv(GRID_PATH, index=False)
+    print(f"\n✓ Grid data saved to: {GRID_PATH}")
+
+    # Share the distance surfaces with the heatmap and report as memory-mapped
+    # float32 arrays (only a uniform grid maps onto a regular raster)
+    if GRID_MODE == 'adaptive':
+        remove_surface(SURFACE_PATH)
+    else:
+        surface_layers, lat_step, lon_step = surface_rasters(grid_df, surfaces, lat_min, lat_max, lon_min, lon_max)
+        with trace.span('surface_write', rows=len(grid_df)):
+            write_surface(SURFACE_PATH, surface_layers, lat_min, lon_min, lat_step, lon_step)
+        print(f"✓ Distance surfaces saved to: {SURFACE_PATH}.f32 (+ .json header)")
+
+    # Create summary statistics
+    summary_stats = {
+        'total_facilities': len(facilities_df),
+        'hospitals': len(hospitals_df),
+        'clinics': len(clinics_df),
+        'pharmacies': len(pharmacies_df),
+        'avg_distance_any_km': distributions['any'].mean,
+        'median_distance_any_km': distributions['any'].median,
+        'max_distance_any_km': distributions['any'].max,
+        'avg_distance_hospital_km': distributions['hospital'].mean,
+        'median_distance_hospital_km': distributions['hospital'].median,
+        'coverage_1km_pct': any_coverage[1],
+        'coverage_2km_pct': any_coverage[2],
+        'coverage_5km_pct': any_coverage[5],
+        'coverage_10km_pct': any_coverage[10],
+        'underserved_area_pct': underserved_percentage,
+        'underserved_cells': underserved_count,
+        'hospital_coverage_5km_pct': hospital_coverage[5],
+        'facilities_with_opening_hours': int(known_hours.sum()),
+        'facilities_with_unparsed_opening_hours': int(unparsed_hours.sum()),
+        'min_hourly_coverage_5km_pct': time_slice_df['coverage_any_5km_pct'].min(),
+        'min_hourly_hospital_coverage_5km_pct': time_slice_df['coverage_hospital_5km_pct'].min(),
+    }
+    for threshold, pct in exact_coverages['any'].items():
+        summary_stats[f'exact_coverage_{threshold}km_pct'] = pct
+    summary_stats['exact_underserved_area_pct'] = 100 - exact_coverages['any'][5]
+    summary_stats['exact_hospital_coverage_5km_pct'] = exact_coverages['hospital'][5]
+    summary_stats['emergency_facilities'] = len(emergency_df)
+    if has_emergency:
+        summary_stats['avg_distance_emergency_km'] = distributions['emergency'].mean
+        summary_stats['median_distance_emergency_km'] = distributions['emergency'].median
+        summary_stats['max_distance_emergency_km'] = distributions['emergency'].max
+        for threshold, pct in emergency_coverage.items():
+            summary_stats[f'emergency_coverage_{threshold}km_pct'] = pct
+        summary_stats['exact_emergency_coverage_5km_pct'] = exact_coverages['emergency'][5]
+    summary_stats['avg_e2sfca_any'] = np.average(grid_df['e2sfca_any'], weights=cell_weights)
+    summary_stats['avg_e2sfca_hospital'] = np.average(grid_df['e2sfca_hospital'], weights=cell_weights)
+    for radius in DENSITY_RADII_KM:
+        summary_stats[f'avg_facilities_within_{radius}km'] = np.average(
+            grid_df[f'facilities_within_{radius}km'], weights=cell_weights
+        )
+    # Grid shape, so the report can describe it in any mode
+    summary_stats['grid_mode'] = GRID_MODE
+    summary_stats['grid_size'] = GRID_SIZE
+    summary_stats['grid_points'] = len(grid_df)
+    summary_stats['boundary_clipped'] = study_polygons is not None
+
+    summary_df = pd.DataFrame([summary_stats])
+    summary_df.to_csv('outputs/accessibility_summary.csv', index=False)
+    print(f"✓ Summary stats saved to: outputs/accessibility_summary.csv")
+
+    # Create visualizations
+    print("\n" + "="*60)
+    print("CREATING VISUALIZATIONS...")
+    print("="*60)
+
+    with trace.span('chart_render'):
+        render_charts(summary_stats, all_distances, hospital_coverage, cell_weights,
+                      'outputs/accessibility_analysis.png')
+    print("✓ Visualization saved to: outputs/accessibility_analysis.png")
+
+    import matplotlib.pyplot as plt
+    plt.show()
+
+    print("\n" + "="*60)
+    print("ACCESSIBILITY ANALYSIS COMPLETE!")
+    print("="*60)
+    print("\nGenerated files:")
+    print("  1. data/processed/accessibility_grid.csv - Detailed grid data")
+    print("  2. outputs/accessibility_summary.csv - Summary statistics")
+    print("  3. outputs/accessibility_analysis.png - Visualizations")
+    print("  4. data/processed/service_areas.geojson - Nearest-facility service areas")
+    print("  5. outputs/coverage_curves.csv - Coverage vs distance for every category")
+    print("  6. outputs/underserved_cells.csv - Most underserved cells per category")
+    print("\nNext step: Create accessibility heatmap")
+    if LEAN_MODE:
+        print(f"\n{lean_summary(trace)}")
+    print(f"\n✓ Stage trace saved to: {trace.save()}")
+
+
+if __name__ == '__main__':
+    main()
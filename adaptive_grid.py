@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from facility_density import EARTH_RADIUS_KM
+
+
+def adaptive_grid(lat_min, lat_max, lon_min, lon_max, facility_coord_sets,
+                  thresholds_km=(1, 2, 5, 10), base_size=16, max_depth=6):
+    """Build a quadtree sampling grid that is only refined near coverage boundaries.
+
+    Starts from a base_size x base_size grid over the study area and
+    recursively splits cells into four. The distance to the nearest
+    facility changes by at most the distance moved, so a cell whose
+    centre distance d and half-diagonal h satisfy d + h <= t lies entirely
+    within threshold t, and one with d - h > t lies entirely outside it.
+    Only cells where some threshold falls inside [d - h, d + h] for some
+    facility set are split; everything else becomes a leaf after a single
+    query. The finest cells match a uniform grid with
+    base_size * 2**max_depth points per side.
+
+    facility_coord_sets is a list of (latitude, longitude) arrays in
+    radians (e.g. all facilities, hospitals, clinics). Returns a
+    DataFrame of leaf cell centres with their sizes and 'cell_weight',
+    the fraction of the study area each leaf covers, so coverage can be
+    computed as an area-weighted share of leaves.
+    """
+    trees = [cKDTree(coords) for coords in facility_coord_sets if len(coords) > 0]
+    thresholds = np.asarray(thresholds_km, dtype=float)
+
+    lat_step = (lat_max - lat_min) / base_size
+    lon_step = (lon_max - lon_min) / base_size
+    lat_centers, lon_centers = np.meshgrid(
+        lat_min + (np.arange(base_size) + 0.5) * lat_step,
+        lon_min + (np.arange(base_size) + 0.5) * lon_step,
+        indexing='ij',
+    )
+    lat_centers = lat_centers.ravel()
+    lon_centers = lon_centers.ravel()
+
+    leaves = []
+    queries = 0
+    for depth in range(max_depth + 1):
+        coords = np.radians(np.column_stack([lat_centers, lon_centers]))
+        half_diagonal_km = np.radians(np.hypot(lat_step, lon_step)) / 2 * EARTH_RADIUS_KM
+
+        undecided = np.zeros(len(coords), dtype=bool)
+        if depth < max_depth:
+            for tree in trees:
+                distances_km = tree.query(coords, workers=-1)[0] * EARTH_RADIUS_KM
+                # Does any threshold cut through the range of distances inside the cell?
+                low = distances_km[:, None] - half_diagonal_km
+                high = distances_km[:, None] + half_diagonal_km
+                undecided |= ((low < thresholds) & (thresholds < high)).any(axis=1)
+            queries += len(coords) * len(trees)
+
+        leaves.append(pd.DataFrame({
+            'latitude': lat_centers[~undecided],
+            'longitude': lon_centers[~undecided],
+            'cell_lat_size': lat_step,
+            'cell_lon_size': lon_step,
+            'depth': depth,
+        }))
+
+        if not undecided.any():
+            break
+
+        # Split undecided cells into their four children
+        lat_step /= 2
+        lon_step /= 2
+        offsets_lat = np.array([-0.5, -0.5, 0.5, 0.5]) * lat_step
+        offsets_lon = np.array([-0.5, 0.5, -0.5, 0.5]) * lon_step
+        lat_centers = (lat_centers[undecided][:, None] + offsets_lat).ravel()
+        lon_centers = (lon_centers[undecided][:, None] + offsets_lon).ravel()
+
+    grid_df = pd.concat(leaves, ignore_index=True)
+    total_area = (lat_max - lat_min) * (lon_max - lon_min)
+    grid_df['cell_weight'] = grid_df['cell_lat_size'] * grid_df['cell_lon_size'] / total_area
+    grid_df.attrs['refinement_queries'] = queries
+    return grid_df
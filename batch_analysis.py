@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import runpy
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from facility_density import category_slug
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline stages run for every city, in order
+COLLECTION_STAGE = 'data_collection.py'
+ANALYSIS_STAGES = ['data_cleaning.py', 'acessibility_analysis.py', 'generate_final_report.py']
+
+
+def load_regions(path):
+    """Load the list of regions to analyse.
+
+    The file is a CSV with a 'city' column and optional 'state', 'country',
+    'extract', 'boundary' and 'zones' columns. 'extract' points to a local raw
+    facility CSV in the data/raw/osm_healthcare_facilities.csv format;
+    cities with an extract skip the Overpass query. 'boundary' points to
+    a GeoJSON study-area boundary and 'zones' to GeoJSON ward polygons.
+    """
+    regions = pd.read_csv(path, dtype=str).fillna('')
+    if 'city' not in regions.columns:
+        raise ValueError(f"{path} must have a 'city' column")
+    for column, default in [('state', ''), ('country', 'India'), ('extract', ''), ('boundary', ''), ('zones', '')]:
+        if column not in regions.columns:
+            regions[column] = default
+
+    # Input file paths are relative to the regions file
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for column in ['extract', 'boundary', 'zones']:
+        regions[column] = [
+            os.path.join(base_dir, value) if value else ''
+            for value in regions[column]
+        ]
+    return regions.to_dict('records')
+
+
+def run_city(region, output_dir):
+    """Run the full pipeline for one city inside its own output directory.
+
+    Runs in a fresh worker process: the city is passed to the stage
+    scripts through the HEALTHCARE_* environment variables read by
+    config.py, and every relative data/ and outputs/ path resolves inside
+    the city directory.
+    """
+    city_dir = os.path.join(output_dir, category_slug(region['city']))
+    for sub_dir in ['data/raw', 'data/processed', 'outputs']:
+        os.makedirs(os.path.join(city_dir, sub_dir), exist_ok=True)
+
+    os.environ['HEALTHCARE_CITY'] = region['city']
+    os.environ['HEALTHCARE_STATE'] = region['state']
+    os.environ['HEALTHCARE_COUNTRY'] = region['country']
+    os.environ['MPLBACKEND'] = 'Agg'
+    os.chdir(city_dir)
+    sys.path.insert(0, REPO_DIR)
+
+    start = time.time()
+    status = 'ok'
+    with open('pipeline.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        stages = ANALYSIS_STAGES if region['extract'] else [COLLECTION_STAGE] + ANALYSIS_STAGES
+        stage = 'inputs'
+        try:
+            if region['extract']:
+                shutil.copyfile(region['extract'], 'data/raw/osm_healthcare_facilities.csv')
+            if region['boundary']:
+                shutil.copyfile(region['boundary'], 'data/boundary.geojson')
+            if region['zones']:
+                shutil.copyfile(region['zones'], 'data/zones.geojson')
+            for stage in stages:
+                runpy.run_path(os.path.join(REPO_DIR, stage), run_name='__main__')
+        except BaseException as e:
+            traceback.print_exc()
+            status = f'failed in {stage}: {type(e).__name__}'
+
+    return {
+        'city': region['city'],
+        'status': status,
+        'runtime_s': round(time.time() - start, 2),
+        'output_dir': city_dir,
+    }
+
+
+def combine_summaries(results):
+    """Stack every city's accessibility_summary.csv into one cross-city table"""
+    rows = []
+    for result in results:
+        summary_path = os.path.join(result['output_dir'], 'outputs', 'accessibility_summary.csv')
+        summary = {}
+        if result['status'] == 'ok' and os.path.exists(summary_path):
+            summary = pd.read_csv(summary_path).iloc[0].to_dict()
+        rows.append({'city': result['city'], 'status': result['status'],
+                     'runtime_s': result['runtime_s'], **summary})
+    return pd.DataFrame(rows).sort_values('city')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the accessibility pipeline for many cities in parallel')
+    parser.add_argument('regions', help="CSV with 'city' and optional 'state', 'country', 'extract', 'boundary', 'zones' columns")
+    parser.add_argument('--output-dir', default='outputs/batch', help='Root directory for per-city outputs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("MULTI-CITY BATCH ANALYSIS")
+    print("="*60)
+
+    regions = load_regions(args.regions)
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"\nLoaded {len(regions)} regions, running with {args.workers} workers")
+
+    # One fresh process per city so per-city settings and imports never leak
+    results = []
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as executor:
+        futures = [executor.submit(run_city, region, output_dir) for region in regions]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            mark = '✓' if result['status'] == 'ok' else '✗'
+            print(f"  {mark} {result['city']}: {result['status']} ({result['runtime_s']:.1f}s)")
+
+    combined = combine_summaries(results)
+    combined_path = os.path.join(output_dir, 'cross_city_summary.csv')
+    combined.to_csv(combined_path, index=False)
+
+    print(f"\n{'='*60}")
+    print("BATCH COMPLETE!")
+    print(f"{'='*60}")
+    print(f"Total wall time: {time.time() - start:.1f}s")
+    print(f"Cities succeeded: {(combined['status'] == 'ok').sum()}/{len(combined)}")
+    columns = [c for c in ['city', 'total_facilities', 'median_distance_any_km',
+                           'coverage_5km_pct', 'underserved_area_pct'] if c in combined.columns]
+    print(f"\n{combined[columns].to_string(index=False)}")
+    print(f"\n✓ Cross-city summary saved to: {combined_path}")
+
+
+if __name__ == '__main__':
+    main()
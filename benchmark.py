@@ -0,0 +1,375 @@
+import argparse
+import gc
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from acessibility_analysis import FacilityIndex, build_grid, study_bounds
+from batch_analysis import REPO_DIR
+from instrumentation import peak_rss_mb
+
+# Share of each raw OSM facility type in a synthetic city (roughly Chennai's mix)
+FACILITY_TYPES = {
+    'hospital': 0.43, 'clinic': 0.25, 'pharmacy': 0.15, 'dentist': 0.06,
+    'doctors': 0.04, 'centre': 0.04, 'laboratory': 0.02, 'physiotherapist': 0.01,
+}
+
+# Sizes covered by each preset; 'full' goes up to 1M facilities and 100M grid cells
+SIZE_PRESETS = {
+    'quick': {
+        'facilities': [1_000, 10_000],
+        'grid_cells': [10_000, 100_000, 1_000_000],
+        'pipeline_facilities': [1_000],
+    },
+    'full': {
+        'facilities': [1_000, 10_000, 100_000, 1_000_000],
+        'grid_cells': [10_000, 100_000, 1_000_000, 10_000_000, 100_000_000],
+        'pipeline_facilities': [1_000, 10_000, 100_000],
+    },
+}
+
+# Scripts timed end to end on a synthetic city, in pipeline order
+PIPELINE_STAGES = ['data_cleaning.py', 'acessibility_analysis.py', 'create_heatmap.py', 'generate_final_report.py']
+
+# A stage counts as regressed when it is this much slower than the baseline run
+REGRESSION_RATIO = 1.2
+
+
+def synthetic_city(n_facilities, center=(13.05, 80.22), radius_km=20, seed=0):
+    """Clustered synthetic facility extract in the raw OSM CSV format.
+
+    Facilities sit in neighbourhood clusters whose sizes follow a heavy
+    tailed distribution and whose centres thin out away from the city
+    centre, plus a 10% scattered background, which mimics the dense core
+    and sparse fringe of a real city.
+    """
+    rng = np.random.default_rng(seed)
+    km_per_deg_lat = 111.32
+    km_per_deg_lon = km_per_deg_lat * np.cos(np.radians(center[0]))
+
+    n_clusters = max(5, int(np.sqrt(n_facilities) / 2))
+    cluster_distance = rng.exponential(radius_km / 3, n_clusters).clip(0, radius_km)
+    cluster_angle = rng.uniform(0, 2 * np.pi, n_clusters)
+    cluster_x = cluster_distance * np.cos(cluster_angle)
+    cluster_y = cluster_distance * np.sin(cluster_angle)
+    cluster_spread = rng.uniform(0.3, 1.5, n_clusters)
+    cluster_share = rng.pareto(1.5, n_clusters) + 1
+
+    n_background = n_facilities // 10
+    owners = rng.choice(n_clusters, n_facilities - n_background, p=cluster_share / cluster_share.sum())
+    x = np.concatenate([cluster_x[owners] + rng.normal(0, 1, len(owners)) * cluster_spread[owners],
+                        rng.uniform(-radius_km, radius_km, n_background)])
+    y = np.concatenate([cluster_y[owners] + rng.normal(0, 1, len(owners)) * cluster_spread[owners],
+                        rng.uniform(-radius_km, radius_km, n_background)])
+
+    types = rng.choice(list(FACILITY_TYPES), n_facilities, p=list(FACILITY_TYPES.values()))
+    return pd.DataFrame({
+        'id': np.arange(1, n_facilities + 1) + 10**9,
+        'name': [f'{t.title()} {i}' for i, t in enumerate(types)],
+        'type': types,
+        'latitude': center[0] + y / km_per_deg_lat,
+        'longitude': center[1] + x / km_per_deg_lon,
+        'address': None,
+        'phone': None,
+        'operator': None,
+        'emergency': np.where(rng.random(n_facilities) < 0.02, 'yes', 'no'),
+        'source': 'synthetic',
+    })
+
+
+def synthetic_grid_axes(facilities, grid_cells):
+    """Latitude and longitude axes of a square grid over the facilities, padded like the analysis"""
+    side = int(round(np.sqrt(grid_cells)))
+    latitudes = np.linspace(facilities['latitude'].min() - 0.02, facilities['latitude'].max() + 0.02, side)
+    longitudes = np.linspace(facilities['longitude'].min() - 0.02, facilities['longitude'].max() + 0.02, side)
+    return latitudes, longitudes
+
+
+def grid_coordinates(latitudes, longitudes):
+    lon_grid, lat_grid = np.meshgrid(longitudes, latitudes)
+    return np.radians(np.column_stack([lat_grid.ravel(), lon_grid.ravel()]))
+
+
+# --- Stages: each takes the synthetic facilities and a grid size, returns rows processed ---
+
+def stage_grid_build(facilities, grid_cells):
+    """Uniform analysis grid from acessibility_analysis.build_grid over the facilities' bounds"""
+    side = int(round(np.sqrt(grid_cells)))
+    grid_df = build_grid(*study_bounds(facilities), mode='uniform', grid_size=side)
+    return len(grid_df)
+
+
+def stage_tree_build(facilities, grid_cells):
+    FacilityIndex(facilities)
+    return len(facilities)
+
+
+def stage_nearest_query(facilities, grid_cells, chunk_size=1_000_000):
+    """FacilityIndex.nearest over the grid, in chunks of grid rows so 100M cells fit in memory"""
+    index = FacilityIndex(facilities)
+    latitudes, longitudes = synthetic_grid_axes(facilities, grid_cells)
+    rows_per_chunk = max(1, chunk_size // len(longitudes))
+    distances = np.empty(len(latitudes) * len(longitudes), dtype=np.float32)
+    for start in range(0, len(latitudes), rows_per_chunk):
+        lat_grid, lon_grid = np.meshgrid(latitudes[start:start + rows_per_chunk], longitudes, indexing='ij')
+        chunk_distances, _ = index.nearest(lat_grid.ravel(), lon_grid.ravel())
+        offset = start * len(longitudes)
+        distances[offset:offset + len(chunk_distances)] = chunk_distances
+    return len(distances)
+
+
+def stage_density_counts(facilities, grid_cells):
+    from facility_density import count_facilities_within
+    latitudes, longitudes = synthetic_grid_axes(facilities, grid_cells)
+    count_facilities_within(grid_coordinates(latitudes, longitudes),
+                            np.radians(facilities[['latitude', 'longitude']].values))
+    return grid_cells
+
+
+def stage_e2sfca(facilities, grid_cells):
+    from floating_catchment import e2sfca
+    latitudes, longitudes = synthetic_grid_axes(facilities, grid_cells)
+    e2sfca(grid_coordinates(latitudes, longitudes), np.radians(facilities[['latitude', 'longitude']].values))
+    return grid_cells
+
+
+def stage_coverage_stats(facilities, grid_cells):
+    """Sorted distance distribution, summary statistics and coverage curve"""
+    from coverage_stats import DistanceDistribution, coverage_curve
+    distances = np.random.default_rng(0).gamma(2.0, 1.2, grid_cells)
+    distribution = DistanceDistribution(distances)
+    distribution.coverage([1, 2, 5, 10])
+    coverage_curve({'any': distribution})
+    return grid_cells
+
+
+def stage_heatmap_pyramid(facilities, grid_cells):
+    from heatmap_pyramid import build_pyramid
+    side = int(round(np.sqrt(grid_cells)))
+    grid = np.random.default_rng(0).gamma(2.0, 1.2, (side, side)).astype(np.float32)
+    build_pyramid(grid, 13.0, 80.0, 1e-3, 1e-3)
+    return side * side
+
+
+def stage_heatmap_render(facilities, grid_cells):
+    """Pyramid plus the per-zoom HeatMap layers of create_heatmap.py, rendered to HTML"""
+    import folium
+    from folium import plugins
+    from heatmap_pyramid import build_pyramid, level_points, zoom_ranges
+    side = int(round(np.sqrt(grid_cells)))
+    grid = np.random.default_rng(0).gamma(2.0, 1.2, (side, side)).astype(np.float32)
+    pyramid = build_pyramid(grid, 13.0, 80.0, 0.5 / side, 0.5 / side)
+    m = folium.Map(location=[13.25, 80.25], zoom_start=11)
+    for level_index, _, _ in zoom_ranges(pyramid, 13.25):
+        plugins.HeatMap(level_points(pyramid[level_index]), show=False).add_to(m)
+    m.get_root().render()
+    return side * side
+
+
+def stage_facility_map_render(facilities, grid_cells):
+    """One CircleMarker per facility, as the folium map scripts do, rendered to HTML"""
+    import folium
+    m = folium.Map(location=[facilities['latitude'].mean(), facilities['longitude'].mean()], zoom_start=11)
+    for lat, lon, name in facilities[['latitude', 'longitude', 'name']].values:
+        folium.CircleMarker(location=[lat, lon], radius=3, popup=str(name)).add_to(m)
+    m.get_root().render()
+    return len(facilities)
+
+
+STAGES = {
+    'grid_build': stage_grid_build,
+    'tree_build': stage_tree_build,
+    'nearest_query': stage_nearest_query,
+    'density_counts': stage_density_counts,
+    'e2sfca': stage_e2sfca,
+    'coverage_stats': stage_coverage_stats,
+    'heatmap_pyramid': stage_heatmap_pyramid,
+    'heatmap_render': stage_heatmap_render,
+    'facility_map_render': stage_facility_map_render,
+}
+
+
+def benchmark_cases(preset):
+    """(stage, facilities, grid_cells) cases for a size preset.
+
+    Every stage is swept along the dimension it scales with while the
+    other one is held at a mid-size value; the heaviest combinations
+    (e.g. E2SFCA on 100M cells) are left out.
+    """
+    sizes = SIZE_PRESETS[preset]
+    facilities, cells = sizes['facilities'], sizes['grid_cells']
+    mid_facilities = facilities[min(1, len(facilities) - 1)]
+    mid_cells = cells[min(2, len(cells) - 1)]
+
+    cases = []
+    cases += [('grid_build', mid_facilities, n) for n in cells]
+    cases += [('tree_build', n, mid_cells) for n in facilities]
+    cases += [('nearest_query', mid_facilities, n) for n in cells]
+    cases += [('nearest_query', n, mid_cells) for n in facilities if n != mid_facilities]
+    cases += [('density_counts', n, min(cells[1], mid_cells)) for n in facilities]
+    cases += [('e2sfca', n, min(cells[1], mid_cells)) for n in facilities if n <= 100_000]
+    cases += [('coverage_stats', mid_facilities, n) for n in cells]
+    cases += [('heatmap_pyramid', mid_facilities, n) for n in cells]
+    cases += [('heatmap_render', mid_facilities, n) for n in cells if n <= 10_000_000]
+    cases += [('facility_map_render', n, mid_cells) for n in facilities if n <= 100_000]
+    cases += [('pipeline', n, 10_000) for n in sizes['pipeline_facilities']]
+    return cases
+
+
+def trace_peak_mb(trace_dir, script):
+    """Peak RSS recorded in the latest stage trace of a script (see instrumentation.Trace)"""
+    name = os.path.splitext(script)[0]
+    with open(sorted(glob.glob(os.path.join(trace_dir, f'{name}_*.json')))[-1], encoding='utf-8') as f:
+        return json.load(f)['peak_rss_mb']
+
+
+def run_pipeline(facilities):
+    """Time every pipeline script on a synthetic extract in a scratch directory.
+
+    Each script runs in its own process, so the peak memory read from its
+    stage trace belongs to that script alone. Returns (script, seconds,
+    peak_rss_mb) tuples.
+    """
+    timings = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for sub_dir in ['data/raw', 'data/processed', 'outputs']:
+            os.makedirs(os.path.join(work_dir, sub_dir))
+        facilities.to_csv(os.path.join(work_dir, 'data/raw/osm_healthcare_facilities.csv'), index=False)
+        trace_dir = os.path.join(work_dir, 'outputs', 'traces')
+        env = dict(os.environ, MPLBACKEND='Agg', HEALTHCARE_TRACE_DIR=trace_dir)
+        for script in PIPELINE_STAGES:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(REPO_DIR, script)], cwd=work_dir, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            timings.append((script, time.perf_counter() - start, trace_peak_mb(trace_dir, script)))
+    return timings
+
+
+def run_case(stage, n_facilities, grid_cells, seed=0):
+    """Run one case in the current (fresh) process and return its measurements"""
+    sys.path.insert(0, REPO_DIR)
+    facilities = synthetic_city(n_facilities, seed=seed)
+    gc.collect()
+    setup_rss = peak_rss_mb()
+
+    results = []
+    if stage == 'pipeline':
+        for script, seconds, peak in run_pipeline(facilities):
+            results.append({'stage': f'pipeline:{script}', 'seconds': seconds, 'rows': n_facilities,
+                            'peak_rss_mb': peak})
+    else:
+        start = time.perf_counter()
+        rows = STAGES[stage](facilities, grid_cells)
+        results.append({'stage': stage, 'seconds': time.perf_counter() - start, 'rows': rows,
+                        'peak_rss_mb': round(peak_rss_mb(), 1)})
+
+    for result in results:
+        result.update({
+            'facilities': n_facilities,
+            'grid_cells': grid_cells,
+            'setup_rss_mb': round(setup_rss, 1),
+        })
+    return results
+
+
+def environment_info():
+    import scipy
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+    head_path = os.path.join(REPO_DIR, '.git', 'HEAD')
+    if os.path.exists(head_path):
+        with open(head_path, encoding='utf-8') as f:
+            head = f.read().strip()
+        if head.startswith('ref: '):
+            ref_path = os.path.join(REPO_DIR, '.git', head[5:])
+            if os.path.exists(ref_path):
+                with open(ref_path, encoding='utf-8') as f:
+                    head = f.read().strip()
+        info['git_commit'] = head
+    return info
+
+
+def compare_results(results, baseline_path):
+    """Print per-case speed ratios against an earlier results file; returns the regressed cases"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['stage'], r['facilities'], r['grid_cells']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['stage'], result['facilities'], result['grid_cells']))
+        if previous is None or previous['seconds'] <= 0:
+            continue
+        ratio = result['seconds'] / previous['seconds']
+        mark = '✗' if ratio > REGRESSION_RATIO else '✓'
+        print(f"  {mark} {result['stage']:38s} {result['facilities']:>9,} fac {result['grid_cells']:>12,} cells: "
+              f"{previous['seconds']:8.3f}s -> {result['seconds']:8.3f}s ({ratio:4.2f}x)")
+        if ratio > REGRESSION_RATIO:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages on synthetic cities (offline)')
+    parser.add_argument('--preset', choices=sorted(SIZE_PRESETS), default='quick')
+    parser.add_argument('--stages', nargs='+', choices=sorted(STAGES) + ['pipeline'],
+                        help='Only run these stages')
+    parser.add_argument('--output-dir', default='outputs/benchmarks')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("PIPELINE BENCHMARKS")
+    print("="*60)
+
+    cases = [case for case in benchmark_cases(args.preset) if not args.stages or case[0] in args.stages]
+    print(f"\nRunning {len(cases)} cases ({args.preset} preset), one fresh process each")
+
+    # Cases run one at a time, each in its own process, so timings are not
+    # contended and peak memory belongs to that case alone
+    results = []
+    with ProcessPoolExecutor(max_workers=1,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as executor:
+        for stage, n_facilities, grid_cells in cases:
+            for result in executor.submit(run_case, stage, n_facilities, grid_cells).result():
+                results.append(result)
+                print(f"  {result['stage']:38s} {n_facilities:>9,} fac {grid_cells:>12,} cells: "
+                      f"{result['seconds']:8.3f}s  peak {result['peak_rss_mb']:8.1f} MB")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'preset': args.preset,
+            'environment': environment_info(),
+            'results': results,
+        }, f, indent=2)
+    print(f"\n✓ Results saved to: {output_path}")
+
+    if args.compare:
+        regressions = compare_results(results, args.compare)
+        print(f"\n{len(regressions)} case(s) more than {REGRESSION_RATIO:.1f}x slower than the baseline")
+
+
+if __name__ == '__main__':
+    main()
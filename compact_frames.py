@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  optional: Arrow-backed string columns
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    STRING_DTYPE = pd.StringDtype('python')
+
+# Text columns with at most this share of distinct values become categoricals
+# (category, type, nearest-facility names); the rest become string columns
+CATEGORICAL_MAX_UNIQUE = 0.5
+
+
+def frame_mb(df):
+    """Memory held by a DataFrame, including string contents"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def compact_dtypes(df, keep=()):
+    """Copy of df with float32 floats, downcast integers and categorical or string text.
+
+    Columns named in keep are left alone (e.g. facility coordinates,
+    which need float64's sub-metre precision). Repetitive text columns
+    become categoricals (int codes plus one copy of each value); other
+    text becomes Arrow-backed strings when pyarrow is installed.
+    """
+    columns = {}
+    for column, values in df.items():
+        if column in keep or isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = values
+        elif pd.api.types.is_float_dtype(values.dtype):
+            columns[column] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values.dtype) and not pd.api.types.is_extension_array_dtype(values.dtype):
+            columns[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype):
+            if values.nunique() <= CATEGORICAL_MAX_UNIQUE * len(values):
+                columns[column] = values.astype('category')
+            else:
+                columns[column] = values.astype(STRING_DTYPE)
+        else:
+            columns[column] = values
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs = df.attrs
+    return compact
+
+
+def compact_frame(df, name, trace, keep=()):
+    """compact_dtypes() inside a 'compact:<name>' trace span recording the memory before and after"""
+    with trace.span(f'compact:{name}', rows=len(df)) as span:
+        before = frame_mb(df)
+        df = compact_dtypes(df, keep)
+        span['mb_before'] = round(before, 3)
+        span['mb_after'] = round(frame_mb(df), 3)
+    print(f"  Lean {name}: {span['mb_before']:.2f} MB -> {span['mb_after']:.2f} MB")
+    return df
+
+
+def lean_summary(trace):
+    """One line totalling the memory saved by every compact_frame() call of a run"""
+    spans = [span for span in trace.spans if 'mb_before' in span]
+    before = sum(span['mb_before'] for span in spans)
+    after = sum(span['mb_after'] for span in spans)
+    saved_pct = (1 - after / before) * 100 if before else 0
+    return (f"Lean mode: {len(spans)} tables {before:.2f} MB -> {after:.2f} MB "
+            f"(saved {before - after:.2f} MB, {saved_pct:.0f}%)")
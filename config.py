@@ -0,0 +1,44 @@
+import os
+
+# Area of interest. Defaults to Chennai; batch_analysis.py sets these
+# environment variables to run the same pipeline for other cities.
+CITY_NAME = os.environ.get('HEALTHCARE_CITY', 'Chennai')
+STATE_NAME = os.environ.get('HEALTHCARE_STATE', 'Tamil Nadu')
+COUNTRY = os.environ.get('HEALTHCARE_COUNTRY', 'India')
+
+# Analysis grid: 'uniform' (grid_size x grid_size points) or 'adaptive'
+# (quadtree refined only near coverage thresholds, see adaptive_grid.py)
+GRID_MODE = os.environ.get('HEALTHCARE_GRID_MODE', 'uniform')
+
+# Optional study-area boundary (GeoJSON Polygon/MultiPolygon). When the file
+# exists, grid points outside it are dropped before any distance queries.
+BOUNDARY_PATH = os.environ.get('HEALTHCARE_BOUNDARY', 'data/boundary.geojson')
+
+# Optional administrative zones (GeoJSON FeatureCollection, one feature per
+# ward). When the file exists, per-zone statistics are written by the analysis.
+ZONES_PATH = os.environ.get('HEALTHCARE_ZONES', 'data/zones.geojson')
+
+# Directory for per-run stage traces (durations, rows, memory) written by
+# every pipeline script, see instrumentation.py
+TRACE_DIR = os.environ.get('HEALTHCARE_TRACE_DIR', 'outputs/traces')
+
+# Raw Overpass responses are cached here (see overpass_cache.py). Modes:
+# 'cache' reuses fresh entries, 'refresh' always refetches, 'replay' only
+# reads the cache and never touches the network, 'off' bypasses it.
+OVERPASS_CACHE_DIR = os.environ.get('HEALTHCARE_OVERPASS_CACHE', 'data/cache/overpass')
+OVERPASS_CACHE_MODE = os.environ.get('HEALTHCARE_OVERPASS_MODE', 'cache')
+OVERPASS_CACHE_TTL_HOURS = float(os.environ.get('HEALTHCARE_OVERPASS_TTL_HOURS', 7 * 24))
+OVERPASS_CACHE_MAX_MB = float(os.environ.get('HEALTHCARE_OVERPASS_CACHE_MB', 500))
+
+# Date-partitioned facility snapshots (one columnar .npz per cleaning run
+# date) used for diffs and accessibility trends, see snapshot_store.py
+SNAPSHOT_DIR = os.environ.get('HEALTHCARE_SNAPSHOT_DIR', 'data/snapshots')
+
+# Memory-lean mode (HEALTHCARE_LEAN=1): float32 distances and grid columns,
+# categorical codes for repetitive text, Arrow strings when pyarrow is
+# installed; see compact_frames.py
+LEAN_MODE = os.environ.get('HEALTHCARE_LEAN', '0').lower() in ('1', 'true', 'yes')
+
+# Draw order when thinning facilities on the map server and in vector
+# tiles: the first facility in each screen cell is kept
+CATEGORY_PRIORITY = ['Hospital', 'Clinic', 'Health Center', 'Pharmacy']
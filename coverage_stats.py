@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+
+class DistanceDistribution:
+    """Area-weighted distribution of distances, sorted once.
+
+    Sorting the distances and accumulating their weights a single time
+    lets every later question -- share of area within any threshold,
+    any quantile, the CDF -- be answered with a binary search instead of
+    another full scan. Mean and standard deviation are computed once up
+    front. NaN distances (cells outside the study area) are ignored.
+    """
+
+    def __init__(self, distances, weights=None):
+        distances = np.asarray(distances, dtype=float)
+        weights = np.ones(len(distances)) if weights is None else np.asarray(weights, dtype=float)
+        valid = ~np.isnan(distances)
+        distances, weights = distances[valid], weights[valid]
+
+        order = np.argsort(distances)
+        self.sorted_distances = distances[order]
+        self.cumulative_weights = np.cumsum(weights[order])
+        self.total_weight = self.cumulative_weights[-1]
+
+        self.mean = np.dot(distances, weights) / self.total_weight
+        self.std = np.sqrt(np.dot(weights, (distances - self.mean) ** 2) / self.total_weight)
+        self.min = self.sorted_distances[0]
+        self.max = self.sorted_distances[-1]
+        self.median = self.quantile(0.5)
+
+    def cdf(self, thresholds_km):
+        """Share (0-1) of the area whose distance is <= each threshold"""
+        idx = np.searchsorted(self.sorted_distances, thresholds_km, side='right')
+        covered = np.where(idx > 0, self.cumulative_weights[np.maximum(idx - 1, 0)], 0)
+        return covered / self.total_weight
+
+    def coverage(self, thresholds_km):
+        """Percentage of the area within each threshold, as {threshold: pct}"""
+        return dict(zip(thresholds_km, self.cdf(thresholds_km) * 100))
+
+    def quantile(self, q):
+        """Weighted quantile; averages the two middle values on an exact split like np.median"""
+        target = q * self.total_weight
+        idx = min(np.searchsorted(self.cumulative_weights, target, side='left'), len(self.sorted_distances) - 1)
+        if idx + 1 < len(self.sorted_distances) and np.isclose(self.cumulative_weights[idx], target):
+            return (self.sorted_distances[idx] + self.sorted_distances[idx + 1]) / 2
+        return self.sorted_distances[idx]
+
+
+def coverage_curve(distributions, max_km=20, step_km=0.1):
+    """Coverage-vs-distance table for several distributions.
+
+    distributions maps a label (e.g. 'any', 'hospital') to a
+    DistanceDistribution. Returns one row per distance step from 0 to
+    max_km with a 'coverage_<label>_pct' column per label.
+    """
+    steps = np.round(np.arange(0, max_km + step_km / 2, step_km), 6)
+    table = {'distance_km': steps}
+    for label, distribution in distributions.items():
+        table[f'coverage_{label}_pct'] = distribution.cdf(steps) * 100
+    return pd.DataFrame(table)
+
+
+def farthest_cells(distances, n=10, min_distance_km=0):
+    """Indices of the n largest distances above min_distance_km, largest first.
+
+    Uses a partial sort (argpartition), so only the n selected cells are
+    ever fully sorted however large the grid is.
+    """
+    distances = np.asarray(distances, dtype=float)
+    candidates = np.flatnonzero(distances > min_distance_km)
+    if len(candidates) > n:
+        candidates = candidates[np.argpartition(-distances[candidates], n - 1)[:n]]
+    return candidates[np.argsort(-distances[candidates], kind='stable')]
@@ -2,128 +2,202 @@ import pandas as pd
 import folium
 from folium import plugins
 import numpy as np
+from config import CITY_NAME, LEAN_MODE
+from compact_frames import compact_frame, lean_summary
+from heatmap_pyramid import build_pyramid, level_points, load_distance_grid, zoom_ranges
+from branca.element import MacroElement
+from jinja2 import Template
+from instrumentation import Trace
 
-print("="*60)
-print("CREATING ACCESSIBILITY HEATMAP")
-print("="*60)
 
-# Load the data
-facilities_df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
-grid_df = pd.read_csv('data/processed/accessibility_grid.csv')
+def build_heatmap(facilities_df, base_grid, lat_origin, lon_origin, lat_step, lon_step, trace=None):
+    """Accessibility heatmap of a distance raster with facility dots, legend and title.
 
-print(f"\nLoaded {len(facilities_df)} facilities")
-print(f"Loaded {len(grid_df)} grid points")
+    base_grid is a (rows, cols) distance raster whose cell (0, 0) is at
+    (lat_origin, lon_origin), as returned by load_distance_grid. Returns
+    the folium map.
+    """
+    trace = trace or Trace('create_heatmap')
 
-# Calculate center
-center_lat = facilities_df['latitude'].mean()
-center_lon = facilities_df['longitude'].mean()
+    # Calculate center
+    center_lat = facilities_df['latitude'].mean()
+    center_lon = facilities_df['longitude'].mean()
 
-# Create map
-m = folium.Map(
-    location=[center_lat, center_lon],
-    zoom_start=11,
-    tiles='OpenStreetMap'
-)
+    # Create map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=11,
+        tiles='OpenStreetMap'
+    )
 
-# Prepare heatmap data
-# We want to show POOR accessibility as red (high values)
-# So we invert the distances: high distance = hot spots (red)
-print("\nPreparing heatmap data...")
+    # Pre-aggregate into a resolution pyramid and embed only the level each
+    # zoom range needs, so the HTML size does not grow with the base grid
+    with trace.span('pyramid_build', rows=base_grid.size):
+        pyramid = build_pyramid(base_grid, lat_origin, lon_origin, lat_step, lon_step)
+    ranges = zoom_ranges(pyramid, center_lat, max_zoom=18)
+    print(f"Built {len(pyramid)} pyramid levels from a {base_grid.shape[0]}x{base_grid.shape[1]} grid")
 
-# Use distance to any facility for the heatmap
-heat_data = []
-for idx, row in grid_df.iterrows():
-    # The heatmap intensity represents distance (farther = more intense/red)
-    heat_data.append([
-        row['latitude'], 
-        row['longitude'], 
-        row['distance_to_any_km']  # Higher distance = redder
-    ])
-
-# Add heatmap layer
-print("Adding heatmap layer...")
-plugins.HeatMap(
-    heat_data,
-    min_opacity=0.4,
-    max_zoom=18,
-    radius=15,
-    blur=20,
-    gradient={
-        0.0: 'green',    # Close to facilities (good access)
-        0.4: 'yellow',   # Medium distance
-        0.7: 'orange',   # Far from facilities
-        1.0: 'red'       # Very far (poor access)
-    }
-).add_to(m)
-
-# Add facility markers on top as small dots
-print("Adding facility markers...")
-for idx, row in facilities_df.iterrows():
-    if idx % 100 == 0:
-        print(f"  Adding marker {idx}/{len(facilities_df)}...")
-    
-    folium.CircleMarker(
-        location=[row['latitude'], row['longitude']],
-        radius=3,
-        popup=str(row['name']),
-        color='blue',
-        fill=True,
-        fillColor='blue',
-        fillOpacity=0.8,
-        weight=1
-    ).add_to(m)
-
-# Add legend
-legend_html = '''
-<div style="position: fixed; 
-            bottom: 50px; left: 50px; width: 250px; 
-            background-color: white; z-index:9999; 
-            border:2px solid grey; border-radius: 8px; 
-            padding: 15px; box-shadow: 0 0 10px rgba(0,0,0,0.2);">
-    <h4 style="margin-top: 0; text-align: center;">Healthcare Accessibility</h4>
-    <div style="background: linear-gradient(to right, green, yellow, orange, red); 
-                height: 20px; border-radius: 3px; margin: 10px 0;"></div>
-    <div style="display: flex; justify-content: space-between; font-size: 11px;">
-        <span>Good Access</span>
-        <span>Poor Access</span>
+    # Add one heatmap layer per zoom range (largest distance per block, so
+    # underserved pockets stay visible when zoomed out)
+    print("Adding heatmap layers...")
+    zoom_layers = []
+    with trace.span('heat_layers', rows=len(ranges)):
+        for level_index, first_zoom, last_zoom in ranges:
+            heat_data = level_points(pyramid[level_index], statistic='max')
+            print(f"  Zoom {first_zoom:2d}-{last_zoom:2d}: {len(heat_data)} points "
+                  f"(blocks of {pyramid[level_index]['factor']}x{pyramid[level_index]['factor']} cells)")
+            layer = plugins.HeatMap(
+                heat_data,
+                min_opacity=0.4,
+                max_zoom=18,
+                radius=15,
+                blur=20,
+                gradient={
+                    0.0: 'green',    # Close to facilities (good access)
+                    0.4: 'yellow',   # Medium distance
+                    0.7: 'orange',   # Far from facilities
+                    1.0: 'red'       # Very far (poor access)
+                },
+                show=False,
+                control=False,
+            )
+            layer.add_to(m)
+            zoom_layers.append((layer, first_zoom, last_zoom))
+
+    # Show only the layer whose zoom range contains the current zoom
+    zoom_switch = MacroElement()
+    zoom_switch._template = Template("""
+    {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this.map_name }};
+            var zoomLayers = [{{ this.layers }}];
+            function showZoomLayer() {
+                var zoom = map.getZoom();
+                zoomLayers.forEach(function(entry) {
+                    var visible = zoom >= entry[1] && zoom <= entry[2];
+                    if (visible && !map.hasLayer(entry[0])) { map.addLayer(entry[0]); }
+                    if (!visible && map.hasLayer(entry[0])) { map.removeLayer(entry[0]); }
+                });
+            }
+            map.on('zoomend', showZoomLayer);
+            showZoomLayer();
+        })();
+    {% endmacro %}
+    """)
+    zoom_switch.map_name = m.get_name()
+    zoom_switch.layers = ', '.join(
+        f'[{layer.get_name()}, {first_zoom}, {last_zoom}]' for layer, first_zoom, last_zoom in zoom_layers
+    )
+    m.add_child(zoom_switch)
+
+    # Add facility markers on top as small dots
+    print("Adding facility markers...")
+    with trace.span('markers', rows=len(facilities_df)):
+        for idx, row in facilities_df.iterrows():
+            if idx % 100 == 0:
+                print(f"  Adding marker {idx}/{len(facilities_df)}...")
+
+            folium.CircleMarker(
+                location=[row['latitude'], row['longitude']],
+                radius=3,
+                popup=str(row['name']),
+                color='blue',
+                fill=True,
+                fillColor='blue',
+                fillOpacity=0.8,
+                weight=1
+            ).add_to(m)
+
+    # Add legend
+    legend_html = '''
+    <div style="position: fixed; 
+                bottom: 50px; left: 50px; width: 250px; 
+                background-color: white; z-index:9999; 
+                border:2px solid grey; border-radius: 8px; 
+                padding: 15px; box-shadow: 0 0 10px rgba(0,0,0,0.2);">
+        <h4 style="margin-top: 0; text-align: center;">Healthcare Accessibility</h4>
+        <div style="background: linear-gradient(to right, green, yellow, orange, red); 
+                    height: 20px; border-radius: 3px; margin: 10px 0;"></div>
+        <div style="display: flex; justify-content: space-between; font-size: 11px;">
+            <span>Good Access</span>
+            <span>Poor Access</span>
+        </div>
+        <hr style="margin: 10px 0;">
+        <p style="margin: 5px 0; font-size: 12px;">
+            <span style="color:blue; font-size: 16px;">●</span> Healthcare Facility
+        </p>
+        <p style="margin: 5px 0; font-size: 11px; color: gray;">
+            Red areas = Far from healthcare<br>
+            Green areas = Close to healthcare
+        </p>
     </div>
-    <hr style="margin: 10px 0;">
-    <p style="margin: 5px 0; font-size: 12px;">
-        <span style="color:blue; font-size: 16px;">●</span> Healthcare Facility
-    </p>
-    <p style="margin: 5px 0; font-size: 11px; color: gray;">
-        Red areas = Far from healthcare<br>
-        Green areas = Close to healthcare
-    </p>
-</div>
-'''
-m.get_root().html.add_child(folium.Element(legend_html))
-
-# Add title
-title_html = '''
-<div style="position: fixed; 
-            top: 10px; left: 50%; transform: translateX(-50%);
-            background-color: white; z-index:9999; 
-            border:2px solid grey; border-radius: 8px; 
-            padding: 10px; text-align: center;
-            box-shadow: 0 0 10px rgba(0,0,0,0.2);">
-    <h3 style="margin: 0;">Chennai Healthcare Accessibility Heatmap</h3>
-    <p style="margin: 5px 0; font-size: 12px; color: gray;">
-        Red = Underserved Areas | Green = Good Access
-    </p>
-</div>
-'''
-m.get_root().html.add_child(folium.Element(title_html))
-
-# Save map
-output_path = 'outputs/accessibility_heatmap.html'
-m.save(output_path)
-
-print(f"\n{'='*60}")
-print("HEATMAP CREATED!")
-print(f"{'='*60}")
-print(f"Saved to: {output_path}")
-print("\nOpen the file to see:")
-print("  - Red areas: Far from healthcare facilities (underserved)")
-print("  - Green areas: Close to healthcare facilities (well-served)")
-print("  - Blue dots: Individual healthcare facilities")
\ No newline at end of file
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Add title
+    title_html = f'''
+    <div style="position: fixed; 
+                top: 10px; left: 50%; transform: translateX(-50%);
+                background-color: white; z-index:9999; 
+                border:2px solid grey; border-radius: 8px; 
+                padding: 10px; text-align: center;
+                box-shadow: 0 0 10px rgba(0,0,0,0.2);">
+        <h3 style="margin: 0;">{CITY_NAME} Healthcare Accessibility Heatmap</h3>
+        <p style="margin: 5px 0; font-size: 12px; color: gray;">
+            Red = Underserved Areas | Green = Good Access
+        </p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+
+    return m
+
+
+def main():
+    trace = Trace('create_heatmap')
+
+    print("="*60)
+    print("CREATING ACCESSIBILITY HEATMAP")
+    print("="*60)
+
+    # Load the data
+    with trace.span('load') as span:
+        facilities_df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
+        span['rows'] = len(facilities_df)
+    print(f"\nLoaded {len(facilities_df)} facilities")
+    if LEAN_MODE:
+        facilities_df = compact_frame(facilities_df, 'facilities', trace, keep=('latitude', 'longitude'))
+
+    # Prepare heatmap data
+    # We want to show POOR accessibility as red (high values)
+    # So we invert the distances: high distance = hot spots (red)
+    print("\nPreparing heatmap data...")
+
+    # Use distance to any facility for the heatmap
+    # The heatmap intensity represents distance (farther = more intense/red)
+    with trace.span('grid_load') as span:
+        base_grid, lat_origin, lon_origin, lat_step, lon_step = load_distance_grid('any')
+        span['rows'] = base_grid.size
+
+    m = build_heatmap(facilities_df, base_grid, lat_origin, lon_origin, lat_step, lon_step, trace)
+
+    # Save map
+    output_path = 'outputs/accessibility_heatmap.html'
+    with trace.span('map_save'):
+        m.save(output_path)
+
+    print(f"\n{'='*60}")
+    print("HEATMAP CREATED!")
+    print(f"{'='*60}")
+    print(f"Saved to: {output_path}")
+    print("\nOpen the file to see:")
+    print("  - Red areas: Far from healthcare facilities (underserved)")
+    print("  - Green areas: Close to healthcare facilities (well-served)")
+    print("  - Blue dots: Individual healthcare facilities")
+    if LEAN_MODE:
+        print(f"\n{lean_summary(trace)}")
+    print(f"\n✓ Stage trace saved to: {trace.save()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,23 @@
 import pandas as pd
-import matplotlib.pyplot as plt 
 import os
-df=pd.read_csv("data/raw/osm_healthcare_facilities.csv")
-print("total records loaded: ",len(df))
-print(f"Columns: {df.columns.tolist()}")
-duplicates=df.duplicated(subset=["latitude","longitude"]).sum()
-print(f"\nDuplicate locations found: {duplicates}")
-df_clean=df.drop_duplicates(subset=["latitude","longitude"])
-print(f"\nTotal records after removing duplicates: {len(df_clean)}")
-#Data completeness
-for col in df_clean.columns:
-    non_null=df_clean[col].notna().sum()
-    percentage=(non_null/len(df_clean))*100
-    print(f"\nColumn: {col}")
-    print(f"Non-null values: {non_null}")
-    print(f"Percentage non-null: {percentage:.2f}%")
+from config import CITY_NAME
+from instrumentation import Trace
+from snapshot_store import save_snapshot
+
+RAW_PATH = "data/raw/osm_healthcare_facilities.csv"
+CLEAN_PATH = "data/processed/healthcare_facilities_clean.csv"
+
+
+def load_raw(path=RAW_PATH):
+    """Raw facility table written by data_collection.py"""
+    return pd.read_csv(path)
+
+
+def remove_duplicates(df):
+    """Facilities with duplicate coordinates removed (first one kept)"""
+    return df.drop_duplicates(subset=["latitude","longitude"])
+
+
 def categorize_facility(row):
     facility_type = str(row['type']).lower()
     
@@ -39,64 +42,121 @@ def categorize_facility(row):
     else:
         return 'Other'
 
-df_clean['category'] = df_clean.apply(categorize_facility, axis=1)
-#categories of facilities
-print("\n" + "="*60)
-print("FACILITY CATEGORIES:")
-print("="*60)
-category_counts = df_clean['category'].value_counts()
-for category, count in category_counts.items():
-    percentage = (count / len(df_clean)) * 100
-    print(f"{category:25s}: {count:4d} ({percentage:5.1f}%)")
-#checking unnamed facilities
-unnamed = df_clean[df_clean['name'] == 'Unnamed']
-print(f"\nFacilities without names: {len(unnamed)} ({(len(unnamed)/len(df_clean))*100:.1f}%)")
-#saving cleaned data
-os.makedirs('data/processed', exist_ok=True)
-df_clean.to_csv('data/processed/healthcare_facilities_clean.csv', index=False)
-print(f"\nCleaned data saved to: data/processed/healthcare_facilities_clean.csv")
-#visualisations
-fig, axes = plt.subplots(1, 2, figsize=(15, 6))
-
-# Chart 1: Facility types bar chart
-category_counts.plot(kind='bar', ax=axes[0], color='steelblue', edgecolor='black')
-axes[0].set_title('Healthcare Facilities in Chennai by Category', fontsize=14, fontweight='bold')
-axes[0].set_xlabel('Facility Category', fontsize=12)
-axes[0].set_ylabel('Count', fontsize=12)
-axes[0].tick_params(axis='x', rotation=45)
-axes[0].grid(axis='y', alpha=0.3)
-
-# Add count labels on bars
-for i, v in enumerate(category_counts):
-    axes[0].text(i, v + 5, str(v), ha='center', va='bottom', fontweight='bold')
-
-# Chart 2: Named vs Unnamed facilities
-named_counts = df_clean['name'].ne('Unnamed').value_counts()
-labels = ['Named', 'Unnamed']
-colors = ['#2ecc71', '#e74c3c']
-axes[1].pie([named_counts.get(True, 0), named_counts.get(False, 0)], 
-            labels=labels, 
-            autopct='%1.1f%%',
-            colors=colors,
-            startangle=90,
-            textprops={'fontsize': 12, 'fontweight': 'bold'})
-axes[1].set_title('Data Completeness: Facility Names', fontsize=14, fontweight='bold')
-
-plt.tight_layout()
-
-os.makedirs('outputs', exist_ok=True)
-plt.savefig('outputs/01_data_quality_overview.png', dpi=300, bbox_inches='tight')
-print(f"✓ Chart saved to: outputs/01_data_quality_overview.png")
-
-plt.show()
-
-print("\n" + "="*60)
-print("DATA CLEANING COMPLETE!")
-print("="*60)
-print(f"\nSummary:")
-print(f"  Original records: {len(df)}")
-print(f"  Cleaned records: {len(df_clean)}")
-print(f"  Duplicates removed: {len(df) - len(df_clean)}")
-print(f"  Categories created: {len(category_counts)}")
-print(f"\nReady for mapping and analysis!")
-print("\nNext step: Run the mapping script to visualize facilities")
+
+def categorize(df):
+    """Copy of df with a 'category' column from categorize_facility"""
+    df = df.copy()
+    df['category'] = df.apply(categorize_facility, axis=1)
+    return df
+
+
+def clean_facilities(df):
+    """Raw facilities -> deduplicated and categorized facilities"""
+    return categorize(remove_duplicates(df))
+
+
+def render_quality_chart(df_clean, path=None):
+    """Facilities per category and named/unnamed share; saved to path when given. Returns the figure"""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+
+    # Chart 1: Facility types bar chart
+    category_counts = df_clean['category'].value_counts()
+    category_counts.plot(kind='bar', ax=axes[0], color='steelblue', edgecolor='black')
+    axes[0].set_title(f'Healthcare Facilities in {CITY_NAME} by Category', fontsize=14, fontweight='bold')
+    axes[0].set_xlabel('Facility Category', fontsize=12)
+    axes[0].set_ylabel('Count', fontsize=12)
+    axes[0].tick_params(axis='x', rotation=45)
+    axes[0].grid(axis='y', alpha=0.3)
+
+    # Add count labels on bars
+    for i, v in enumerate(category_counts):
+        axes[0].text(i, v + 5, str(v), ha='center', va='bottom', fontweight='bold')
+
+    # Chart 2: Named vs Unnamed facilities
+    named_counts = df_clean['name'].ne('Unnamed').value_counts()
+    labels = ['Named', 'Unnamed']
+    colors = ['#2ecc71', '#e74c3c']
+    axes[1].pie([named_counts.get(True, 0), named_counts.get(False, 0)], 
+                labels=labels, 
+                autopct='%1.1f%%',
+                colors=colors,
+                startangle=90,
+                textprops={'fontsize': 12, 'fontweight': 'bold'})
+    axes[1].set_title('Data Completeness: Facility Names', fontsize=14, fontweight='bold')
+
+    plt.tight_layout()
+
+    if path:
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+    return fig
+
+
+def main():
+    trace = Trace('data_cleaning')
+    with trace.span('load') as span:
+        df=load_raw()
+        span['rows'] = len(df)
+    print("total records loaded: ",len(df))
+    print(f"Columns: {df.columns.tolist()}")
+    duplicates=df.duplicated(subset=["latitude","longitude"]).sum()
+    print(f"\nDuplicate locations found: {duplicates}")
+    with trace.span('clean', rows=len(df)):
+        df_clean=remove_duplicates(df)
+    print(f"\nTotal records after removing duplicates: {len(df_clean)}")
+    #Data completeness
+    for col in df_clean.columns:
+        non_null=df_clean[col].notna().sum()
+        percentage=(non_null/len(df_clean))*100
+        print(f"\nColumn: {col}")
+        print(f"Non-null values: {non_null}")
+        print(f"Percentage non-null: {percentage:.2f}%")
+
+    with trace.span('categorize', rows=len(df_clean)):
+        df_clean = categorize(df_clean)
+    #categories of facilities
+    print("\n" + "="*60)
+    print("FACILITY CATEGORIES:")
+    print("="*60)
+    category_counts = df_clean['category'].value_counts()
+    for category, count in category_counts.items():
+        percentage = (count / len(df_clean)) * 100
+        print(f"{category:25s}: {count:4d} ({percentage:5.1f}%)")
+    #checking unnamed facilities
+    unnamed = df_clean[df_clean['name'] == 'Unnamed']
+    print(f"\nFacilities without names: {len(unnamed)} ({(len(unnamed)/len(df_clean))*100:.1f}%)")
+    #saving cleaned data
+    os.makedirs('data/processed', exist_ok=True)
+    with trace.span('csv_write', rows=len(df_clean)):
+        df_clean.to_csv(CLEAN_PATH, index=False)
+    print(f"\nCleaned data saved to: {CLEAN_PATH}")
+
+    # Keep a dated copy so later runs can be diffed against this one
+    with trace.span('snapshot_write', rows=len(df_clean)):
+        snapshot_file = save_snapshot(df_clean)
+    print(f"Snapshot saved to: {snapshot_file}")
+    #visualisations
+    os.makedirs('outputs', exist_ok=True)
+    with trace.span('chart_render'):
+        render_quality_chart(df_clean, 'outputs/01_data_quality_overview.png')
+    print(f"✓ Chart saved to: outputs/01_data_quality_overview.png")
+
+    import matplotlib.pyplot as plt
+    plt.show()
+
+    print("\n" + "="*60)
+    print("DATA CLEANING COMPLETE!")
+    print("="*60)
+    print(f"\nSummary:")
+    print(f"  Original records: {len(df)}")
+    print(f"  Cleaned records: {len(df_clean)}")
+    print(f"  Duplicates removed: {len(df) - len(df_clean)}")
+    print(f"  Categories created: {len(category_counts)}")
+    print(f"\nReady for mapping and analysis!")
+    print("\nNext step: Run the mapping script to visualize facilities")
+    print(f"\n✓ Stage trace saved to: {trace.save()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,21 @@
-import overpy
 import pandas as pd
-import time
-import json
 import os
+from config import CITY_NAME, STATE_NAME, COUNTRY
+from facility_backup import BACKUP_PATH, BackupWriter
+from instrumentation import Trace
+from overpass_async import run_queries
 
 # Create directories if they don't exist
 os.makedirs('data/raw', exist_ok=True)
 os.makedirs('data/processed', exist_ok=True)
 os.makedirs('outputs', exist_ok=True)
 
-# Initialize Overpass API
-api = overpy.Overpass()
-
-# Retry function for API calls
-def query_with_retry(api, query, max_retries=3, initial_delay=5):
-    for attempt in range(max_retries):
-        try:
-            return api.query(query)
-        except overpy.exception.OverpassGatewayTimeout as e:
-            if attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)  # Exponential backoff
-                print(f"Server timeout (attempt {attempt + 1}/{max_retries}). Retrying in {delay} seconds...")
-                time.sleep(delay)
-            else:
-                raise e
-        except Exception as e:
-            raise e
+trace = Trace('data_collection')
 
 # Define your area of interest
-city_name = "Chennai"
-state_name = "Tamil Nadu"
-country = "India"
+city_name = CITY_NAME
+state_name = STATE_NAME
+country = COUNTRY
 
 print(f"Fetching data for {city_name}, {state_name}, {country}")
 
@@ -54,45 +39,57 @@ out center;
 """
 
 try:
-    result = query_with_retry(api, query)
+    with trace.span('overpass_query'):
+        # Async client: retries 429/504 with jitter, follows the server's
+        # slot status and reuses cached responses (see overpass_async.py)
+        result = run_queries([query])[0]
     print(f"✓ Query successful!")
     
     # Initialize the facilities list HERE (this was missing!)
     facilities = []
     
-    # Process nodes (point locations)
-    print(f"Processing {len(result.nodes)} nodes...")
-    for node in result.nodes:
-        facility = {
-            'id': node.id,
-            'name': node.tags.get('name', 'Unnamed'),
-            'type': node.tags.get('amenity') or node.tags.get('healthcare', 'unknown'),
-            'latitude': float(node.lat),
-            'longitude': float(node.lon),
-            'address': node.tags.get('addr:street', ''),
-            'phone': node.tags.get('phone', ''),
-            'operator': node.tags.get('operator', ''),
-            'emergency': node.tags.get('emergency', 'no'),
-            'source': 'OSM'
-        }
-        facilities.append(facility)
+    # Raw backup is streamed as compressed NDJSON while rows are produced
+    with trace.span('parse') as span, BackupWriter(BACKUP_PATH) as backup:
+        # Process nodes (point locations)
+        print(f"Processing {len(result.nodes)} nodes...")
+        for node in result.nodes:
+            facility = {
+                'id': node.id,
+                'osm_type': 'node',
+                'name': node.tags.get('name', 'Unnamed'),
+                'type': node.tags.get('amenity') or node.tags.get('healthcare', 'unknown'),
+                'latitude': float(node.lat),
+                'longitude': float(node.lon),
+                'address': node.tags.get('addr:street', ''),
+                'phone': node.tags.get('phone', ''),
+                'operator': node.tags.get('operator', ''),
+                'emergency': node.tags.get('emergency', 'no'),
+                'opening_hours': node.tags.get('opening_hours', ''),
+                'source': 'OSM'
+            }
+            facilities.append(facility)
+            backup.write(facility)
     
-    # Process ways (building outlines) - use center point
-    print(f"Processing {len(result.ways)} ways...")
-    for way in result.ways:
-        facility = {
-            'id': way.id,
-            'name': way.tags.get('name', 'Unnamed'),
-            'type': way.tags.get('amenity') or way.tags.get('healthcare', 'unknown'),
-            'latitude': float(way.center_lat),
-            'longitude': float(way.center_lon),
-            'address': way.tags.get('addr:street', ''),
-            'phone': way.tags.get('phone', ''),
-            'operator': way.tags.get('operator', ''),
-            'emergency': way.tags.get('emergency', 'no'),
-            'source': 'OSM'
-        }
-        facilities.append(facility)
+        # Process ways (building outlines) - use center point
+        print(f"Processing {len(result.ways)} ways...")
+        for way in result.ways:
+            facility = {
+                'id': way.id,
+                'osm_type': 'way',
+                'name': way.tags.get('name', 'Unnamed'),
+                'type': way.tags.get('amenity') or way.tags.get('healthcare', 'unknown'),
+                'latitude': float(way.center_lat),
+                'longitude': float(way.center_lon),
+                'address': way.tags.get('addr:street', ''),
+                'phone': way.tags.get('phone', ''),
+                'operator': way.tags.get('operator', ''),
+                'emergency': way.tags.get('emergency', 'no'),
+                'opening_hours': way.tags.get('opening_hours', ''),
+                'source': 'OSM'
+            }
+            facilities.append(facility)
+            backup.write(facility)
+        span['rows'] = backup.count
     
     # Check if we found anything
     if len(facilities) == 0:
@@ -122,13 +119,12 @@ try:
     print(df[['name', 'type', 'address']].head(10).to_string())
     
     # Save to CSV
-    df.to_csv('data/raw/osm_healthcare_facilities.csv', index=False)
+    with trace.span('csv_write', rows=len(df)):
+        df.to_csv('data/raw/osm_healthcare_facilities.csv', index=False)
     print(f"\n✓ Data saved to: data/raw/osm_healthcare_facilities.csv")
     
-    # Also save as JSON for backup
-    with open('data/raw/osm_healthcare_facilities.json', 'w', encoding='utf-8') as f:
-        json.dump(facilities, f, indent=2, ensure_ascii=False)
-    print(f"✓ Backup saved to: data/raw/osm_healthcare_facilities.json")
+    print(f"✓ Backup saved to: {BACKUP_PATH}")
+    print(f"✓ Stage trace saved to: {trace.save()}")
     
     print(f"\n{'='*60}")
     print("SUCCESS! Data collection complete.")
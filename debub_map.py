@@ -1,28 +1,50 @@
 import pandas as pd
 import folium
+from instrumentation import Trace
 
-# Load data
-df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
 
-print(f"Total facilities: {len(df)}")
-print(f"\nFirst 5 facilities:")
-print(df[['name', 'latitude', 'longitude', 'category']].head())
+def build_map(df, limit=10, trace=None):
+    """Test map with plain markers for the first `limit` facilities"""
+    trace = trace or Trace('debub_map')
 
-# Create simple map with just 10 markers for testing
-center_lat = df['latitude'].mean()
-center_lon = df['longitude'].mean()
+    center_lat = df['latitude'].mean()
+    center_lon = df['longitude'].mean()
 
-m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
+    m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
 
-# Add just the first 10 markers
-for idx, row in df.head(10).iterrows():
-    folium.Marker(
-        location=[row['latitude'], row['longitude']],
-        popup=row['name'],
-        icon=folium.Icon(color='red', icon='plus', prefix='fa')
-    ).add_to(m)
-    print(f"Added marker: {row['name']} at {row['latitude']}, {row['longitude']}")
+    # Add just the first few markers
+    with trace.span('markers', rows=limit):
+        for idx, row in df.head(limit).iterrows():
+            folium.Marker(
+                location=[row['latitude'], row['longitude']],
+                popup=row['name'],
+                icon=folium.Icon(color='red', icon='plus', prefix='fa')
+            ).add_to(m)
+            print(f"Added marker: {row['name']} at {row['latitude']}, {row['longitude']}")
+    return m
 
-m.save('outputs/test_map.html')
-print("\nTest map saved to: outputs/test_map.html")
-print("If you can see 10 markers, the data is fine!")
\ No newline at end of file
+
+def main():
+    trace = Trace('debub_map')
+
+    # Load data
+    with trace.span('load') as span:
+        df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
+        span['rows'] = len(df)
+
+    print(f"Total facilities: {len(df)}")
+    print(f"\nFirst 5 facilities:")
+    print(df[['name', 'latitude', 'longitude', 'category']].head())
+
+    # Create simple map with just 10 markers for testing
+    m = build_map(df, 10, trace)
+
+    with trace.span('map_save', rows=10):
+        m.save('outputs/test_map.html')
+    print("\nTest map saved to: outputs/test_map.html")
+    print("If you can see 10 markers, the data is fine!")
+    print(f"\n✓ Stage trace saved to: {trace.save()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+
+# Default location of the shared distance surface (header + raw float32 data)
+SURFACE_PATH = 'data/processed/distance_surface'
+
+
+def write_surface(path, layers, lat_origin, lon_origin, lat_step, lon_step):
+    """Write distance surfaces as one raw float32 file plus a small JSON header.
+
+    layers maps a layer name (e.g. 'any', 'hospital') to a 2D array with
+    rows along latitude and columns along longitude; cells outside the
+    study area are NaN. The data goes to <path>.f32 as a C-ordered
+    (layers, rows, cols) block and the metadata to <path>.json. Both files
+    are written to temporary names and renamed, so readers never see a
+    half-written surface.
+    """
+    names = list(layers)
+    stack = np.stack([np.asarray(layers[name], dtype=np.float32) for name in names])
+    header = {
+        'origin': [float(lat_origin), float(lon_origin)],
+        'cell_size': [float(lat_step), float(lon_step)],
+        'shape': list(stack.shape[1:]),
+        'layers': names,
+        'dtype': 'float32',
+        'nodata': 'nan',
+    }
+
+    stack.tofile(f'{path}.f32.tmp')
+    with open(f'{path}.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2)
+    os.replace(f'{path}.f32.tmp', f'{path}.f32')
+    os.replace(f'{path}.json.tmp', f'{path}.json')
+
+
+class DistanceSurface:
+    """Read-only, memory-mapped view of a surface written by write_surface.
+
+    Opening only parses the JSON header; the data is mapped with np.memmap,
+    so every process that opens the same surface shares one page-cache copy
+    and only touches the pages it reads.
+    """
+
+    def __init__(self, path=SURFACE_PATH):
+        with open(f'{path}.json', encoding='utf-8') as f:
+            header = json.load(f)
+        self.lat_origin, self.lon_origin = header['origin']
+        self.lat_step, self.lon_step = header['cell_size']
+        self.shape = tuple(header['shape'])
+        self.layers = header['layers']
+        self.data = np.memmap(f'{path}.f32', dtype=header['dtype'], mode='r',
+                              shape=(len(self.layers),) + self.shape)
+
+    @staticmethod
+    def exists(path=SURFACE_PATH):
+        return os.path.exists(f'{path}.json') and os.path.exists(f'{path}.f32')
+
+    def layer(self, name):
+        """2D (rows x cols) memmap view of one layer"""
+        return self.data[self.layers.index(name)]
+
+    def latitudes(self):
+        return self.lat_origin + np.arange(self.shape[0]) * self.lat_step
+
+    def longitudes(self):
+        return self.lon_origin + np.arange(self.shape[1]) * self.lon_step
+
+    def cell_coordinates(self, rows, cols):
+        """(latitude, longitude) of cells given by row and column indices"""
+        return (self.lat_origin + np.asarray(rows) * self.lat_step,
+                self.lon_origin + np.asarray(cols) * self.lon_step)
+
+
+def remove_surface(path=SURFACE_PATH):
+    """Delete a surface so consumers don't pick up results from an earlier run"""
+    for suffix in ['.f32', '.json']:
+        if os.path.exists(f'{path}{suffix}'):
+            os.remove(f'{path}{suffix}')
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .zst backups
+    zstandard = None
+
+# Default raw backup written by data_collection.py
+BACKUP_PATH = 'data/raw/osm_healthcare_facilities.ndjson.gz'
+
+
+def open_backup(path, mode='r'):
+    """Open an NDJSON backup as text, compressed according to its extension.
+
+    '.gz' uses gzip, '.zst' zstandard (pip install zstandard) and
+    anything else is plain text.
+    """
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("Writing or reading .zst backups needs the zstandard package (pip install zstandard)")
+        return zstandard.open(path, f'{mode}t', encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+class BackupWriter:
+    """Streaming NDJSON writer: one compact JSON object per line, written as produced.
+
+    Nothing is buffered beyond the compressor, so memory stays flat however
+    many facilities a region has. Use as a context manager.
+    """
+
+    def __init__(self, path=BACKUP_PATH):
+        self.path = path
+        self.count = 0
+        self._file = open_backup(path, 'w')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_backup(path=BACKUP_PATH, types=None, bbox=None):
+    """Yield facilities from an NDJSON backup, optionally filtered, one line at a time.
+
+    types keeps only the given OSM types (e.g. {'hospital', 'clinic'});
+    bbox = (lat_min, lon_min, lat_max, lon_max) keeps facilities inside it.
+    Lines that cannot match the type filter are skipped before JSON
+    parsing, using the writer's compact '"type":"..."' form.
+    """
+    types = set(types) if types is not None else None
+    markers = [f'"type":{json.dumps(t, ensure_ascii=False)}' for t in types] if types else None
+    with open_backup(path, 'r') as f:
+        for line in f:
+            if markers is not None and not any(marker in line for marker in markers):
+                continue
+            record = json.loads(line)
+            if types is not None and record.get('type') not in types:
+                continue
+            if bbox is not None:
+                lat_min, lon_min, lat_max, lon_max = bbox
+                if not (lat_min <= record['latitude'] <= lat_max and lon_min <= record['longitude'] <= lon_max):
+                    continue
+            yield record
@@ -0,0 +1,63 @@
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Earth radius ~ 6371 km (same approximation as the accessibility analysis)
+EARTH_RADIUS_KM = 6371
+
+# Radii (km) used for the supply density surfaces
+DENSITY_RADII_KM = [1, 2, 5]
+
+
+def category_slug(category):
+    """Turn a facility category into a column-safe name ('Health Center' -> 'health_center')"""
+    return re.sub(r'[^a-z0-9]+', '_', str(category).lower()).strip('_')
+
+
+def count_facilities_within(grid_coords, facility_coords, radii_km=DENSITY_RADII_KM,
+                            chunk_size=1_000_000):
+    """Count facilities within each radius of every grid point.
+
+    Both inputs are (latitude, longitude) arrays in radians, as used by
+    acessibility_analysis.FacilityIndex. Counting is done with batched
+    query_ball_point(return_length=True) calls, so no per-point Python
+    loop runs and no neighbour lists are materialised. Large grids are
+    processed in chunks to keep memory bounded.
+    """
+    counts = {radius: np.zeros(len(grid_coords), dtype=np.int32) for radius in radii_km}
+    if len(facility_coords) == 0:
+        return counts
+
+    tree = cKDTree(facility_coords)
+    for start in range(0, len(grid_coords), chunk_size):
+        chunk = grid_coords[start:start + chunk_size]
+        for radius in radii_km:
+            counts[radius][start:start + len(chunk)] = tree.query_ball_point(
+                chunk, radius / EARTH_RADIUS_KM, return_length=True, workers=-1
+            )
+    return counts
+
+
+def facility_density_table(grid_points, facilities, radii_km=DENSITY_RADII_KM):
+    """Build facility-count-within-radius columns for all facilities and each category.
+
+    Returns a DataFrame aligned with grid_points with one column per
+    (category, radius), e.g. 'facilities_within_2km' for all facilities
+    and 'hospital_within_2km' for hospitals.
+    """
+    grid_coords = np.radians(grid_points[['latitude', 'longitude']].values)
+    columns = {}
+
+    all_coords = np.radians(facilities[['latitude', 'longitude']].values)
+    for radius, counts in count_facilities_within(grid_coords, all_coords, radii_km).items():
+        columns[f'facilities_within_{radius}km'] = counts
+
+    for category, group in facilities.groupby('category'):
+        category_coords = np.radians(group[['latitude', 'longitude']].values)
+        slug = category_slug(category)
+        for radius, counts in count_facilities_within(grid_coords, category_coords, radii_km).items():
+            columns[f'{slug}_within_{radius}km'] = counts
+
+    return pd.DataFrame(columns, index=grid_points.index)
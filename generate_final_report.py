@@ -1,26 +1,48 @@
+import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+from config import CITY_NAME, STATE_NAME, COUNTRY, LEAN_MODE
+from compact_frames import compact_frame, lean_summary
+from instrumentation import Trace
+
+trace = Trace('generate_final_report')
 
 print("="*60)
 print("GENERATING FINAL PROJECT REPORT")
 print("="*60)
 
 # Load data
-facilities_df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
-summary_stats = pd.read_csv('outputs/accessibility_summary.csv').iloc[0]
-grid_df = pd.read_csv('data/processed/accessibility_grid.csv')
-
-# Identify specific underserved areas
-underserved_df = grid_df[grid_df['distance_to_any_km'] > 5].sort_values('distance_to_any_km', ascending=False)
+with trace.span('load'):
+    summary_stats = pd.read_csv('outputs/accessibility_summary.csv').iloc[0]
+
+    # Most underserved cells, precomputed by the analysis stage; the report
+    # only reads small summary artifacts, never the full grid
+    underserved_cells = pd.read_csv('outputs/underserved_cells.csv')
+if LEAN_MODE:
+    underserved_cells = compact_frame(underserved_cells, 'underserved_cells', trace)
+underserved_df = underserved_cells[underserved_cells['category'] == 'any'].reset_index(drop=True)
+underserved_count = int(summary_stats['underserved_cells'])
+
+# Grid shape from the analysis summary (older summaries: the 100x100 uniform grid)
+grid_points = int(summary_stats.get('grid_points', 10_000))
+grid_size = int(summary_stats.get('grid_size', 100))
+clipped = ' clipped to the city boundary' if summary_stats.get('boundary_clipped', False) else ''
+if summary_stats.get('grid_mode', 'uniform') == 'adaptive':
+    grid_description = (f"Created an adaptive quadtree grid{clipped} "
+                        f"({grid_points:,} cells, refined near coverage thresholds)")
+elif clipped:
+    grid_description = (f"Created {grid_size}x{grid_size} grid{clipped} "
+                        f"({grid_points:,} of {grid_size * grid_size:,} analysis points inside)")
+else:
+    grid_description = f"Created {grid_size}x{grid_size} grid ({grid_size * grid_size:,} analysis points)"
 
 print("\nGenerating comprehensive report...")
 
 # Create report text
 report = f"""
 {'='*70}
-CHENNAI HEALTHCARE ACCESSIBILITY ANALYSIS
+{CITY_NAME.upper()} HEALTHCARE ACCESSIBILITY ANALYSIS
 Final Report
 {'='*70}
 
@@ -31,12 +53,12 @@ Analyst: Griffin Jolly
 EXECUTIVE SUMMARY
 {'='*70}
 
-This analysis examines healthcare accessibility across Chennai by mapping
+This analysis examines healthcare accessibility across {CITY_NAME} by mapping
 {int(summary_stats['total_facilities'])} healthcare facilities and calculating distance metrics
-for 10,000 analysis points across the city.
+for {grid_points:,} analysis points across the city.
 
 KEY FINDINGS:
-- {summary_stats['underserved_area_pct']:.1f}% of Chennai's area is more than 5km from healthcare
+- {summary_stats['underserved_area_pct']:.1f}% of {CITY_NAME}'s area is more than 5km from healthcare
 - Median distance to nearest facility: {summary_stats['median_distance_any_km']:.2f} km
 - Only {summary_stats['coverage_2km_pct']:.1f}% of areas are within 2km of a facility
 - Hospital access lags behind overall facility access
@@ -46,7 +68,7 @@ METHODOLOGY
 {'='*70}
 
 Data Source: OpenStreetMap (OSM)
-Study Area: Chennai, Tamil Nadu, India
+Study Area: {CITY_NAME}, {STATE_NAME}, {COUNTRY}
 Analysis Date: {datetime.now().strftime('%B %Y')}
 
 Facilities Mapped:
@@ -56,7 +78,7 @@ Facilities Mapped:
   • Total: {int(summary_stats['total_facilities'])}
 
 Analysis Method:
-  • Created 100x100 grid (10,000 analysis points) across Chennai
+  • {grid_description} across {CITY_NAME}
   • Calculated distance from each point to nearest facility using geospatial algorithms
   • Used KDTree data structure for efficient nearest-neighbor searches
   • Measured both straight-line (Euclidean) distances
@@ -82,8 +104,15 @@ Area within 2km of healthcare: {summary_stats['coverage_2km_pct']:.1f}%
 Area within 5km of healthcare: {summary_stats['coverage_5km_pct']:.1f}%
 Area within 10km of healthcare: {summary_stats['coverage_10km_pct']:.1f}%
 
+Exact coverage from nearest-facility service areas (Voronoi polygons,
+independent of grid resolution):
+  Within 1km: {summary_stats['exact_coverage_1km_pct']:.1f}%
+  Within 2km: {summary_stats['exact_coverage_2km_pct']:.1f}%
+  Within 5km: {summary_stats['exact_coverage_5km_pct']:.1f}%
+  Within 10km: {summary_stats['exact_coverage_10km_pct']:.1f}%
+
 INTERPRETATION:
-- {100 - summary_stats['coverage_2km_pct']:.1f}% of Chennai requires >2km travel for healthcare
+- {100 - summary_stats['coverage_2km_pct']:.1f}% of {CITY_NAME} requires >2km travel for healthcare
 - At 2km (approximately 25-minute walk), this represents a significant barrier
 - Nearly universal coverage (99.9%) within 10km, but distance still matters
 
@@ -99,7 +128,7 @@ provide better peripheral coverage.
 
 4. UNDERSERVED AREAS
 
-{summary_stats['underserved_area_pct']:.1f}% of Chennai ({len(underserved_df)} grid points) is more than 5km 
+{summary_stats['underserved_area_pct']:.1f}% of {CITY_NAME} ({underserved_count} grid points) is more than 5km 
 from the nearest healthcare facility.
 
 Most underserved locations (furthest from healthcare):
@@ -109,9 +138,87 @@ Most underserved locations (furthest from healthcare):
 report += "\nTop 10 Most Underserved Locations:\n"
 for i, row in underserved_df.head(10).iterrows():
     report += f"  {i+1}. Lat: {row['latitude']:.4f}, Lon: {row['longitude']:.4f}\n"
-    report += f"     Distance to nearest facility: {row['distance_to_any_km']:.2f} km\n"
+    report += f"     Distance to nearest facility: {row['distance_km']:.2f} km\n"
     report += f"     Nearest facility: {row['nearest_facility']}\n\n"
 
+# Optional sections are numbered on from the four fixed ones
+section = 4
+
+# Add an excerpt of the coverage-vs-distance curves
+if os.path.exists('outputs/coverage_curves.csv'):
+    curve_df = pd.read_csv('outputs/coverage_curves.csv')
+    if LEAN_MODE:
+        curve_df = compact_frame(curve_df, 'coverage_curves', trace)
+    curve_columns = [c for c in ['coverage_any_pct', 'coverage_hospital_pct', 'coverage_clinic_pct',
+                                 'coverage_pharmacy_pct'] if c in curve_df.columns]
+    labels = [c[len('coverage_'):-len('_pct')].title() for c in curve_columns]
+    report += "\nCoverage by distance (% of area within X km):\n"
+    report += f"  {'Distance':>8}" + "".join(f"{label:>10}" for label in labels) + "\n"
+    for distance in [0.5, 1, 2, 3, 5, 7.5, 10, 15]:
+        row = curve_df.iloc[np.abs(curve_df['distance_km'] - distance).argmin()]
+        report += f"  {distance:>6g}km" + "".join(f"{row[c]:>9.1f}%" for c in curve_columns) + "\n"
+    report += "\nFull curves (0-20 km in 100 m steps): outputs/coverage_curves.csv\n"
+
+# Add the emergency layer (facilities tagged emergency=yes)
+if summary_stats.get('emergency_facilities', 0) > 0:
+    emergency_cells = underserved_cells[underserved_cells['category'] == 'emergency']
+    section += 1
+    report += f"""
+{section}. EMERGENCY ACCESS
+
+{int(summary_stats['emergency_facilities'])} facilities are tagged as emergency-capable in OSM.
+  • Average distance to emergency care: {summary_stats['avg_distance_emergency_km']:.2f} km
+  • Median distance to emergency care: {summary_stats['median_distance_emergency_km']:.2f} km
+  • Maximum distance to emergency care: {summary_stats['max_distance_emergency_km']:.2f} km
+  • Area within 2km: {summary_stats['emergency_coverage_2km_pct']:.1f}%
+  • Area within 5km: {summary_stats['emergency_coverage_5km_pct']:.1f}% (exact: {summary_stats['exact_emergency_coverage_5km_pct']:.1f}%)
+  • Area within 10km: {summary_stats['emergency_coverage_10km_pct']:.1f}%
+"""
+    if len(emergency_cells):
+        report += "\nFarthest from emergency care:\n"
+        for _, row in emergency_cells.head(5).iterrows():
+            report += (f"  • Lat: {row['latitude']:.4f}, Lon: {row['longitude']:.4f} - "
+                       f"{row['distance_km']:.2f} km to {row['nearest_facility']}\n")
+
+# Add access through the week when opening hours were analysed
+if os.path.exists('outputs/time_slice_accessibility.csv'):
+    slice_df = pd.read_csv('outputs/time_slice_accessibility.csv')
+    if LEAN_MODE:
+        slice_df = compact_frame(slice_df, 'time_slices', trace)
+    worst = slice_df.loc[slice_df['coverage_any_5km_pct'].idxmin()]
+    unparsed_hours = int(summary_stats.get('facilities_with_unparsed_opening_hours', 0))
+    unparsed_note = f" {unparsed_hours} more could not be parsed and are counted as closed;" if unparsed_hours else ''
+    section += 1
+    report += f"""
+{section}. ACCESS BY TIME OF WEEK
+
+{int(summary_stats.get('facilities_with_opening_hours', 0))} facilities have opening hours in OSM;{unparsed_note} the rest are counted as always open.
+"""
+    report += f"  {'Time':>12}{'Open':>8}{'Any 5km':>10}{'Hosp. 5km':>11}\n"
+    for weekday, hour in [('Mo', 10), ('Mo', 19), ('We', 3), ('Sa', 14), ('Su', 10), ('Su', 23)]:
+        row = slice_df[(slice_df['weekday'] == weekday) & (slice_df['hour'] == hour)].iloc[0]
+        report += (f"  {weekday} {hour:02d}:00{'':>3}{int(row['open_any']):>8}"
+                   f"{row['coverage_any_5km_pct']:>9.1f}%{row['coverage_hospital_5km_pct']:>10.1f}%\n")
+    report += (f"  Lowest: {worst['coverage_any_5km_pct']:.1f}% of the area within 5km of an open facility "
+               f"({worst['weekday']} {int(worst['hour']):02d}:00)\n")
+    report += "\nAll 168 hours: outputs/time_slice_accessibility.csv\n"
+
+# Add ward-level results when the analysis produced them
+if os.path.exists('outputs/zonal_stats.csv'):
+    zone_df = pd.read_csv('outputs/zonal_stats.csv').dropna(subset=['coverage_any_5km_pct'])
+    if LEAN_MODE:
+        zone_df = compact_frame(zone_df, 'zonal_stats', trace)
+    section += 1
+    report += f"""
+{section}. ZONE-LEVEL ACCESS
+
+{len(zone_df)} zones analysed. Zones with the lowest share of area within 5km of healthcare:
+"""
+    for _, zone in zone_df.nsmallest(10, 'coverage_any_5km_pct').iterrows():
+        report += f"  • {zone['zone']}: {zone['coverage_any_5km_pct']:.1f}% within 5km, "
+        report += f"median {zone['median_distance_any_km']:.2f} km, max {zone['max_distance_any_km']:.2f} km\n"
+    report += "\nFull per-zone table: outputs/zonal_stats.csv\n"
+
 report += f"""
 {'='*70}
 RECOMMENDATIONS
@@ -153,7 +260,7 @@ LIMITATIONS
 CONCLUSION
 {'='*70}
 
-Chennai demonstrates reasonable healthcare coverage overall, with a median
+{CITY_NAME} demonstrates reasonable healthcare coverage overall, with a median
 distance of {summary_stats['median_distance_any_km']:.2f} km to the nearest facility. However, {summary_stats['underserved_area_pct']:.1f}%
 of the city's area remains underserved (>5km from healthcare), representing
 a significant equity concern.
@@ -196,27 +303,29 @@ END OF REPORT
 """
 
 # Save report
-with open('outputs/FINAL_REPORT.txt', 'w', encoding='utf-8') as f:
-    f.write(report)
+with trace.span('report_write'):
+    with open('outputs/FINAL_REPORT.txt', 'w', encoding='utf-8') as f:
+        f.write(report)
 
 print("✓ Report saved to: outputs/FINAL_REPORT.txt")
 
 # Also create a summary for easy sharing
 summary = f"""
-CHENNAI HEALTHCARE ACCESSIBILITY - QUICK SUMMARY
+{CITY_NAME.upper()} HEALTHCARE ACCESSIBILITY - QUICK SUMMARY
 
 Total Facilities Analyzed: {int(summary_stats['total_facilities'])}
 Median Distance to Healthcare: {summary_stats['median_distance_any_km']:.2f} km
 Underserved Areas (>5km): {summary_stats['underserved_area_pct']:.1f}%
 Coverage within 2km: {summary_stats['coverage_2km_pct']:.1f}%
 
-Key Insight: While most of Chennai has reasonable healthcare access,
+Key Insight: While most of {CITY_NAME} has reasonable healthcare access,
 {summary_stats['underserved_area_pct']:.1f}% of the city is significantly underserved, with some
 areas up to {summary_stats['max_distance_any_km']:.1f} km from the nearest facility.
 """
 
-with open('outputs/SUMMARY.txt', 'w', encoding='utf-8') as f:
-    f.write(summary)
+with trace.span('summary_write'):
+    with open('outputs/SUMMARY.txt', 'w', encoding='utf-8') as f:
+        f.write(summary)
 
 print("✓ Summary saved to: outputs/SUMMARY.txt")
 
@@ -225,4 +334,7 @@ print("REPORT GENERATION COMPLETE!")
 print("="*60)
 print("\nGenerated files:")
 print("  • outputs/FINAL_REPORT.txt - Comprehensive analysis report")
-print("  • outputs/SUMMARY.txt - Quick summary for sharing")
\ No newline at end of file
+print("  • outputs/SUMMARY.txt - Quick summary for sharing")
+if LEAN_MODE:
+    print(f"\n{lean_summary(trace)}")
+print(f"\n✓ Stage trace saved to: {trace.save()}")
@@ -0,0 +1,199 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from distance_surface import DistanceSurface
+from facility_density import EARTH_RADIUS_KM
+
+# Web-map ground resolution at zoom 0 (metres per 256 px tile pixel at the equator)
+METRES_PER_PIXEL_ZOOM0 = 2 * np.pi * 6378137 / 256
+
+
+def block_reduce(grid, factor, reducer=np.nanmax):
+    """Reduce every factor x factor block of a 2D grid with a NaN-aware reducer.
+
+    The grid is padded with NaN to a multiple of factor; blocks that are
+    entirely NaN come out NaN (or 0 for np.nansum).
+    """
+    rows, cols = grid.shape
+    padded = np.full((-(-rows // factor) * factor, -(-cols // factor) * factor), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = grid
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return reducer(blocks, axis=(1, 3))
+
+
+def rasterize_points(latitudes, longitudes, values, lat_origin, lon_origin, lat_step, lon_step, shape):
+    """Largest value of the points falling in each cell of a regular grid (NaN if none)"""
+    rows = np.clip(np.rint((np.asarray(latitudes) - lat_origin) / lat_step).astype(np.int64), 0, shape[0] - 1)
+    cols = np.clip(np.rint((np.asarray(longitudes) - lon_origin) / lon_step).astype(np.int64), 0, shape[1] - 1)
+    grid = np.full(shape, np.nan, dtype=np.float32)
+    np.fmax.at(grid, (rows, cols), np.asarray(values, dtype=np.float32))
+    return grid
+
+
+def rasterize_cells(latitudes, longitudes, lat_sizes, lon_sizes, values, lat_origin, lon_origin,
+                    lat_step, lon_step, shape):
+    """Paint every raster cell covered by each grid cell (centre and size) with its value (NaN elsewhere).
+
+    Adaptive grids mix leaf sizes; a leaf spans a whole block of the
+    finest cells, and all of them get the leaf's value. Leaves of the same
+    size are painted together.
+    """
+    latitudes, longitudes = np.asarray(latitudes), np.asarray(longitudes)
+    row_spans = np.maximum(np.rint(np.asarray(lat_sizes) / lat_step).astype(np.int64), 1)
+    col_spans = np.maximum(np.rint(np.asarray(lon_sizes) / lon_step).astype(np.int64), 1)
+    # First finest cell of each leaf: the centre of its bottom-left sub-cell
+    first_rows = np.rint((latitudes - (row_spans - 1) * lat_step / 2 - lat_origin) / lat_step).astype(np.int64)
+    first_cols = np.rint((longitudes - (col_spans - 1) * lon_step / 2 - lon_origin) / lon_step).astype(np.int64)
+    values = np.asarray(values, dtype=np.float32)
+
+    grid = np.full(shape, np.nan, dtype=np.float32)
+    spans = np.stack([row_spans, col_spans], axis=1)
+    for row_span, col_span in np.unique(spans, axis=0):
+        leaves = (row_spans == row_span) & (col_spans == col_span)
+        rows, cols, leaf_values = np.broadcast_arrays(
+            first_rows[leaves, None, None] + np.arange(row_span)[None, :, None],
+            first_cols[leaves, None, None] + np.arange(col_span)[None, None, :],
+            values[leaves, None, None])
+        inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+        grid[rows[inside], cols[inside]] = leaf_values[inside]
+    return grid
+
+
+def load_distance_grid(layer='any', grid_path='data/processed/accessibility_grid.csv'):
+    """Regular distance grid for one layer as (grid, lat_origin, lon_origin, lat_step, lon_step).
+
+    Reads the shared memory-mapped surface when there is one. Adaptive
+    grids have no regular surface, so the grid CSV is rasterized at its
+    finest cell size instead, each quadtree leaf filling all the cells of
+    its extent.
+    """
+    if DistanceSurface.exists():
+        surface = DistanceSurface()
+        return (surface.layer(layer), surface.lat_origin, surface.lon_origin,
+                surface.lat_step, surface.lon_step)
+
+    # Only the coordinates, cell sizes and the one distance layer are read
+    needed = {'latitude', 'longitude', 'cell_lat_size', 'cell_lon_size', f'distance_to_{layer}_km'}
+    grid_df = pd.read_csv(grid_path, usecols=lambda column: column in needed)
+    values = grid_df[f'distance_to_{layer}_km']
+    if 'cell_lat_size' in grid_df.columns:
+        lat_step, lon_step = grid_df['cell_lat_size'].min(), grid_df['cell_lon_size'].min()
+        # Raster extent from the leaf edges, origin at the centre of the first finest cell
+        lat_origin = (grid_df['latitude'] - grid_df['cell_lat_size'] / 2).min() + lat_step / 2
+        lon_origin = (grid_df['longitude'] - grid_df['cell_lon_size'] / 2).min() + lon_step / 2
+        lat_max = (grid_df['latitude'] + grid_df['cell_lat_size'] / 2).max() - lat_step / 2
+        lon_max = (grid_df['longitude'] + grid_df['cell_lon_size'] / 2).max() - lon_step / 2
+        shape = (int(round((lat_max - lat_origin) / lat_step)) + 1, int(round((lon_max - lon_origin) / lon_step)) + 1)
+        grid = rasterize_cells(grid_df['latitude'], grid_df['longitude'], grid_df['cell_lat_size'],
+                               grid_df['cell_lon_size'], values, lat_origin, lon_origin, lat_step, lon_step, shape)
+    else:
+        # Older grid files: smallest spacing between distinct coordinates
+        lat_step = np.diff(np.unique(grid_df['latitude'])).min()
+        lon_step = np.diff(np.unique(grid_df['longitude'])).min()
+        lat_origin, lon_origin = grid_df['latitude'].min(), grid_df['longitude'].min()
+        shape = (int(round((grid_df['latitude'].max() - lat_origin) / lat_step)) + 1,
+                 int(round((grid_df['longitude'].max() - lon_origin) / lon_step)) + 1)
+        grid = rasterize_points(grid_df['latitude'], grid_df['longitude'], values,
+                                lat_origin, lon_origin, lat_step, lon_step, shape)
+    return grid, lat_origin, lon_origin, lat_step, lon_step
+
+
+def build_pyramid(grid, lat_origin, lon_origin, lat_step, lon_step, min_size=8):
+    """Pre-aggregated copies of a distance grid at halving resolutions.
+
+    Level 0 is the grid itself; each further level merges 2x2 blocks of
+    the one before, until the grid is no larger than min_size cells on its
+    longest side. Every level is a dict with the block 'factor' relative
+    to the base grid, its 'origin' and 'cell_size' (centre of the first
+    block, block size in degrees) and 'max'/'mean' float32 grids.
+    """
+    grid = np.asarray(grid, dtype=np.float32)
+    levels = [{
+        'factor': 1,
+        'origin': (lat_origin, lon_origin),
+        'cell_size': (lat_step, lon_step),
+        'max': grid,
+        'mean': grid,
+    }]
+    # Running per-block sums and cell counts give exact means at every
+    # level while each level is built only from the one before it
+    sums = np.nan_to_num(grid)
+    counts = (~np.isnan(grid)).astype(np.float32)
+    while max(levels[-1]['max'].shape) > min_size:
+        factor = levels[-1]['factor'] * 2
+        block_max = block_reduce(levels[-1]['max'], 2, np.nanmax)
+        sums = block_reduce(sums, 2, np.nansum)
+        counts = block_reduce(counts, 2, np.nansum)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block_mean = (sums / counts).astype(np.float32)
+        levels.append({
+            'factor': factor,
+            'origin': (lat_origin + (factor - 1) * lat_step / 2, lon_origin + (factor - 1) * lon_step / 2),
+            'cell_size': (lat_step * factor, lon_step * factor),
+            'max': block_max,
+            'mean': block_mean,
+        })
+    return levels
+
+
+def level_points(level, statistic='max', decimals=5, bbox=None):
+    """[latitude, longitude, value] rows for the non-empty cells of a level.
+
+    bbox = (lat_min, lon_min, lat_max, lon_max) limits the rows to the
+    cells whose centres fall inside it; only that window is read.
+    """
+    lat_origin, lon_origin = level['origin']
+    lat_step, lon_step = level['cell_size']
+    values = level[statistic]
+    row_start = col_start = 0
+    if bbox is not None:
+        lat_min, lon_min, lat_max, lon_max = bbox
+        row_start = max(int(np.ceil((lat_min - lat_origin) / lat_step)), 0)
+        row_stop = max(int(np.floor((lat_max - lat_origin) / lat_step)) + 1, row_start)
+        col_start = max(int(np.ceil((lon_min - lon_origin) / lon_step)), 0)
+        col_stop = max(int(np.floor((lon_max - lon_origin) / lon_step)) + 1, col_start)
+        values = values[row_start:row_stop, col_start:col_stop]
+
+    rows, cols = np.nonzero(~np.isnan(values))
+    return np.column_stack([
+        np.round(lat_origin + (rows + row_start) * lat_step, decimals),
+        np.round(lon_origin + (cols + col_start) * lon_step, decimals),
+        np.round(values[rows, cols].astype(float), 2),
+    ])
+
+
+def level_for_zoom(levels, zoom, latitude, spacing_px=8, allowed=None):
+    """Index of the coarsest level whose cells are at most spacing_px screen pixels apart.
+
+    allowed restricts the choice to some level indices; if none of them
+    is fine enough, the finest allowed level is used.
+    """
+    allowed = range(len(levels)) if allowed is None else allowed
+    pixel_km = METRES_PER_PIXEL_ZOOM0 * np.cos(np.radians(latitude)) / 2 ** zoom / 1000
+    fitting = [i for i in allowed if np.radians(levels[i]['cell_size'][0]) * EARTH_RADIUS_KM <= spacing_px * pixel_km]
+    return max(fitting) if fitting else min(allowed)
+
+
+def zoom_ranges(levels, latitude, min_zoom=0, max_zoom=18, spacing_px=8, max_points=50_000):
+    """Pick the pyramid level to show at each zoom (see level_for_zoom).
+
+    Keeping points about spacing_px screen pixels apart gives the heatmap
+    the same visual density at any zoom. Levels with more than max_points
+    cells are never embedded; deeper zooms keep the finest level that
+    fits. Returns (level_index, first_zoom, last_zoom) ranges.
+    """
+    counts = [int((~np.isnan(level['max'])).sum()) for level in levels]
+    allowed = [i for i, count in enumerate(counts) if count <= max_points] or [len(levels) - 1]
+
+    ranges = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        index = level_for_zoom(levels, zoom, latitude, spacing_px, allowed)
+        if ranges and ranges[-1][0] == index:
+            ranges[-1] = (index, ranges[-1][1], zoom)
+        else:
+            ranges.append((index, zoom, zoom))
+    return ranges
@@ -0,0 +1,81 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+from config import TRACE_DIR
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def current_rss_mb():
+    """Current resident set size, where the platform exposes it (Linux /proc)"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+class Trace:
+    """Timed stages of one script run, saved as a JSON trace.
+
+    Wrap each stage in `with trace.span('stage', rows=n):`; spans may
+    nest and record their parent. Every span stores its duration, the
+    rows it processed (set rows on the yielded record when only known at
+    the end), current and peak RSS when it finished, and the exception
+    type if it failed.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self.spans = []
+        self._open = []
+
+    @contextlib.contextmanager
+    def span(self, stage, rows=None):
+        record = {
+            'stage': stage,
+            'parent': self._open[-1]['stage'] if self._open else None,
+            'rows': rows,
+        }
+        self.spans.append(record)
+        self._open.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            rss = current_rss_mb()
+            record['rss_mb'] = round(rss, 1) if rss is not None else None
+            record['peak_rss_mb'] = round(peak_rss_mb(), 1)
+            if record['rows'] is not None:
+                record['rows'] = int(record['rows'])
+            self._open.pop()
+
+    def save(self, directory=TRACE_DIR):
+        """Write the trace to <directory>/<script>_<timestamp>.json and return the path"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.script}_{self.started.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'script': self.script,
+                'started': self.started.isoformat(timespec='seconds'),
+                'total_seconds': round(time.perf_counter() - self._start, 6),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'spans': self.spans,
+            }, f, indent=2)
+        return path
@@ -0,0 +1,228 @@
+import argparse
+import gzip
+import json
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium import plugins
+from jinja2 import Template
+
+from config import CATEGORY_PRIORITY, CITY_NAME
+from heatmap_pyramid import METRES_PER_PIXEL_ZOOM0, build_pyramid, level_for_zoom, level_points, load_distance_grid
+
+FACILITIES_PATH = 'data/processed/healthcare_facilities_clean.csv'
+
+# Upper bound on facility markers per response; denser views are thinned
+MAX_FACILITIES = 2000
+
+
+class MapData:
+    """Facilities and the accessibility pyramid, loaded once and queried by bbox and zoom"""
+
+    def __init__(self, facilities_path=FACILITIES_PATH):
+        facilities = pd.read_csv(facilities_path)
+        priority = facilities['category'].map({c: i for i, c in enumerate(CATEGORY_PRIORITY)})
+        facilities = facilities.assign(priority=priority.fillna(len(CATEGORY_PRIORITY)))
+        # Sorted by latitude so a bbox query is a binary search plus a slice
+        self.facilities = facilities.sort_values(['latitude']).reset_index(drop=True)
+        self.center = (facilities['latitude'].mean(), facilities['longitude'].mean())
+        self.pyramid = build_pyramid(*load_distance_grid('any'))
+
+    def facilities_in(self, bbox, zoom):
+        """Facilities inside bbox, thinned to about one per 4 px screen cell when crowded"""
+        lat_min, lon_min, lat_max, lon_max = bbox
+        latitudes = self.facilities['latitude'].values
+        low = np.searchsorted(latitudes, lat_min, side='left')
+        high = np.searchsorted(latitudes, lat_max, side='right')
+        window = self.facilities.iloc[low:high]
+        window = window[(window['longitude'] >= lon_min) & (window['longitude'] <= lon_max)]
+
+        if len(window) > MAX_FACILITIES:
+            pixel_deg = METRES_PER_PIXEL_ZOOM0 / 2 ** zoom / 111_320
+            window = window.sort_values('priority', kind='stable')
+            cells = np.column_stack([
+                np.floor(window['latitude'].values / (4 * pixel_deg)),
+                np.floor(window['longitude'].values / (4 * pixel_deg)),
+            ])
+            _, first = np.unique(cells, axis=0, return_index=True)
+            window = window.iloc[np.sort(first)[:MAX_FACILITIES]]
+
+        return {
+            'facilities': [
+                [round(lat, 6), round(lon, 6), str(name), str(category)]
+                for lat, lon, name, category in window[['latitude', 'longitude', 'name', 'category']].values
+            ],
+        }
+
+    def accessibility_in(self, bbox, zoom):
+        """Heat points for bbox from the pyramid level that suits the zoom"""
+        level = self.pyramid[level_for_zoom(self.pyramid, zoom, self.center[0])]
+        return {
+            'block_factor': level['factor'],
+            'points': level_points(level, statistic='max', bbox=bbox).tolist(),
+        }
+
+
+def snap_bbox(bbox, zoom):
+    """Grow a bbox outward to the tile grid of its zoom, so nearby views share cache entries"""
+    step = 360 / 2 ** max(zoom, 0)
+    lat_min, lon_min, lat_max, lon_max = bbox
+    return (np.floor(lat_min / step) * step, np.floor(lon_min / step) * step,
+            np.ceil(lat_max / step) * step, np.ceil(lon_max / step) * step)
+
+
+def map_page(data):
+    """Folium page with empty layers that are filled from the server as the view moves"""
+    m = folium.Map(location=list(data.center), zoom_start=11, tiles='OpenStreetMap')
+    heat = plugins.HeatMap(
+        [],
+        min_opacity=0.4,
+        max_zoom=18,
+        radius=15,
+        blur=20,
+        gradient={0.0: 'green', 0.4: 'yellow', 0.7: 'orange', 1.0: 'red'},
+        control=False,
+    )
+    heat.add_to(m)
+
+    loader = MacroElement()
+    loader._template = Template("""
+    {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this.map_name }};
+            var heat = {{ this.heat_name }};
+            var markers = L.layerGroup().addTo(map);
+            function query() {
+                var b = map.getBounds();
+                return '?bbox=' + [b.getSouth(), b.getWest(), b.getNorth(), b.getEast()].join(',')
+                    + '&zoom=' + map.getZoom();
+            }
+            function refresh() {
+                var q = query();
+                fetch('/accessibility' + q).then(function(r) { return r.json(); }).then(function(d) {
+                    heat.setLatLngs(d.points);
+                });
+                fetch('/facilities' + q).then(function(r) { return r.json(); }).then(function(d) {
+                    markers.clearLayers();
+                    d.facilities.forEach(function(f) {
+                        L.circleMarker([f[0], f[1]], {radius: 3, color: 'blue', fillColor: 'blue',
+                                                      fillOpacity: 0.8, weight: 1})
+                            .bindPopup(f[2] + ' (' + f[3] + ')').addTo(markers);
+                    });
+                });
+            }
+            map.on('moveend', refresh);
+            refresh();
+        })();
+    {% endmacro %}
+    """)
+    loader.map_name = m.get_name()
+    loader.heat_name = heat.get_name()
+    m.add_child(loader)
+
+    title_html = f'''
+    <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%);
+                background-color: white; z-index:9999; border:2px solid grey; border-radius: 8px;
+                padding: 10px; text-align: center; box-shadow: 0 0 10px rgba(0,0,0,0.2);">
+        <h3 style="margin: 0;">{CITY_NAME} Healthcare Accessibility</h3>
+        <p style="margin: 5px 0; font-size: 12px; color: gray;">
+            Red = Underserved Areas | Green = Good Access | Blue = Facilities
+        </p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m.get_root().render().encode('utf-8')
+
+
+def make_handler(data, cache_size=1024):
+    """Request handler class bound to one MapData, with an LRU of rendered responses"""
+
+    @lru_cache(maxsize=cache_size)
+    def render(endpoint, bbox, zoom):
+        if endpoint == '/facilities':
+            payload = data.facilities_in(bbox, zoom)
+        else:
+            payload = data.accessibility_in(bbox, zoom)
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return body, gzip.compress(body, compresslevel=6)
+
+    page = map_page(data)
+    page_gzip = gzip.compress(page)
+
+    class MapRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path in ('/', '/index.html'):
+                self.send_body(page, page_gzip, 'text/html; charset=utf-8')
+                return
+            if url.path not in ('/facilities', '/accessibility'):
+                self.send_error(404, 'Unknown endpoint')
+                return
+
+            params = parse_qs(url.query)
+            try:
+                bbox = tuple(float(v) for v in params['bbox'][0].split(','))
+                zoom = int(params.get('zoom', ['11'])[0])
+                if len(bbox) != 4:
+                    raise ValueError('bbox needs 4 values')
+                if not np.isfinite(bbox).all():
+                    raise ValueError('bbox values must be finite numbers')
+                if bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+                    raise ValueError('bbox minimums must be below their maximums')
+            except (KeyError, ValueError) as e:
+                self.send_error(400, f'Expected ?bbox=lat_min,lon_min,lat_max,lon_max&zoom=z ({e})')
+                return
+
+            zoom = min(max(zoom, 0), 22)
+            body, body_gzip = render(url.path, snap_bbox(bbox, zoom), zoom)
+            self.send_body(body, body_gzip, 'application/json')
+
+        def send_body(self, body, body_gzip, content_type):
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', str(len(body_gzip if use_gzip else body)))
+            self.end_headers()
+            self.wfile.write(body_gzip if use_gzip else body)
+
+        def log_message(self, format, *args):
+            pass
+
+    MapRequestHandler.render = staticmethod(render)
+    return MapRequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve facilities and accessibility data for the visible map area')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=1024, help='Rendered responses kept in memory')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("ACCESSIBILITY MAP SERVER")
+    print("="*60)
+
+    data = MapData()
+    print(f"\nLoaded {len(data.facilities)} facilities and {len(data.pyramid)} accessibility levels")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(data, args.cache_size))
+    print(f"✓ Serving {CITY_NAME} map at http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping server")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from coverage_stats import DistanceDistribution
+from facility_density import EARTH_RADIUS_KM
+
+DAYS = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
+HOURS_PER_WEEK = 7 * 24
+# Packed masks: 168 bits = 21 bytes per facility
+MASK_BYTES = HOURS_PER_WEEK // 8
+
+_DAY = r'(?:Mo|Tu|We|Th|Fr|Sa|Su|PH|SH)'
+_SELECTOR = re.compile(rf'^({_DAY}(?:\[[^\]]*\])?(?:\s*-\s*{_DAY})?(?:\s*,\s*{_DAY}(?:\[[^\]]*\])?(?:\s*-\s*{_DAY})?)*)\s*(.*)$')
+_TIME_RANGE = re.compile(r'^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})(\+?)$')
+_OPEN_END = re.compile(r'^(\d{1,2}):(\d{2})\+$')
+# A comma after a time (or off/closed) that starts a new weekday selector
+# separates additional rules ("Mo-Fr 08:00-18:00, Sa 10:00-12:00"); other
+# commas list days or time ranges
+_ADDITIONAL_RULE = re.compile(
+    rf'(?:(?<=\d)|(?<=\+)|(?<=off)|(?<=closed)|(?<=sunrise)|(?<=sunset)|(?<=dawn)|(?<=dusk))\s*,\s*(?={_DAY}\b)'
+)
+# Fixed stand-ins for solar events in a weekly profile
+_SOLAR = {'sunrise': '06:00', 'sunset': '18:00', 'dawn': '05:30', 'dusk': '18:30'}
+
+
+def _parse_days(selector):
+    """Day indices for a weekday selector such as 'Mo-Fr,Su'; None for PH/SH-only rules"""
+    days = set()
+    for part in selector.split(','):
+        part = re.sub(r'\[[^\]]*\]', '', part).strip()
+        if part in ('PH', 'SH'):
+            continue
+        if '-' in part:
+            first, last = (DAYS.index(d.strip()) for d in part.split('-'))
+            days.update((first + i) % 7 for i in range((last - first) % 7 + 1))
+        else:
+            days.add(DAYS.index(part))
+    return days or None
+
+
+def _parse_times(text):
+    """Minute intervals (start, end) of the day; end may pass midnight"""
+    intervals = []
+    for part in text.split(','):
+        part = part.strip()
+        for event, clock in _SOLAR.items():
+            part = part.replace(event, clock)
+        if match := _OPEN_END.match(part):
+            # Open end ("18:00+"): count it as open until midnight
+            intervals.append((int(match.group(1)) * 60 + int(match.group(2)), 24 * 60))
+            continue
+        match = _TIME_RANGE.match(part)
+        if not match:
+            raise ValueError(f'Unsupported time range {part!r}')
+        start = int(match.group(1)) * 60 + int(match.group(2))
+        end = int(match.group(3)) * 60 + int(match.group(4))
+        intervals.append((start, end if end > start else end + 24 * 60))
+    return intervals
+
+
+def parse_opening_hours(text):
+    """Weekly open/closed profile of an OSM opening_hours value as 168 booleans.
+
+    Index day * 24 + hour, Monday 00:00 first; an hour counts as open
+    when the facility is open at half past. As in the OSM specification,
+    rules separated by ';' override earlier ones for the days they name,
+    while additional rules after a ',' add to them. Supports the common
+    forms ('24/7', 'Mo-Fr 08:00-18:00; Sa 09:00-13:00', 'Mo-Fr
+    08:00-18:00, Sa 10:00-12:00', overnight ranges, 'off', open ends,
+    sunrise/sunset); rules for public or school holidays are skipped.
+    Returns None for an empty or unsupported value.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    text = re.sub(r'"[^"]*"', '', text).replace('||', ';')
+    week = np.zeros((7, 24), dtype=bool)
+    half_past = np.arange(24) * 60 + 30
+    rules = [(rule.strip(), i > 0) for part in text.split(';')
+             for i, rule in enumerate(_ADDITIONAL_RULE.split(part.strip()))]
+    try:
+        for rule, additional in filter(lambda r: r[0], rules):
+            if rule == '24/7':
+                week[:] = True
+                continue
+            match = _SELECTOR.match(rule)
+            if match:
+                days = _parse_days(match.group(1))
+                if days is None:
+                    continue
+                times = match.group(2).strip()
+            else:
+                days, times = set(range(7)), rule
+
+            closed = re.search(r'\b(off|closed)$', times) is not None
+            times = re.sub(r'\s*\b(off|closed|open|unknown)$', '', times).strip()
+            if closed or not additional:
+                week[sorted(days)] = False
+            if closed:
+                continue
+            intervals = _parse_times(times) if times else [(0, 24 * 60)]
+            for day in days:
+                for start, end in intervals:
+                    week[day] |= (half_past >= start) & (half_past < end)
+                    if end > 24 * 60:
+                        week[(day + 1) % 7] |= half_past < end - 24 * 60
+    except ValueError:
+        return None
+    return week.ravel()
+
+
+def opening_hours_masks(values):
+    """Packed 168-bit weekly masks (n x 21 uint8), and flags for values that parsed and that did not.
+
+    Facilities without opening hours are assumed to be always open, which
+    is what the distance analysis has assumed so far. Facilities whose
+    opening hours are present but cannot be parsed are counted as closed
+    rather than silently open; callers report them from the third array.
+    """
+    packed = np.full((len(values), MASK_BYTES), 0xFF, dtype=np.uint8)
+    known = np.zeros(len(values), dtype=bool)
+    unparsed = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        week = parse_opening_hours(value)
+        if week is not None:
+            packed[i] = np.packbits(week)
+            known[i] = True
+        elif isinstance(value, str) and value.strip():
+            packed[i] = 0
+            unparsed[i] = True
+    return packed, known, unparsed
+
+
+def time_sliced_distances(grid_coords, facility_coords, packed_masks, k=16):
+    """Distance (km) from every grid point to the nearest open facility, per distinct open set.
+
+    Hours with identical sets of open facilities (e.g. every weekday
+    night) share one surface, so only one row per distinct set is kept
+    instead of 168. One KDTree and one k-nearest query serve every set:
+    the k candidates are masked by which facilities are open and the
+    first open one wins. Only grid points whose k candidates are all
+    closed fall back to a query against the open facilities. Returns a
+    (n_sets, n_points) float32 array (inf where nothing is open) and
+    hour_to_set, the row of that array for each of the 168 hours.
+    """
+    k = min(k, len(facility_coords))
+    candidate_rad, candidates = cKDTree(facility_coords).query(grid_coords, k=k)
+    candidate_rad, candidates = candidate_rad.reshape(len(grid_coords), k), candidates.reshape(len(grid_coords), k)
+
+    open_by_hour = np.unpackbits(packed_masks, axis=1, count=HOURS_PER_WEEK).astype(bool).T
+    open_sets, hour_to_set = np.unique(open_by_hour, axis=0, return_inverse=True)
+
+    rows = np.arange(len(grid_coords))
+    distances = np.empty((len(open_sets), len(grid_coords)), dtype=np.float32)
+    for set_index, is_open in enumerate(open_sets):
+        candidate_open = is_open[candidates]
+        first = candidate_open.argmax(axis=1)
+        found = candidate_open[rows, first]
+        slice_rad = np.where(found, candidate_rad[rows, first], np.inf)
+        if not found.all() and is_open.any():
+            slice_rad[~found], _ = cKDTree(facility_coords[is_open]).query(grid_coords[~found])
+        distances[set_index] = slice_rad * EARTH_RADIUS_KM
+    return distances, hour_to_set.ravel()
+
+
+def time_slice_table(layers, packed_masks_by_layer, weights=None, threshold_km=5):
+    """One row per hour of the week with open facilities, median distance and coverage per layer.
+
+    layers maps each layer to (set_distances, hour_to_set) from
+    time_sliced_distances; every distinct open set is summarized once
+    and its numbers are repeated for the hours that share it.
+    """
+    table = pd.DataFrame({
+        'weekday': np.repeat(DAYS, 24),
+        'hour': np.tile(np.arange(24), 7),
+    })
+    for layer, (set_distances, hour_to_set) in layers.items():
+        open_counts = np.unpackbits(packed_masks_by_layer[layer], axis=1, count=HOURS_PER_WEEK).sum(axis=0)
+        medians, coverages = [], []
+        for distances in set_distances:
+            if np.isfinite(distances).any():
+                distribution = DistanceDistribution(np.where(np.isfinite(distances), distances, 1e9), weights)
+                medians.append(distribution.median if distribution.median < 1e9 else np.nan)
+                coverages.append(distribution.cdf(threshold_km) * 100)
+            else:
+                medians.append(np.nan)
+                coverages.append(0.0)
+        table[f'open_{layer}'] = open_counts
+        table[f'median_distance_{layer}_km'] = np.round(np.asarray(medians)[hour_to_set], 3)
+        table[f'coverage_{layer}_{threshold_km}km_pct'] = np.round(np.asarray(coverages)[hour_to_set], 2)
+    return table
@@ -0,0 +1,273 @@
+import asyncio
+import gzip
+import random
+import re
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+
+import overpy
+
+from config import OVERPASS_CACHE_MODE
+from overpass_cache import CACHE_MODES, CacheMiss, OverpassCache, parse_response, query_key, raise_for_status
+
+DEFAULT_URL = 'https://overpass-api.de/api/interpreter'
+
+# Status codes worth retrying: rate limited, gateway timeout, overloaded
+RETRY_STATUSES = {429, 502, 503, 504}
+
+USER_AGENT = 'healthcare-mapping (+https://github.com/GriffinJolly/healthcare-mapping)'
+
+
+def parse_status(text):
+    """Slot information from an Overpass /api/status page.
+
+    Returns {'rate_limit': n, 'available': n, 'waits': [seconds, ...]}.
+    A rate limit of 0 means the server does not limit this client.
+    """
+    rate_limit = re.search(r'Rate limit:\s*(\d+)', text)
+    available = re.search(r'(\d+)\s+slots? available now', text)
+    return {
+        'rate_limit': int(rate_limit.group(1)) if rate_limit else 0,
+        'available': int(available.group(1)) if available else 0,
+        'waits': [int(w) for w in re.findall(r'Slot available after:.*?in\s+(-?\d+)\s+seconds', text)],
+    }
+
+
+class TokenBucket:
+    """Token bucket limiting how often queries may start.
+
+    capacity tokens refill evenly over refill_seconds. sync() resets the
+    bucket from the server's own slot status, so the client follows the
+    real quota instead of guessing with fixed sleeps; a server without a
+    rate limit turns the bucket off.
+    """
+
+    def __init__(self, capacity, refill_seconds):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.not_before = 0.0
+        self.unlimited = False
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.refill_seconds)
+        self.updated = now
+
+    async def acquire(self):
+        if self.unlimited:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self.not_before - time.monotonic()
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if wait <= 0:
+                    wait = (1 - self.tokens) * self.refill_seconds / self.capacity
+                await asyncio.sleep(wait)
+
+    def sync(self, status):
+        """Adopt slot counts from parse_status(); 0 free slots blocks until the next one frees"""
+        self.unlimited = status['rate_limit'] == 0
+        if self.unlimited:
+            return
+        self.capacity = status['rate_limit']
+        self._refill()
+        self.tokens = float(min(status['available'], self.capacity))
+        future_waits = [w for w in status['waits'] if w > 0]
+        if self.tokens < 1 and future_waits:
+            self.not_before = time.monotonic() + min(future_waits)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, reused across requests"""
+
+    def __init__(self, url, timeout=300):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.timeout = timeout
+        self.idle = deque()
+        self.opened = 0
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Send one request and return (status, headers, body); headers are lower-cased"""
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', f'User-Agent: {USER_AGENT}',
+                'Accept-Encoding: gzip', 'Connection: keep-alive', f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+        # A pooled connection may have been closed by the server while idle;
+        # if it fails before any response arrives, retry once on a fresh one
+        for reused in ([True, False] if self.idle else [False]):
+            reader, writer = self.idle.popleft() if reused else await self._connect()
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, response_headers, data = await asyncio.wait_for(self._read_response(reader), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if reused:
+                    continue
+                raise ConnectionError(f'Connection to {self.host} failed: {e}') from e
+            except BaseException:
+                writer.close()
+                raise
+            if response_headers.get('connection', '').lower() == 'close':
+                writer.close()
+            else:
+                self.idle.append((reader, writer))
+            if response_headers.get('content-encoding', '').lower() == 'gzip':
+                data = gzip.decompress(data)
+            return status, response_headers, data
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while (size := int((await reader.readline()).split(b';')[0], 16)) > 0:
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            while await reader.readline() not in (b'\r\n', b'\n', b''):
+                pass
+            return status, headers, b''.join(chunks)
+        if 'content-length' in headers:
+            return status, headers, await reader.readexactly(int(headers['content-length']))
+        headers['connection'] = 'close'
+        return status, headers, await reader.read()
+
+    def close(self):
+        while self.idle:
+            self.idle.popleft()[1].close()
+
+
+class AsyncOverpass:
+    """asyncio Overpass client for many queries (regions, tiles) at once.
+
+    - one keep-alive connection pool for all queries
+    - at most max_in_flight queries running at the same time
+    - a token bucket synced with the server's /api/status slots
+    - 429/502/503/504 and connection errors retried with full-jitter
+      exponential backoff (never shorter than the server's announced wait)
+    - the on-disk response cache of overpass_cache and its modes (cache, refresh, replay, off)
+
+    Use as `async with AsyncOverpass() as client: await client.query_many(queries)`.
+    """
+
+    def __init__(self, url=DEFAULT_URL, max_in_flight=2, max_retries=6, base_delay=2, max_delay=120,
+                 timeout=300, cache=None, cache_mode=OVERPASS_CACHE_MODE):
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown Overpass cache mode {cache_mode!r}; expected one of {CACHE_MODES}")
+        self.url = url
+        self.path = urlsplit(url).path or '/'
+        self.status_path = re.sub(r'/interpreter$', '/status', self.path)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache or OverpassCache()
+        self.cache_mode = cache_mode
+        self.pool = ConnectionPool(url, timeout)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(max_in_flight, refill_seconds=base_delay)
+        # Used only to turn raw responses into overpy.Result objects
+        self.parser = overpy.Overpass(url=url)
+        self.stats = {'requests': 0, 'retries': 0, 'cache_hits': 0}
+        self._synced = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.pool.close()
+
+    async def sync_status(self):
+        """Refresh the token bucket from /api/status; returns the wait for the next slot"""
+        try:
+            status, _, body = await self.pool.request('GET', self.status_path)
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            return 0
+        self._synced = True
+        if status != 200:
+            return 0
+        slots = parse_status(body.decode('utf-8', 'replace'))
+        self.bucket.sync(slots)
+        return min([w for w in slots['waits'] if w > 0], default=0)
+
+    def _backoff(self, attempt, server_wait=0):
+        return max(server_wait, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    async def query(self, query):
+        """Run one Overpass QL query and return an overpy.Result"""
+        key = query_key(query, self.url)
+        if self.cache_mode in ('cache', 'replay'):
+            hit = self.cache.get(key, ignore_ttl=(self.cache_mode == 'replay'))
+            if hit is not None:
+                self.stats['cache_hits'] += 1
+                return parse_response(self.parser, hit[0]['content_type'], hit[1])
+            if self.cache_mode == 'replay':
+                raise CacheMiss(f"No recorded Overpass response for query {key[:12]} in {self.cache.directory}")
+
+        body = urlencode({'data': query}).encode('utf-8')
+        async with self.in_flight:
+            if not self._synced:
+                await self.sync_status()
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire()
+                self.stats['requests'] += 1
+                try:
+                    status, headers, data = await self.pool.request(
+                        'POST', self.path, body, {'Content-Type': 'application/x-www-form-urlencoded'})
+                except (ConnectionError, OSError, asyncio.TimeoutError):
+                    if attempt == self.max_retries:
+                        raise
+                    status = None
+
+                if status == 200:
+                    content_type = headers.get('content-type', '')
+                    result = parse_response(self.parser, content_type, data)
+                    if self.cache_mode != 'off':
+                        self.cache.put(key, self.url, query, content_type, data)
+                    return result
+                if status is not None and (status not in RETRY_STATUSES or attempt == self.max_retries):
+                    raise_for_status(status, query, data)
+
+                server_wait = await self.sync_status() if status == 429 else 0
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._backoff(attempt, server_wait))
+
+    async def query_many(self, queries):
+        """Run queries concurrently (bounded by max_in_flight); results keep the input order"""
+        return await asyncio.gather(*(self.query(q) for q in queries))
+
+
+def run_queries(queries, **client_options):
+    """Blocking helper: run queries with an AsyncOverpass client and return their results"""
+    async def run():
+        async with AsyncOverpass(**client_options) as client:
+            results = await client.query_many(queries)
+            return results, dict(client.stats, connections=client.pool.opened)
+    results, stats = asyncio.run(run())
+    print(f"✓ Overpass: {len(queries)} queries, {stats['requests']} requests, "
+          f"{stats['retries']} retries, {stats['cache_hits']} cache hits, {stats['connections']} connections")
+    return results
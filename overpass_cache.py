@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import overpy
+
+from config import OVERPASS_CACHE_DIR, OVERPASS_CACHE_MAX_MB, OVERPASS_CACHE_TTL_HOURS
+
+CACHE_MODES = ('cache', 'refresh', 'replay', 'off')
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a query has no recorded response"""
+
+
+def query_key(query, url):
+    """Content address of a query: SHA-256 of the endpoint and the query text.
+
+    Leading/trailing whitespace of each line is ignored so re-indenting a
+    query does not invalidate its recorded response.
+    """
+    text = '\n'.join(line.strip() for line in query.strip().splitlines())
+    return hashlib.sha256(f'{url}\n{text}'.encode('utf-8')).hexdigest()
+
+
+class OverpassCache:
+    """Raw Overpass responses stored gzip-compressed on disk, one file per query.
+
+    Each entry is <directory>/<key[:2]>/<key>.gz holding a one-line JSON
+    header (endpoint, content type, fetch time, query) followed by the
+    response body exactly as the server sent it. Entries older than the
+    TTL count as misses in 'cache' mode but are kept, so 'replay' can
+    still use them; entries are only deleted, least recently used first,
+    when the directory grows beyond max_bytes.
+    """
+
+    def __init__(self, directory=OVERPASS_CACHE_DIR, ttl_hours=OVERPASS_CACHE_TTL_HOURS,
+                 max_mb=OVERPASS_CACHE_MAX_MB):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.gz')
+
+    def get(self, key, ignore_ttl=False):
+        """(header, body) for a key, or None if missing or expired"""
+        path = self.path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if not ignore_ttl and age > self.ttl_seconds:
+                return None
+            with gzip.open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError, EOFError):
+            return None
+        # Reads refresh the access time used for LRU eviction
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+        return header, body
+
+    def put(self, key, url, query, content_type, body):
+        """Store a response atomically (temp file + rename), then evict if over budget"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {'url': url, 'content_type': content_type, 'fetched': time.time(), 'query': query}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.write(body)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, last_access, modified) for every stored response"""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.gz'):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((os.path.join(root, name), stat.st_size, stat.st_atime, stat.st_mtime))
+        return found
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes (age alone never evicts)"""
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        for path, size, _, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def raise_for_status(code, query, body=b''):
+    """Raise the overpy exception matching a non-200 Overpass status code"""
+    if code == 400:
+        raise overpy.exception.OverpassBadRequest(query.encode('utf-8'), msgs=[body.decode('utf-8', 'replace')[:500]])
+    if code == 429:
+        raise overpy.exception.OverpassTooManyRequests()
+    if code == 504:
+        raise overpy.exception.OverpassGatewayTimeout()
+    raise overpy.exception.OverpassUnknownHTTPStatusCode(code)
+
+
+def parse_response(api, content_type, body):
+    """Turn a raw body into an overpy.Result the same way api.query would"""
+    if content_type.startswith('application/json'):
+        return api.parse_json(body)
+    if content_type.startswith('application/osm3s+xml'):
+        return api.parse_xml(body)
+    raise overpy.exception.OverpassUnknownContentType(content_type)
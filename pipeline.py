@@ -0,0 +1,88 @@
+import argparse
+import csv
+import os
+import runpy
+import sys
+import time
+
+# Stage name -> (module, description). Modules are only imported when
+# their stage runs, so each command pays for its own dependencies only.
+STAGES = {
+    'collect': ('data_collection', 'Fetch healthcare facilities from OpenStreetMap'),
+    'clean': ('data_cleaning', 'Clean and categorize the raw facilities'),
+    'analyze': ('acessibility_analysis', 'Distance, coverage and accessibility analysis'),
+    'heatmap': ('create_heatmap', 'Accessibility heatmap (outputs/accessibility_heatmap.html)'),
+    'map': ('create_fixed_map', 'Interactive facility map'),
+    'report': ('generate_final_report', 'Text report and summary from the analysis outputs'),
+    'serve': ('map_server', 'Local map server for bbox/zoom queries'),
+    'query': ('query_service', 'Warm nearest/within/coverage query service'),
+    'tiles': ('vector_tiles', 'MBTiles vector tile export'),
+    'snapshots': ('snapshot_store', 'Facility snapshots, diffs and trends'),
+    'batch': ('batch_analysis', 'Run the pipeline for several cities'),
+    'benchmark': ('benchmark', 'Offline benchmarks on synthetic cities'),
+}
+
+# Stages run by "run" when none are given
+PIPELINE = ['collect', 'clean', 'analyze', 'heatmap', 'report']
+
+SUMMARY_PATH = 'outputs/accessibility_summary.csv'
+
+
+def run_stage(stage, args=()):
+    """Run one stage's module as a script, with args as its command line"""
+    module, _ = STAGES[stage]
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    sys.argv = [f'{module}.py', *args]
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+
+
+def print_stats(path=SUMMARY_PATH):
+    """Print the key numbers of the last analysis, without importing pandas"""
+    with open(path, newline='', encoding='utf-8') as f:
+        summary = next(csv.DictReader(f))
+    print(f"Facilities:            {int(float(summary['total_facilities']))} "
+          f"({int(float(summary['hospitals']))} hospitals, {int(float(summary['clinics']))} clinics)")
+    print(f"Median distance:       {float(summary['median_distance_any_km']):.2f} km "
+          f"(hospital {float(summary['median_distance_hospital_km']):.2f} km)")
+    for threshold in (1, 2, 5, 10):
+        print(f"Within {threshold:2d} km:          {float(summary[f'coverage_{threshold}km_pct']):5.1f}%")
+    print(f"Underserved (>5 km):   {float(summary['underserved_area_pct']):5.1f}%")
+    if summary.get('emergency_coverage_5km_pct'):
+        print(f"Emergency within 5 km: {float(summary['emergency_coverage_5km_pct']):5.1f}%")
+
+
+def main():
+    # Stage commands hand their whole command line to the stage untouched
+    if len(sys.argv) > 1 and sys.argv[1] in STAGES:
+        run_stage(sys.argv[1], sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description='Healthcare accessibility pipeline',
+        epilog='Arguments after a stage name are passed to that stage, e.g. "pipeline.py serve --port 9000".',
+    )
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for stage, (_, description) in STAGES.items():
+        commands.add_parser(stage, help=description)
+    run = commands.add_parser('run', help=f"Run stages in order (default: {' '.join(PIPELINE)})")
+    run.add_argument('stages', nargs='*', metavar='stage')
+    stats = commands.add_parser('stats', help='Print key results of the last analysis')
+    stats.add_argument('--summary', default=SUMMARY_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print_stats(args.summary)
+    else:
+        unknown = [stage for stage in args.stages if stage not in STAGES]
+        if unknown:
+            parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+        for stage in args.stages or PIPELINE:
+            start = time.perf_counter()
+            run_stage(stage)
+            print(f"\n[pipeline] {stage} finished in {time.perf_counter() - start:.1f}s\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict, defaultdict, deque
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from acessibility_analysis import CLEAN_PATH, build_indexes, facility_layers, load_facilities
+from config import CITY_NAME
+from coverage_stats import DistanceDistribution
+
+# Latency samples kept per endpoint for the p50/p99 metrics
+LATENCY_WINDOW = 10_000
+
+# Single-point results are cached by coordinates rounded to ~0.1 m
+CACHE_DECIMALS = 6
+
+DEFAULT_THRESHOLDS_KM = [1, 2, 5, 10]
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class QueryError(ValueError):
+    """Malformed query; answered with 400 and the message"""
+
+
+class ResultCache:
+    """Least-recently-used cache of single-point results"""
+
+    def __init__(self, size=100_000):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if self.size <= 0:
+            return
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class LatencyStats:
+    """Service time per endpoint over the last LATENCY_WINDOW requests"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.requests = defaultdict(int)
+        self.points = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def record(self, endpoint, seconds, points=1):
+        self.samples[endpoint].append(seconds)
+        self.requests[endpoint] += 1
+        self.points[endpoint] += points
+        self.seconds[endpoint] += seconds
+
+    def summary(self):
+        """{endpoint: requests, points, p50/p99/max in ms and points per second of service time}"""
+        summary = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            p50, p99 = np.percentile(samples, [50, 99]) * 1000
+            summary[endpoint] = {
+                'requests': self.requests[endpoint],
+                'points': self.points[endpoint],
+                'p50_ms': round(float(p50), 4),
+                'p99_ms': round(float(p99), 4),
+                'max_ms': round(max(samples) * 1000, 4),
+                'points_per_s': round(self.points[endpoint] / self.seconds[endpoint]) if self.seconds[endpoint] else None,
+            }
+        return summary
+
+
+class AccessibilityService:
+    """Facility layers and their KDTrees loaded once, answering nearest/within/coverage queries.
+
+    Single-point lookups go through a result LRU. Single-point nearest
+    queries that arrive in the same event-loop iteration (many clients at
+    once) are coalesced into one vectorised KDTree query, so a burst of
+    small requests costs about as much as one batch.
+    """
+
+    def __init__(self, facilities_df, cache_size=100_000):
+        self.layers = facility_layers(facilities_df)
+        self.indexes = build_indexes(self.layers)
+        self.cache = ResultCache(cache_size)
+        self.stats = LatencyStats()
+        self.coalesced = {'flushes': 0, 'points': 0}
+        self._pending = defaultdict(list)
+
+    def _index(self, layer):
+        if layer not in self.indexes:
+            raise QueryError(f"Unknown layer {layer!r}; expected one of {', '.join(self.indexes)}")
+        return self.indexes[layer]
+
+    def nearest(self, layer, latitudes, longitudes):
+        """Distance (km), name and position of the nearest facility for every point"""
+        index = self._index(layer)
+        distances, indices = index.query(latitudes, longitudes)
+        return {
+            'distance_km': np.round(distances, 4).tolist(),
+            'name': index.names[indices].tolist(),
+            'latitude': index.positions[indices, 0].tolist(),
+            'longitude': index.positions[indices, 1].tolist(),
+        }
+
+    def within(self, layer, latitudes, longitudes, radius_km):
+        """Number of facilities within radius_km of every point"""
+        workers = 1 if len(latitudes) < 1000 else -1
+        return self._index(layer).count_within(latitudes, longitudes, radius_km, workers).tolist()
+
+    def coverage(self, layer, latitudes, longitudes, thresholds_km=DEFAULT_THRESHOLDS_KM, weights=None):
+        """Percentage of the points (weighted when weights are given) within each threshold"""
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float).ravel()
+            if len(weights) != len(latitudes):
+                raise QueryError(f"'weights' has {len(weights)} values for {len(latitudes)} points")
+        distances, _ = self._index(layer).query(latitudes, longitudes)
+        distribution = DistanceDistribution(distances, weights)
+        return {
+            'coverage_pct': {str(t): round(float(pct), 3) for t, pct in distribution.coverage(thresholds_km).items()},
+            'median_distance_km': round(float(distribution.median), 4),
+        }
+
+    async def nearest_one(self, layer, latitude, longitude):
+        """Nearest facility for one point, from the cache or the next coalesced batch"""
+        self._index(layer)
+        key = ('nearest', layer, round(latitude, CACHE_DECIMALS), round(longitude, CACHE_DECIMALS))
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending[layer]
+        pending.append((key, latitude, longitude, future))
+        if len(pending) == 1:
+            asyncio.get_running_loop().call_soon(self._flush, layer)
+        return await future
+
+    def _flush(self, layer):
+        pending = self._pending.pop(layer)
+        self.coalesced['flushes'] += 1
+        self.coalesced['points'] += len(pending)
+        try:
+            batch = self.nearest(layer, [p[1] for p in pending], [p[2] for p in pending])
+        except Exception as e:
+            for *_, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (key, _, _, future) in enumerate(pending):
+            result = {field: values[i] for field, values in batch.items()}
+            self.cache.put(key, result)
+            if not future.done():
+                future.set_result(result)
+
+    def within_one(self, layer, latitude, longitude, radius_km):
+        key = ('within', layer, round(latitude, CACHE_DECIMALS), round(longitude, CACHE_DECIMALS), radius_km)
+        result = self.cache.get(key)
+        if result is None:
+            result = {'count': self.within(layer, [latitude], [longitude], radius_km)[0]}
+            self.cache.put(key, result)
+        return result
+
+    def metrics(self):
+        return {
+            'latency': self.stats.summary(),
+            'cache': {'entries': len(self.cache.entries), 'hits': self.cache.hits, 'misses': self.cache.misses},
+            'coalesced': dict(self.coalesced),
+            'layers': {layer: len(index) for layer, index in self.indexes.items()},
+        }
+
+    async def answer(self, path, params):
+        """Run one query; returns (status, payload)"""
+        if path == '/metrics':
+            return 200, self.metrics()
+        if path == '/layers':
+            return 200, {'city': CITY_NAME, 'layers': {layer: len(index) for layer, index in self.indexes.items()}}
+        if path not in ('/nearest', '/within', '/coverage'):
+            return 404, {'error': f'Unknown endpoint {path}; use /nearest, /within, /coverage, /layers or /metrics'}
+
+        start = time.perf_counter()
+        try:
+            layer = str(params.get('layer', 'any'))
+            if 'points' in params:
+                points = np.asarray(params['points'], dtype=float).reshape(-1, 2)
+                if len(points) == 0:
+                    raise QueryError("'points' must hold at least one [lat, lon] pair")
+                latitudes, longitudes = points[:, 0], points[:, 1]
+                single = False
+            else:
+                latitudes, longitudes = float(params['lat']), float(params['lon'])
+                single = True
+            if not (np.isfinite(latitudes).all() and np.isfinite(longitudes).all()):
+                raise QueryError('Coordinates must be finite numbers')
+
+            if path == '/nearest':
+                payload = await self.nearest_one(layer, latitudes, longitudes) if single else \
+                    self.nearest(layer, latitudes, longitudes)
+            elif path == '/within':
+                radius_km = float(params['radius_km'])
+                if not (np.isfinite(radius_km) and radius_km > 0):
+                    raise QueryError("'radius_km' must be a finite number above 0")
+                payload = self.within_one(layer, latitudes, longitudes, radius_km) if single else \
+                    {'count': self.within(layer, latitudes, longitudes, radius_km)}
+            else:
+                thresholds = params.get('thresholds_km', DEFAULT_THRESHOLDS_KM)
+                if isinstance(thresholds, str):
+                    thresholds = thresholds.split(',')
+                weights = params.get('weights')
+                payload = self.coverage(layer, np.atleast_1d(latitudes), np.atleast_1d(longitudes),
+                                        [float(t) for t in thresholds], weights)
+        except KeyError as e:
+            return 400, {'error': f'Missing parameter {e.args[0]!r}'}
+        except (QueryError, ValueError, TypeError, IndexError) as e:
+            return 400, {'error': str(e)}
+
+        points = 1 if single else len(latitudes)
+        self.stats.record(f"{path[1:]}:{'single' if single else 'batch'}", time.perf_counter() - start, points)
+        return 200, dict(payload, layer=layer)
+
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one keep-alive connection"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            url = urlsplit(target)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if method not in ('GET', 'POST'):
+                status, payload = 405, {'error': 'Use GET or POST'}
+            else:
+                try:
+                    if body:
+                        params.update(json.loads(body))
+                    status, payload = await service.answer(url.path, params)
+                except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, TypeError) as e:
+                    status, payload = 400, {'error': f'Expected a JSON object body ({e})'}
+
+            data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' and (version != 'HTTP/1.0' or connection == 'keep-alive')
+            head = [f'HTTP/1.1 {status} {REASONS[status]}', 'Content-Type: application/json',
+                    f'Content-Length: {len(data)}', f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8001, unix_path=None):
+    handler = partial(handle_connection, service)
+    if unix_path:
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        print(f"✓ Serving {CITY_NAME} accessibility queries on unix socket {unix_path} (Ctrl+C to stop)")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"✓ Serving {CITY_NAME} accessibility queries at http://{host}:{port}/ (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running nearest/within/coverage query service with warm indexes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--unix', help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--facilities', default=CLEAN_PATH)
+    parser.add_argument('--cache-size', type=int, default=100_000, help='Single-point results kept in memory')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("ACCESSIBILITY QUERY SERVICE")
+    print("="*60)
+
+    start = time.perf_counter()
+    service = AccessibilityService(load_facilities(args.facilities), args.cache_size)
+    layers = ', '.join(f'{layer} ({len(index)})' for layer, index in service.indexes.items())
+    print(f"\nLoaded facilities and built indexes in {time.perf_counter() - start:.2f}s: {layers}")
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\nStopping service")
+    finally:
+        for endpoint, stats in service.stats.summary().items():
+            print(f"  {endpoint:18s} {stats['requests']:8d} requests  p50 {stats['p50_ms']:.3f} ms  "
+                  f"p99 {stats['p99_ms']:.3f} ms  {stats['points_per_s'] or 0:,} points/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import json
+
+import numpy as np
+from scipy.spatial import Voronoi
+
+from facility_density import EARTH_RADIUS_KM
+from study_boundary import points_in_boundary
+
+
+# Planar coordinates in km, using the same radians * Earth radius metric as
+# the KDTree distance calculations so exact and grid numbers are comparable
+def project_km(latitudes, longitudes):
+    """Project lat/lon degrees to planar (x, y) km"""
+    return np.column_stack([np.radians(longitudes), np.radians(latitudes)]) * EARTH_RADIUS_KM
+
+
+def unproject_km(points_km):
+    """Convert planar (x, y) km back to (latitude, longitude) degrees"""
+    lon_lat = np.degrees(np.asarray(points_km) / EARTH_RADIUS_KM)
+    return lon_lat[:, 1], lon_lat[:, 0]
+
+
+def clip_polygon(subject, clip_vertices):
+    """Clip a polygon to a convex counter-clockwise polygon (Sutherland-Hodgman).
+
+    The subject may be concave and keeps its orientation, so clipped
+    holes stay clockwise. Each clip edge is applied to all subject
+    vertices at once.
+    """
+    output = np.asarray(subject, dtype=float)
+    for i in range(len(clip_vertices)):
+        if len(output) == 0:
+            break
+        edge_start = clip_vertices[i]
+        edge = clip_vertices[(i + 1) % len(clip_vertices)] - edge_start
+
+        current = output
+        previous = np.roll(output, 1, axis=0)
+        side_current = edge[0] * (current[:, 1] - edge_start[1]) - edge[1] * (current[:, 0] - edge_start[0])
+        side_previous = np.roll(side_current, 1)
+        inside_current = side_current >= 0
+        crossing = inside_current != (side_previous >= 0)
+
+        # For every subject vertex emit [edge crossing point, vertex], keeping only the valid ones
+        denominator = np.where(crossing, side_previous - side_current, 1)
+        t = (side_previous / denominator)[:, None]
+        crossing_points = previous + t * (current - previous)
+        candidates = np.stack([crossing_points, current], axis=1).reshape(-1, 2)
+        keep = np.column_stack([crossing, inside_current]).ravel()
+        output = candidates[keep]
+    return output
+
+
+def bounds_polygon(x_min, y_min, x_max, y_max):
+    """Counter-clockwise rectangle vertices"""
+    return np.array([(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)])
+
+
+def signed_area(polygon):
+    """Shoelace area, positive for counter-clockwise rings"""
+    x, y = polygon[:, 0], polygon[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def boundary_rings_km(polygons):
+    """Project boundary polygons (from study_boundary.load_boundary) to km rings.
+
+    Outer rings are made counter-clockwise and holes clockwise, so signed
+    areas of clipped pieces add up correctly.
+    """
+    rings_km = []
+    for rings in polygons:
+        for i, ring in enumerate(rings):
+            ring_km = project_km(ring[:, 1], ring[:, 0])
+            if np.allclose(ring_km[0], ring_km[-1]):
+                ring_km = ring_km[:-1]
+            if (signed_area(ring_km) > 0) != (i == 0):
+                ring_km = ring_km[::-1]
+            rings_km.append(ring_km)
+    return rings_km
+
+
+def voronoi_service_areas(sites_km, boundary_rings):
+    """Nearest-facility service areas: Voronoi cells of the sites clipped to the boundary.
+
+    boundary_rings is a list of km rings, outer rings counter-clockwise
+    and holes clockwise (e.g. [bounds_polygon(...)] or the output of
+    boundary_rings_km). Every ring is clipped by each convex Voronoi
+    cell, so the service area of a site is a list of pieces whose signed
+    areas sum to its area inside the boundary. Duplicate sites share one
+    cell, owned by the first occurrence. Returns (site_index, pieces)
+    pairs; sites whose cell lies outside the boundary are left out.
+    """
+    unique_sites, first_index = np.unique(sites_km, axis=0, return_index=True)
+
+    # Four far-away helper sites make every real cell bounded; they are
+    # far enough that they do not change any cell inside the boundary
+    boundary_points = np.vstack(boundary_rings)
+    center = boundary_points.mean(axis=0)
+    extent = np.ptp(boundary_points, axis=0).max() + np.ptp(unique_sites, axis=0).max() + 1
+    helpers = center + 10 * extent * np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)])
+    voronoi = Voronoi(np.vstack([unique_sites, helpers]))
+
+    ring_bounds = [(ring.min(axis=0), ring.max(axis=0)) for ring in boundary_rings]
+    service_areas = []
+    for site, region_index in enumerate(voronoi.point_region[:len(unique_sites)]):
+        cell = voronoi.vertices[voronoi.regions[region_index]]
+        # Order vertices counter-clockwise around the site
+        angles = np.arctan2(cell[:, 1] - unique_sites[site, 1], cell[:, 0] - unique_sites[site, 0])
+        cell = cell[np.argsort(angles)]
+        cell_min, cell_max = cell.min(axis=0), cell.max(axis=0)
+
+        pieces = []
+        for ring, (ring_min, ring_max) in zip(boundary_rings, ring_bounds):
+            if (ring_min > cell_max).any() or (ring_max < cell_min).any():
+                continue
+            piece = clip_polygon(ring, cell)
+            if len(piece) >= 3:
+                pieces.append(piece)
+        if pieces:
+            service_areas.append((first_index[site], pieces))
+    return service_areas
+
+
+def circle_intersection_areas(polygons, centers, radius):
+    """Exact signed area of each polygon intersected with a circle around its center.
+
+    Every edge (A, B) contributes the signed area of triangle (center, A, B)
+    intersected with the circle: straight-line triangle parts inside the
+    circle and circular-sector parts outside it. All edges of all polygons
+    are processed in one vectorised pass and summed per polygon; clockwise
+    polygons (holes) come out negative.
+    """
+    starts, ends, owners = [], [], []
+    for i, (polygon, center) in enumerate(zip(polygons, centers)):
+        relative = polygon - center
+        starts.append(relative)
+        ends.append(np.roll(relative, -1, axis=0))
+        owners.append(np.full(len(polygon), i))
+    a = np.vstack(starts)
+    b = np.vstack(ends)
+    owners = np.concatenate(owners)
+
+    # Where does the edge A + t (B - A) cross the circle?
+    d = b - a
+    qa = (d ** 2).sum(axis=1)
+    qb = 2 * (a * d).sum(axis=1)
+    qc = (a ** 2).sum(axis=1) - radius ** 2
+    disc = qb ** 2 - 4 * qa * qc
+    crosses = (disc > 0) & (qa > 0)
+    root = np.sqrt(np.where(crosses, disc, 0))
+    safe_qa = np.where(qa > 0, qa, 1)
+    # Edges that miss the circle are one outside piece from A to B
+    t1 = np.where(crosses, np.clip((-qb - root) / (2 * safe_qa), 0, 1), 1)
+    t2 = np.where(crosses, np.clip((-qb + root) / (2 * safe_qa), 0, 1), 1)
+    p1 = a + t1[:, None] * d
+    p2 = a + t2[:, None] * d
+
+    def cross(p, q):
+        return p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0]
+
+    def sector(p, q):
+        return 0.5 * radius ** 2 * np.arctan2(cross(p, q), (p * q).sum(axis=1))
+
+    signed = sector(a, p1) + 0.5 * cross(p1, p2) + sector(p2, b)
+    return np.bincount(owners, weights=signed, minlength=len(polygons))
+
+
+def exact_coverage(service_areas, sites_km, boundary_rings, thresholds_km=(1, 2, 5, 10)):
+    """Percentage of the boundary area within each threshold of its nearest site"""
+    pieces = [piece for _, site_pieces in service_areas for piece in site_pieces]
+    centers = np.vstack([
+        np.repeat(sites_km[index][None, :], len(site_pieces), axis=0)
+        for index, site_pieces in service_areas
+    ])
+    total_area = sum(signed_area(ring) for ring in boundary_rings)
+    return {
+        threshold: circle_intersection_areas(pieces, centers, threshold).sum() / total_area * 100
+        for threshold in thresholds_km
+    }
+
+
+def interior_point(ring):
+    """A point just inside a ring, beside the midpoint of its longest edge"""
+    edges = np.roll(ring, -1, axis=0) - ring
+    longest = np.argmax((edges ** 2).sum(axis=1))
+    midpoint = ring[longest] + edges[longest] / 2
+    # The interior is left of the edges of a counter-clockwise ring, right of a clockwise one
+    inward = np.array([-edges[longest, 1], edges[longest, 0]]) * np.sign(signed_area(ring))
+    return midpoint + inward * 1e-6
+
+
+def group_pieces(pieces):
+    """Group clipped pieces into polygons: [outer piece, its holes...], largest outer first.
+
+    Counter-clockwise pieces are outer rings; each clockwise piece (a hole)
+    goes with the outer piece that contains it.
+    """
+    outers = sorted((piece for piece in pieces if signed_area(piece) > 0), key=signed_area, reverse=True)
+    polygons = [[outer] for outer in outers]
+    for hole in (piece for piece in pieces if signed_area(piece) <= 0):
+        x, y = interior_point(hole)
+        containing = [i for i, outer in enumerate(outers) if points_in_boundary([y], [x], [[outer]])[0]]
+        if containing:
+            polygons[containing[0]].append(hole)
+    return polygons
+
+
+def geojson_ring(piece):
+    """Closed [lon, lat] ring of a km piece"""
+    latitudes, longitudes = unproject_km(piece)
+    ring = [[lon, lat] for lat, lon in zip(latitudes, longitudes)]
+    return ring + ring[:1]
+
+
+def service_areas_geojson(service_areas, facilities, service_category):
+    """GeoJSON features for service-area polygons, tagged with their facility.
+
+    A service area clipped into several separate pieces (islands, a
+    multi-part boundary) is written as a MultiPolygon, each hole attached
+    to the piece containing it.
+    """
+    features = []
+    for index, pieces in service_areas:
+        facility = facilities.iloc[index]
+        polygons = [[geojson_ring(ring) for ring in polygon] for polygon in group_pieces(pieces)]
+        if len(polygons) == 1:
+            geometry = {'type': 'Polygon', 'coordinates': polygons[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'coordinates': polygons}
+        features.append({
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': {
+                'service_category': service_category,
+                'facility_id': int(facility['id']),
+                'name': str(facility['name']),
+                'category': str(facility['category']),
+                'area_km2': round(float(sum(signed_area(piece) for piece in pieces)), 4),
+            },
+        })
+    return features
+
+
+def write_service_areas(features, path):
+    """Save service-area features as a GeoJSON FeatureCollection"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, ensure_ascii=False)
@@ -0,0 +1,296 @@
+import argparse
+import glob
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from config import SNAPSHOT_DIR
+from coverage_stats import DistanceDistribution
+from facility_density import EARTH_RADIUS_KM
+
+CLEAN_PATH = 'data/processed/healthcare_facilities_clean.csv'
+GRID_PATH = 'data/processed/accessibility_grid.csv'
+
+SNAPSHOT_COLUMNS = ['osm_type', 'id', 'name', 'type', 'category', 'latitude', 'longitude']
+TEXT_COLUMNS = ['osm_type', 'name', 'type', 'category']
+
+# A node and a way can share a numeric id, so facilities are keyed by
+# (element type, id), packed into one sortable integer
+OSM_TYPE_CODES = {'node': 0, 'way': 1, 'relation': 2}
+OSM_ID_BITS = 40
+
+# Distance layers tracked over time (None = every category)
+LAYERS = {'any': None, 'hospital': 'Hospital', 'clinic': 'Clinic'}
+
+# Position changes smaller than this are treated as re-surveys, not moves
+MOVE_THRESHOLD_M = 25
+
+
+def snapshot_path(snapshot_date, directory=SNAPSHOT_DIR):
+    """<directory>/<YYYY-MM>/<YYYY-MM-DD>.npz"""
+    return os.path.join(directory, snapshot_date[:7], f'{snapshot_date}.npz')
+
+
+def facility_keys(osm_types, ids):
+    """Sortable int64 key per facility from its OSM element type and id.
+
+    Tables collected before the element type was recorded have an empty
+    osm_type, which gets a code of its own.
+    """
+    codes = np.array([OSM_TYPE_CODES.get(t, len(OSM_TYPE_CODES)) for t in osm_types], dtype=np.int64)
+    return (codes << OSM_ID_BITS) | np.asarray(ids, dtype=np.int64)
+
+
+def snapshot_keys(snapshot):
+    """(type, id) keys of a loaded snapshot, in its stored (sorted) order"""
+    osm_types = snapshot['osm_type'] if 'osm_type' in snapshot else np.full(len(snapshot['id']), '')
+    return facility_keys(osm_types, snapshot['id'])
+
+
+def save_snapshot(facilities, snapshot_date=None, directory=SNAPSHOT_DIR):
+    """Store a facility table as one compressed columnar file sorted by OSM type and id.
+
+    Each column is its own array inside the .npz, so readers load only
+    the columns they need. A second save on the same date replaces the
+    first. Raises ValueError if a (type, id) pair occurs more than once.
+    Returns the path.
+    """
+    snapshot_date = snapshot_date or date.today().isoformat()
+    df = facilities.reindex(columns=SNAPSHOT_COLUMNS)
+    df['osm_type'] = df['osm_type'].fillna('')
+    duplicated = df.duplicated(['osm_type', 'id'], keep=False)
+    if duplicated.any():
+        pairs = df.loc[duplicated, ['osm_type', 'id']].drop_duplicates().head(5).values
+        examples = ', '.join(f"{osm_type or '?'}/{osm_id}" for osm_type, osm_id in pairs)
+        raise ValueError(f"{duplicated.sum()} facilities share an OSM (type, id): {examples}")
+    df = df.iloc[np.argsort(facility_keys(df['osm_type'], df['id']), kind='stable')]
+    columns = {
+        'id': df['id'].values.astype(np.int64),
+        'latitude': df['latitude'].values.astype(np.float64),
+        'longitude': df['longitude'].values.astype(np.float64),
+    }
+    for column in TEXT_COLUMNS:
+        columns[column] = df[column].fillna('').astype(str).to_numpy(dtype=str)
+
+    path = snapshot_path(snapshot_date, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **columns)
+    os.replace(tmp_path, path)
+    return path
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Dates of all stored snapshots, oldest first"""
+    return sorted(os.path.basename(p)[:-len('.npz')] for p in glob.glob(os.path.join(directory, '*', '*.npz')))
+
+
+def load_snapshot(snapshot_date, directory=SNAPSHOT_DIR, columns=None):
+    """Columns of one snapshot as a dict of arrays (all columns by default)"""
+    with np.load(snapshot_path(snapshot_date, directory)) as data:
+        return {column: data[column] for column in (columns or data.files)}
+
+
+def diff_snapshots(old, new, move_threshold_m=MOVE_THRESHOLD_M):
+    """Added, removed, moved and recategorized facilities between two snapshots.
+
+    Both snapshots are sorted by (OSM type, id), so matching is a merge of
+    two sorted key arrays (binary search of each new key into the old
+    ones) with no hashing or re-sorting. Returns index arrays into old/new:
+    'added' (new), 'removed' (old), 'matched' (old, new pairs), and boolean
+    masks over the matched pairs for 'moved' and 'recategorized', plus
+    'shift_m' (distance each matched facility moved).
+    """
+    old_keys, new_keys = snapshot_keys(old), snapshot_keys(new)
+    positions = np.searchsorted(old_keys, new_keys)
+    found = positions < len(old_keys)
+    found[found] = old_keys[positions[found]] == new_keys[found]
+
+    old_idx, new_idx = positions[found], np.flatnonzero(found)
+    removed = np.ones(len(old_keys), dtype=bool)
+    removed[old_idx] = False
+
+    # Same planar metric on radians as the pipeline's KDTree distances
+    shift_m = np.hypot(
+        np.radians(new['latitude'][new_idx] - old['latitude'][old_idx]),
+        np.radians(new['longitude'][new_idx] - old['longitude'][old_idx]),
+    ) * EARTH_RADIUS_KM * 1000
+    return {
+        'added': np.flatnonzero(~found),
+        'removed': np.flatnonzero(removed),
+        'matched': (old_idx, new_idx),
+        'moved': shift_m > move_threshold_m,
+        'recategorized': old['category'][old_idx] != new['category'][new_idx],
+        'shift_m': shift_m,
+    }
+
+
+def diff_table(old, new, diff):
+    """One row per changed facility: change, OSM type and id, name, category and old/new position"""
+    old_idx, new_idx = diff['matched']
+    parts = [
+        ('added', None, diff['added']),
+        ('removed', diff['removed'], None),
+        ('moved', old_idx[diff['moved']], new_idx[diff['moved']]),
+        ('recategorized', old_idx[diff['recategorized']], new_idx[diff['recategorized']]),
+    ]
+    frames = []
+    for change, old_rows, new_rows in parts:
+        rows = new_rows if new_rows is not None else old_rows
+        source = new if new_rows is not None else old
+        frame = pd.DataFrame({
+            'change': change,
+            'osm_type': source['osm_type'][rows] if 'osm_type' in source else '',
+            'id': source['id'][rows],
+            'name': source['name'][rows],
+            'category': source['category'][rows],
+            'old_category': old['category'][old_rows] if old_rows is not None else '',
+            'old_latitude': old['latitude'][old_rows] if old_rows is not None else np.nan,
+            'old_longitude': old['longitude'][old_rows] if old_rows is not None else np.nan,
+            'new_latitude': new['latitude'][new_rows] if new_rows is not None else np.nan,
+            'new_longitude': new['longitude'][new_rows] if new_rows is not None else np.nan,
+        })
+        if change == 'moved':
+            frame['shift_m'] = np.round(diff['shift_m'][diff['moved']], 1)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _layer_coords(snapshot, category):
+    in_layer = np.ones(len(snapshot['id']), dtype=bool) if category is None else snapshot['category'] == category
+    return in_layer, np.radians(np.column_stack([snapshot['latitude'], snapshot['longitude']]))
+
+
+def nearest_distances(grid_coords, snapshot, category=None):
+    """Full nearest-facility distance (km) from every grid point for one layer"""
+    in_layer, coords = _layer_coords(snapshot, category)
+    distances_rad, _ = cKDTree(coords[in_layer]).query(grid_coords)
+    return distances_rad * EARTH_RADIUS_KM
+
+
+def update_distances(grid_coords, distances, old, new, diff, category=None):
+    """Nearest-facility distances for the new snapshot, recomputing only affected cells.
+
+    Only facilities that left the layer (removed, moved away, recategorized
+    out) can make a cell farther from care, and only cells whose nearest
+    facility was one of them are re-queried against the new layer.
+    Facilities that arrived can only bring cells closer, which a query
+    against the arrivals alone settles. Returns (distances, cells_requeried).
+    """
+    old_in, old_coords = _layer_coords(old, category)
+    new_in, new_coords = _layer_coords(new, category)
+    old_idx, new_idx = diff['matched']
+    unchanged = old_in[old_idx] & new_in[new_idx] & ~diff['moved']
+
+    gone = old_in.copy()
+    gone[old_idx[unchanged]] = False
+    arrived = new_in.copy()
+    arrived[new_idx[unchanged]] = False
+
+    updated = distances.copy()
+    affected = np.zeros(len(grid_coords), dtype=bool)
+    if gone.any():
+        gone_rad, _ = cKDTree(old_coords[gone]).query(grid_coords)
+        affected = gone_rad * EARTH_RADIUS_KM <= distances + 1e-9
+        if affected.any():
+            requery_rad, _ = cKDTree(new_coords[new_in]).query(grid_coords[affected])
+            updated[affected] = requery_rad * EARTH_RADIUS_KM
+    if arrived.any():
+        rest = ~affected
+        arrival_rad, _ = cKDTree(new_coords[arrived]).query(grid_coords[rest])
+        updated[rest] = np.minimum(updated[rest], arrival_rad * EARTH_RADIUS_KM)
+    return updated, int(affected.sum())
+
+
+def accessibility_trend(dates, grid_df, directory=SNAPSHOT_DIR, thresholds_km=(2, 5)):
+    """Accessibility summary per snapshot; only the first snapshot is computed in full"""
+    grid_coords = np.radians(grid_df[['latitude', 'longitude']].values)
+    weights = grid_df['cell_weight'].values if 'cell_weight' in grid_df.columns else None
+
+    rows = []
+    previous, distances = None, {}
+    for snapshot_date in dates:
+        snapshot = load_snapshot(snapshot_date, directory)
+        row = {'date': snapshot_date, 'facilities': len(snapshot['id'])}
+        if previous is None:
+            distances = {layer: nearest_distances(grid_coords, snapshot, category)
+                         for layer, category in LAYERS.items()}
+            row.update(added=0, removed=0, moved=0, cells_requeried=len(grid_coords) * len(LAYERS))
+        else:
+            diff = diff_snapshots(previous, snapshot)
+            requeried = 0
+            for layer, category in LAYERS.items():
+                distances[layer], count = update_distances(grid_coords, distances[layer], previous, snapshot,
+                                                           diff, category)
+                requeried += count
+            row.update(added=len(diff['added']), removed=len(diff['removed']),
+                       moved=int(diff['moved'].sum()), cells_requeried=requeried)
+
+        for layer, layer_distances in distances.items():
+            distribution = DistanceDistribution(layer_distances, weights)
+            row[f'median_distance_{layer}_km'] = round(distribution.median, 3)
+            for threshold, pct in distribution.coverage(list(thresholds_km)).items():
+                row[f'coverage_{layer}_{threshold}km_pct'] = round(pct, 2)
+        rows.append(row)
+        previous = snapshot
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned facility snapshots, diffs and accessibility trends')
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='Snapshot store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    save = commands.add_parser('save', help='Store the cleaned facility table as a snapshot')
+    save.add_argument('--date', help='Snapshot date (YYYY-MM-DD, default today)')
+    save.add_argument('--input', default=CLEAN_PATH)
+    commands.add_parser('list', help='List stored snapshots')
+    diff = commands.add_parser('diff', help='Changes between two snapshots')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    trend = commands.add_parser('trend', help='Accessibility over all (or selected) snapshots')
+    trend.add_argument('dates', nargs='*')
+    trend.add_argument('--grid', default=GRID_PATH, help='Grid CSV whose points are evaluated')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("FACILITY SNAPSHOTS")
+    print("="*60)
+
+    if args.command == 'save':
+        path = save_snapshot(pd.read_csv(args.input), args.date, args.dir)
+        print(f"\n✓ Snapshot saved to: {path}")
+
+    elif args.command == 'list':
+        for snapshot_date in list_snapshots(args.dir):
+            print(f"  {snapshot_date}  {len(load_snapshot(snapshot_date, args.dir, ['id'])['id'])} facilities")
+
+    elif args.command == 'diff':
+        old, new = load_snapshot(args.old, args.dir), load_snapshot(args.new, args.dir)
+        changes = diff_table(old, new, diff_snapshots(old, new))
+        print(f"\n{args.old} -> {args.new}")
+        for change, count in changes['change'].value_counts().items():
+            print(f"  {change:15s} {count}")
+        os.makedirs('outputs', exist_ok=True)
+        output_path = f'outputs/snapshot_diff_{args.old}_{args.new}.csv'
+        changes.to_csv(output_path, index=False)
+        print(f"\n✓ Changes saved to: {output_path}")
+
+    else:
+        dates = args.dates or list_snapshots(args.dir)
+        if not dates:
+            parser.error(f'No snapshots in {args.dir}; run "python snapshot_store.py save" first')
+        trend_df = accessibility_trend(dates, pd.read_csv(args.grid), args.dir)
+        print()
+        print(trend_df[['date', 'facilities', 'added', 'removed', 'moved', 'cells_requeried',
+                        'median_distance_any_km', 'coverage_any_5km_pct']].to_string(index=False))
+        os.makedirs('outputs', exist_ok=True)
+        trend_df.to_csv('outputs/accessibility_trend.csv', index=False)
+        print(f"\n✓ Trend saved to: outputs/accessibility_trend.csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+
+
+def load_boundary(path):
+    """Load a study-area boundary from a local GeoJSON file.
+
+    Accepts a FeatureCollection, Feature or bare geometry with Polygon or
+    MultiPolygon geometries. Returns a list of polygons, each a list of
+    rings (outer ring first, then holes) as (longitude, latitude) arrays.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    if data['type'] == 'FeatureCollection':
+        geometries = [feature['geometry'] for feature in data['features']]
+    elif data['type'] == 'Feature':
+        geometries = [data['geometry']]
+    else:
+        geometries = [data]
+
+    polygons = []
+    for geometry in geometries:
+        if geometry['type'] == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            raise ValueError(f"Unsupported boundary geometry type: {geometry['type']}")
+        for rings in parts:
+            polygons.append([np.asarray(ring, dtype=float)[:, :2] for ring in rings])
+    return polygons
+
+
+def boundary_bounds(polygons):
+    """(lat_min, lat_max, lon_min, lon_max) of all outer rings"""
+    outer = np.vstack([rings[0] for rings in polygons])
+    return outer[:, 1].min(), outer[:, 1].max(), outer[:, 0].min(), outer[:, 0].max()
+
+
+def even_odd_parity(sorted_lat, sorted_lon, polygons):
+    """Even-odd ray-casting parity for points already sorted by latitude.
+
+    Each ring edge only looks at the contiguous slice of points inside its
+    latitude band and flips the parity of those lying west of it. Every
+    point of the band is tested, across the full width of the grid, so
+    work is the sum over edges of the points in each edge's band: far
+    below points x edges for a coastline of many short edges, but a long
+    north-south edge still tests most of the grid.
+    """
+    parity = np.zeros(len(sorted_lat), dtype=bool)
+
+    rings = [ring for rings in polygons for ring in rings]
+    starts = np.vstack(rings)
+    ends = np.vstack([np.roll(ring, -1, axis=0) for ring in rings])
+    lon1, lat1 = starts[:, 0], starts[:, 1]
+    lon2, lat2 = ends[:, 0], ends[:, 1]
+
+    # Half-open latitude band of each edge, as a slice of the sorted points
+    band_low = np.searchsorted(sorted_lat, np.minimum(lat1, lat2), side='left')
+    band_high = np.searchsorted(sorted_lat, np.maximum(lat1, lat2), side='left')
+
+    for edge in np.flatnonzero(band_high > band_low):
+        band = slice(band_low[edge], band_high[edge])
+        crossing_lon = lon1[edge] + (sorted_lat[band] - lat1[edge]) * (
+            (lon2[edge] - lon1[edge]) / (lat2[edge] - lat1[edge])
+        )
+        parity[band] ^= sorted_lon[band] < crossing_lon
+    return parity
+
+
+def points_in_boundary(latitudes, longitudes, polygons):
+    """Point-in-polygon test against a (multi)polygon boundary.
+
+    Even-odd ray casting, so holes and separate polygons need no special
+    handling. Points are sorted by latitude once; then each ring edge in
+    turn flips the parity of the points in its latitude band (a
+    contiguous slice of the sorted points) that lie west of it. Work per
+    edge is a vectorised pass over that band only, which keeps complex
+    coastlines fast on millions of points (see even_odd_parity).
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+
+    order = np.argsort(latitudes, kind='stable')
+    inside = np.empty(len(latitudes), dtype=bool)
+    inside[order] = even_odd_parity(latitudes[order], longitudes[order], polygons)
+    return inside
@@ -1,22 +1,44 @@
 import pandas as pd
 import folium
+from instrumentation import Trace
 
-df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
-
-m = folium.Map(
-    location=[df['latitude'].mean(), df['longitude'].mean()],
-    zoom_start=11
-)
-
-# Just add circles - nothing fancy
-for idx, row in df.iterrows():
-    folium.Circle(
-        location=[row['latitude'], row['longitude']],
-        radius=100,
-        color='red',
-        fill=True,
-        popup=str(row['name'])
-    ).add_to(m)
-
-m.save('outputs/ultra_simple.html')
-print("Saved!")
\ No newline at end of file
+
+def build_map(df, trace=None):
+    """Bare map with one red circle per facility"""
+    trace = trace or Trace('ultra_simple_map')
+
+    m = folium.Map(
+        location=[df['latitude'].mean(), df['longitude'].mean()],
+        zoom_start=11
+    )
+
+    # Just add circles - nothing fancy
+    with trace.span('markers', rows=len(df)):
+        for idx, row in df.iterrows():
+            folium.Circle(
+                location=[row['latitude'], row['longitude']],
+                radius=100,
+                color='red',
+                fill=True,
+                popup=str(row['name'])
+            ).add_to(m)
+    return m
+
+
+def main():
+    trace = Trace('ultra_simple_map')
+
+    with trace.span('load') as span:
+        df = pd.read_csv('data/processed/healthcare_facilities_clean.csv')
+        span['rows'] = len(df)
+
+    m = build_map(df, trace)
+
+    with trace.span('map_save', rows=len(df)):
+        m.save('outputs/ultra_simple.html')
+    print("Saved!")
+    print(f"\n✓ Stage trace saved to: {trace.save()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import CATEGORY_PRIORITY
+from heatmap_pyramid import build_pyramid, level_for_zoom, level_points, load_distance_grid
+from service_areas import bounds_polygon, clip_polygon, signed_area
+
+FACILITIES_PATH = 'data/processed/healthcare_facilities_clean.csv'
+SERVICE_AREAS_PATH = 'data/processed/service_areas.geojson'
+MBTILES_PATH = 'outputs/healthcare_tiles.mbtiles'
+
+EXTENT = 4096
+# Geometry is kept this far (tile units) outside each tile so styles don't show seams
+BUFFER = 64
+
+# Accessibility classes by distance to the nearest facility (km)
+ACCESS_CLASSES = [(0, 1, '0-1 km'), (1, 2, '1-2 km'), (2, 5, '2-5 km'), (5, 10, '5-10 km'), (10, np.inf, '>10 km')]
+
+
+# --- Protocol buffer encoding (vector_tile.proto, version 2) ---
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return 2 * value if value >= 0 else -2 * value - 1
+
+
+def _field_varint(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _field_bytes(number, payload):
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _packed(number, values):
+    return _field_bytes(number, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return _field_varint(7, int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return _field_varint(5, value) if value >= 0 else _field_varint(6, _zigzag(value))
+    if isinstance(value, (float, np.floating)):
+        return _varint((3 << 3) | 1) + struct.pack('<d', float(value))
+    return _field_bytes(1, str(value).encode('utf-8'))
+
+
+class LayerBuilder:
+    """Collects features of one vector tile layer, sharing its key/value tables"""
+
+    POINT, POLYGON = 1, 3
+
+    def __init__(self, name):
+        self.name = name
+        self.keys = {}
+        self.values = {}
+        self.features = []
+
+    def add_feature(self, geometry_type, geometry, properties):
+        tags = []
+        for key, value in properties.items():
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault((type(value).__name__, value), len(self.values)))
+        self.features.append(
+            _packed(2, tags) + _field_varint(3, geometry_type) + _packed(4, geometry)
+        )
+
+    def encode(self):
+        return (
+            _field_varint(15, 2)
+            + _field_bytes(1, self.name.encode('utf-8'))
+            + b''.join(_field_bytes(2, feature) for feature in self.features)
+            + b''.join(_field_bytes(3, key.encode('utf-8')) for key in self.keys)
+            + b''.join(_field_bytes(4, _encode_value(value)) for _, value in self.values)
+            + _field_varint(5, EXTENT)
+        )
+
+
+def point_geometry(x, y):
+    return [(1 << 3) | 1, _zigzag(int(x)), _zigzag(int(y))]
+
+
+def polygon_geometry(rings):
+    """Command stream for integer rings (exterior rings with positive signed area)"""
+    commands = []
+    cursor_x = cursor_y = 0
+    for ring in rings:
+        commands.append((1 << 3) | 1)
+        for i, (x, y) in enumerate(ring):
+            if i == 1:
+                commands.append((len(ring) - 1) << 3 | 2)
+            commands.extend([_zigzag(int(x) - cursor_x), _zigzag(int(y) - cursor_y)])
+            cursor_x, cursor_y = int(x), int(y)
+        commands.append((1 << 3) | 7)
+    return commands
+
+
+# --- Geometry helpers in tile coordinates ---
+
+def world_coordinates(latitudes, longitudes):
+    """Web Mercator position in [0, 1] x [0, 1] (y grows southward)"""
+    x = (np.asarray(longitudes, dtype=float) + 180) / 360
+    y = (1 - np.arcsinh(np.tan(np.radians(latitudes))) / np.pi) / 2
+    return x, y
+
+
+def tile_bbox(zoom, tile_x, tile_y):
+    """(lat_min, lon_min, lat_max, lon_max) of a tile"""
+    n = 2 ** zoom
+    lon_min, lon_max = tile_x / n * 360 - 180, (tile_x + 1) / n * 360 - 180
+    lat_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * tile_y / n))))
+    lat_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (tile_y + 1) / n))))
+    return lat_min, lon_min, lat_max, lon_max
+
+
+def simplify_ring(ring, tolerance):
+    """Douglas-Peucker simplification of a closed ring (no repeated end point)"""
+    if len(ring) <= 4 or tolerance <= 0:
+        return ring
+    points = np.vstack([ring, ring[:1]])
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length > 0:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.extend([(start, split), (split, end)])
+    return points[keep][:-1]
+
+
+def integer_ring(ring, exterior):
+    """Round a ring to tile units, drop repeated points and orient it for MVT"""
+    ring = np.rint(ring).astype(np.int64)
+    ring = ring[np.any(ring != np.roll(ring, 1, axis=0), axis=1)]
+    if len(ring) < 3:
+        return None
+    area = signed_area(ring.astype(float))
+    if area == 0:
+        return None
+    if (area > 0) != exterior:
+        ring = ring[::-1]
+    return ring
+
+
+# --- Per-tile rendering (runs in worker processes) ---
+
+_tile_data = None
+
+
+def load_tile_data(facilities_path=FACILITIES_PATH, service_areas_path=SERVICE_AREAS_PATH):
+    """Everything a worker needs, projected to world coordinates once"""
+    facilities = pd.read_csv(facilities_path)
+    priority = facilities['category'].map({c: i for i, c in enumerate(CATEGORY_PRIORITY)})
+    facilities = facilities.assign(priority=priority.fillna(len(CATEGORY_PRIORITY)))
+    # Sorted west to east so each tile finds its facilities with a binary search
+    facilities = facilities.sort_values('longitude', kind='stable').reset_index(drop=True)
+    fx, fy = world_coordinates(facilities['latitude'], facilities['longitude'])
+
+    service_areas = []
+    if os.path.exists(service_areas_path):
+        with open(service_areas_path, encoding='utf-8') as f:
+            features = json.load(f)['features']
+        for feature in features:
+            geometry = feature['geometry']
+            parts = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            rings = []
+            # Each part's exterior comes before its holes, as vector tiles expect
+            for ring in (ring for part in parts for ring in part):
+                ring = np.asarray(ring, dtype=float)[:-1]
+                # Pieces are counter-clockwise in lon/lat, holes clockwise
+                exterior = signed_area(ring) > 0
+                x, y = world_coordinates(ring[:, 1], ring[:, 0])
+                rings.append((np.column_stack([x, y]), exterior))
+            all_points = np.vstack([ring for ring, _ in rings])
+            service_areas.append((rings, all_points.min(axis=0), all_points.max(axis=0), feature['properties']))
+
+    pyramid = None
+    try:
+        pyramid = build_pyramid(*load_distance_grid('any'))
+    except FileNotFoundError:
+        pass
+
+    return {
+        'facilities': facilities,
+        'facility_xy': np.column_stack([fx, fy]),
+        'service_areas': service_areas,
+        'pyramid': pyramid,
+        'center_lat': facilities['latitude'].mean(),
+    }
+
+
+def _init_worker(facilities_path, service_areas_path):
+    global _tile_data
+    _tile_data = load_tile_data(facilities_path, service_areas_path)
+
+
+def _to_tile(xy, zoom, tile_x, tile_y):
+    return (xy * 2 ** zoom - np.array([tile_x, tile_y])) * EXTENT
+
+
+def facility_layer(data, zoom, tile_x, tile_y, max_zoom):
+    layer = LayerBuilder('facilities')
+    n = 2 ** zoom
+    low, high = np.searchsorted(data['facility_xy'][:, 0], [tile_x / n, (tile_x + 1) / n], side='left')
+    tile_xy = _to_tile(data['facility_xy'][low:high], zoom, tile_x, tile_y)
+    indices = np.flatnonzero((tile_xy[:, 1] >= 0) & (tile_xy[:, 1] < EXTENT))
+    if zoom < max_zoom and len(indices):
+        # Point thinning: one facility per 2 px cell, highest priority first
+        indices = indices[np.argsort(data['facilities']['priority'].values[low + indices], kind='stable')]
+        cells = np.floor(tile_xy[indices] / 32).astype(np.int64)
+        _, first = np.unique(cells, axis=0, return_index=True)
+        indices = np.sort(indices[first])
+
+    facilities = data['facilities']
+    for i in indices:
+        row = facilities.iloc[low + i]
+        layer.add_feature(LayerBuilder.POINT, point_geometry(*np.floor(tile_xy[i])), {
+            'id': int(row['id']),
+            'name': str(row['name']),
+            'category': str(row['category']),
+        })
+    return layer
+
+
+def accessibility_layer(data, zoom, tile_x, tile_y):
+    """Accessibility classes as merged cell rectangles, one multipolygon per class"""
+    layer = LayerBuilder('accessibility')
+    pyramid = data['pyramid']
+    if pyramid is None:
+        return layer
+    level = pyramid[level_for_zoom(pyramid, zoom, data['center_lat'], spacing_px=4)]
+    lat_step, lon_step = level['cell_size']
+    lat_min, lon_min, lat_max, lon_max = tile_bbox(zoom, tile_x, tile_y)
+    points = level_points(level, 'max', bbox=(lat_min - lat_step, lon_min - lon_step,
+                                              lat_max + lat_step, lon_max + lon_step))
+    if len(points) == 0:
+        return layer
+
+    lats, lons, values = points[:, 0], points[:, 1], points[:, 2]
+    classes = np.searchsorted([upper for _, upper, _ in ACCESS_CLASSES], values, side='right')
+    classes = np.minimum(classes, len(ACCESS_CLASSES) - 1)
+    cols = np.rint((lons - level['origin'][1]) / lon_step).astype(np.int64)
+
+    # Merge runs of same-class neighbours along each row into one rectangle
+    starts = np.flatnonzero(np.concatenate([
+        [True], (np.diff(lats) != 0) | (np.diff(classes) != 0) | (np.diff(cols) != 1)
+    ]))
+    ends = np.append(starts[1:], len(points)) - 1
+    x0, y1 = world_coordinates(lats[starts] - lat_step / 2, lons[starts] - lon_step / 2)
+    x1, y0 = world_coordinates(lats[starts] + lat_step / 2, lons[ends] + lon_step / 2)
+    corner0 = np.clip(_to_tile(np.column_stack([x0, y0]), zoom, tile_x, tile_y), -BUFFER, EXTENT + BUFFER)
+    corner1 = np.clip(_to_tile(np.column_stack([x1, y1]), zoom, tile_x, tile_y), -BUFFER, EXTENT + BUFFER)
+
+    for class_index, (_, _, label) in enumerate(ACCESS_CLASSES):
+        rings = []
+        for (ax, ay), (bx, by) in zip(corner0[classes[starts] == class_index], corner1[classes[starts] == class_index]):
+            ring = integer_ring(np.array([(ax, ay), (bx, ay), (bx, by), (ax, by)]), exterior=True)
+            if ring is not None:
+                rings.append(ring)
+        if rings:
+            layer.add_feature(LayerBuilder.POLYGON, polygon_geometry(rings), {
+                'class': label,
+                'min_km': float(ACCESS_CLASSES[class_index][0]),
+            })
+    return layer
+
+
+def service_area_layer(data, zoom, tile_x, tile_y, max_zoom):
+    layer = LayerBuilder('service_areas')
+    n = 2 ** zoom
+    margin = BUFFER / EXTENT / n
+    tile_min = np.array([tile_x / n - margin, tile_y / n - margin])
+    tile_max = np.array([(tile_x + 1) / n + margin, (tile_y + 1) / n + margin])
+    clip_rect = bounds_polygon(-BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+    # Per-zoom simplification: about half a pixel, none at the deepest zoom
+    tolerance = 0 if zoom >= max_zoom else EXTENT / 256 / 2
+
+    for rings, feature_min, feature_max, properties in data['service_areas']:
+        if (feature_min > tile_max).any() or (feature_max < tile_min).any():
+            continue
+        # Areas smaller than a pixel at this zoom are dropped
+        if ((feature_max - feature_min) * n * 256 < 1).all():
+            continue
+        tile_rings = []
+        for ring, exterior in rings:
+            ring = _to_tile(ring, zoom, tile_x, tile_y)
+            # Only rings crossing the tile edge need clipping
+            if (ring < -BUFFER).any() or (ring > EXTENT + BUFFER).any():
+                ring = clip_polygon(ring, clip_rect)
+                if len(ring) < 3:
+                    continue
+            ring = integer_ring(simplify_ring(ring, tolerance), exterior)
+            if ring is not None:
+                tile_rings.append((exterior, ring))
+        if not any(exterior for exterior, _ in tile_rings):
+            continue
+        # Each exterior ring must come before its holes
+        tile_rings.sort(key=lambda item: not item[0])
+        layer.add_feature(LayerBuilder.POLYGON, polygon_geometry([ring for _, ring in tile_rings]), properties)
+    return layer
+
+
+def render_tile(tile, max_zoom):
+    """Encoded, gzip-compressed vector tile, or None when it has no features"""
+    zoom, tile_x, tile_y = tile
+    layers = [
+        facility_layer(_tile_data, zoom, tile_x, tile_y, max_zoom),
+        accessibility_layer(_tile_data, zoom, tile_x, tile_y),
+        service_area_layer(_tile_data, zoom, tile_x, tile_y, max_zoom),
+    ]
+    layers = [layer for layer in layers if layer.features]
+    if not layers:
+        return tile, None
+    payload = b''.join(_field_bytes(3, layer.encode()) for layer in layers)
+    return tile, gzip.compress(payload, compresslevel=6)
+
+
+def covering_tiles(lat_min, lon_min, lat_max, lon_max, min_zoom, max_zoom):
+    """(zoom, x, y) of every tile touching a bbox"""
+    x0, y1 = world_coordinates(lat_min, lon_min)
+    x1, y0 = world_coordinates(lat_max, lon_max)
+    tiles = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        n = 2 ** zoom
+        for tile_x in range(int(x0 * n), min(int(x1 * n), n - 1) + 1):
+            for tile_y in range(int(y0 * n), min(int(y1 * n), n - 1) + 1):
+                tiles.append((zoom, tile_x, tile_y))
+    return tiles
+
+
+def write_mbtiles(path, tiles, metadata):
+    """Write (zoom, x, y, data) tiles to an MBTiles file (TMS row order)"""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+    """)
+    connection.executemany('INSERT INTO metadata VALUES (?, ?)', metadata.items())
+    count = 0
+    for zoom, tile_x, tile_y, data in tiles:
+        connection.execute('INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                           (zoom, tile_x, 2 ** zoom - 1 - tile_y, sqlite3.Binary(data)))
+        count += 1
+    connection.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+    connection.commit()
+    connection.close()
+    return count
+
+
+def export_mbtiles(path=MBTILES_PATH, min_zoom=8, max_zoom=14, workers=None,
+                   facilities_path=FACILITIES_PATH, service_areas_path=SERVICE_AREAS_PATH):
+    """Render every tile over the data extent in parallel and write an MBTiles file"""
+    facilities = pd.read_csv(facilities_path, usecols=['latitude', 'longitude'])
+    bounds = (facilities['latitude'].min(), facilities['longitude'].min(),
+              facilities['latitude'].max(), facilities['longitude'].max())
+    tiles = covering_tiles(*bounds, min_zoom, max_zoom)
+    print(f"Rendering {len(tiles)} tiles for zooms {min_zoom}-{max_zoom}...")
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(facilities_path, service_areas_path)) as executor:
+        rendered = executor.map(render_tile, tiles, [max_zoom] * len(tiles), chunksize=16)
+        fields = {'id': 'Number', 'name': 'String', 'category': 'String'}
+        metadata = {
+            'name': 'Healthcare accessibility',
+            'format': 'pbf',
+            'type': 'overlay',
+            'minzoom': str(min_zoom),
+            'maxzoom': str(max_zoom),
+            'bounds': f'{bounds[1]},{bounds[0]},{bounds[3]},{bounds[2]}',
+            'center': f'{(bounds[1] + bounds[3]) / 2},{(bounds[0] + bounds[2]) / 2},{min_zoom}',
+            'json': json.dumps({'vector_layers': [
+                {'id': 'facilities', 'fields': fields, 'minzoom': min_zoom, 'maxzoom': max_zoom},
+                {'id': 'accessibility', 'fields': {'class': 'String', 'min_km': 'Number'},
+                 'minzoom': min_zoom, 'maxzoom': max_zoom},
+                {'id': 'service_areas', 'fields': {'service_category': 'String', 'facility_id': 'Number',
+                                                   'name': 'String', 'category': 'String', 'area_km2': 'Number'},
+                 'minzoom': min_zoom, 'maxzoom': max_zoom},
+            ]}),
+        }
+        count = write_mbtiles(path, ((z, x, y, data) for (z, x, y), data in rendered if data is not None),
+                              metadata)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export facilities and accessibility layers as vector tiles (MBTiles)')
+    parser.add_argument('--output', default=MBTILES_PATH)
+    parser.add_argument('--min-zoom', type=int, default=8)
+    parser.add_argument('--max-zoom', type=int, default=14)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("EXPORTING VECTOR TILES")
+    print("="*60)
+
+    count = export_mbtiles(args.output, args.min_zoom, args.max_zoom, args.workers)
+    size_mb = os.path.getsize(args.output) / 1e6
+    print(f"\n✓ {count} tiles ({size_mb:.1f} MB) saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from study_boundary import even_odd_parity
+
+
+def load_zones(path):
+    """Load administrative zones (wards) from a local GeoJSON FeatureCollection.
+
+    Each feature is one zone, named by its 'name' property (or the first
+    string property, or its position). Returns a list of
+    (zone_name, polygons) with polygons in the study_boundary format.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    zones = []
+    for i, feature in enumerate(data['features']):
+        properties = feature.get('properties') or {}
+        name = properties.get('name')
+        if name is None:
+            name = next((v for v in properties.values() if isinstance(v, str)), f'Zone {i + 1}')
+
+        geometry = feature['geometry']
+        parts = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        polygons = [[np.asarray(ring, dtype=float)[:, :2] for ring in rings] for rings in parts]
+        zones.append((str(name), polygons))
+    return zones
+
+
+def assign_zones(latitudes, longitudes, zones):
+    """Zone index of every point (-1 outside all zones).
+
+    Points are sorted by latitude once and shared by every zone; each zone
+    only tests the slice of points within its own latitude range. Where
+    zones overlap the later one wins.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    order = np.argsort(latitudes, kind='stable')
+    sorted_lat = latitudes[order]
+    sorted_lon = longitudes[order]
+
+    zone_ids_sorted = np.full(len(latitudes), -1, dtype=np.int32)
+    for zone_id, (_, polygons) in enumerate(zones):
+        outer = np.vstack([rings[0] for rings in polygons])
+        low = np.searchsorted(sorted_lat, outer[:, 1].min(), side='left')
+        high = np.searchsorted(sorted_lat, outer[:, 1].max(), side='right')
+        inside = even_odd_parity(sorted_lat[low:high], sorted_lon[low:high], polygons)
+        zone_ids_sorted[low:high][inside] = zone_id
+
+    zone_ids = np.empty_like(zone_ids_sorted)
+    zone_ids[order] = zone_ids_sorted
+    return zone_ids
+
+
+def cached_zone_assignment(latitudes, longitudes, zones_path, cache_dir='data/processed'):
+    """assign_zones with the result cached on disk.
+
+    The cache key hashes the zones file and the grid coordinates, so a
+    changed grid or boundary file never reuses a stale assignment.
+    Returns (zone_names, zone_ids, from_cache).
+    """
+    zones = load_zones(zones_path)
+    digest = hashlib.sha1()
+    with open(zones_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(np.ascontiguousarray(latitudes, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(longitudes, dtype=float).tobytes())
+    cache_path = os.path.join(cache_dir, f'zone_ids_{digest.hexdigest()[:16]}.npy')
+
+    zone_names = [name for name, _ in zones]
+    if os.path.exists(cache_path):
+        return zone_names, np.load(cache_path), True
+
+    zone_ids = assign_zones(latitudes, longitudes, zones)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(cache_path, zone_ids)
+    return zone_names, zone_ids, False
+
+
+def zonal_statistics(zone_ids, zone_names, distance_columns, weights, thresholds_km=(2, 5)):
+    """Per-zone distance and coverage statistics from flat bincount reductions.
+
+    distance_columns maps a label (e.g. 'any', 'hospital') to a distance
+    array aligned with zone_ids; weights is each cell's share of the study
+    area. Means and coverage come from weighted bincounts. Max and
+    weighted median come from one sort by (zone, distance) per label.
+    Cells outside every zone are ignored.
+    """
+    in_zone = zone_ids >= 0
+    zones = zone_ids[in_zone]
+    weights = np.asarray(weights, dtype=float)[in_zone]
+    n_zones = len(zone_names)
+
+    cells = np.bincount(zones, minlength=n_zones)
+    zone_weight = np.bincount(zones, weights=weights, minlength=n_zones)
+    has_cells = cells > 0
+    safe_weight = np.where(zone_weight > 0, zone_weight, 1)
+
+    table = {
+        'zone': zone_names,
+        'cells': cells,
+        'area_share_pct': zone_weight / (weights.sum() or 1) * 100,
+    }
+    # Slice of each occupied zone once cells are sorted by (zone, distance)
+    occupied = np.flatnonzero(has_cells)
+    zone_end = np.cumsum(cells)[occupied]
+    zone_start = zone_end - cells[occupied]
+
+    for label, distances in distance_columns.items():
+        distances = np.asarray(distances, dtype=float)[in_zone]
+        table[f'mean_distance_{label}_km'] = np.bincount(
+            zones, weights=weights * distances, minlength=n_zones) / safe_weight
+
+        # Sort by (zone, distance) with a single float key: zone id plus the
+        # distance scaled into [0, 1) (several times faster than lexsort)
+        scale = distances.max() * (1 + 1e-9) + 1e-12 if len(distances) else 1
+        order = np.argsort(zones + distances / scale)
+        sorted_distances = distances[order]
+        cumulative = np.cumsum(weights[order])
+        # Weighted median: first cell where the zone's running weight passes half
+        zone_base = np.where(zone_start > 0, cumulative[zone_start - 1], 0)
+        median_index = np.searchsorted(cumulative, zone_base + zone_weight[occupied] / 2, side='left')
+        median = np.full(n_zones, np.nan)
+        median[occupied] = sorted_distances[np.minimum(median_index, zone_end - 1)]
+        maximum = np.full(n_zones, np.nan)
+        maximum[occupied] = sorted_distances[zone_end - 1]
+        table[f'median_distance_{label}_km'] = median
+        table[f'max_distance_{label}_km'] = maximum
+
+        for threshold in thresholds_km:
+            covered = np.bincount(zones, weights=weights * (distances <= threshold), minlength=n_zones)
+            table[f'coverage_{label}_{threshold}km_pct'] = covered / safe_weight * 100
+
+    zone_df = pd.DataFrame(table)
+    zone_df.loc[~has_cells, [c for c in zone_df.columns if c.startswith(('mean_', 'coverage_'))]] = np.nan
+    return zone_df